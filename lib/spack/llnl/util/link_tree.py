@@ -14,11 +14,25 @@ import filecmp
 from llnl.util.filesystem import traverse_tree, mkdirp, touch
 import llnl.util.tty as tty
 
-__all__ = ['LinkTree']
+__all__ = ['LinkTree', 'merge_directory_list', 'unmerge_directory_list']
 
 empty_file_name = '.spack-empty'
 
 
+def _list_dir(path):
+    """Yield the names of the entries of ``path``, whether each entry is a
+    directory (not a symlink to one) and whether it is a symlink."""
+    if hasattr(os, 'scandir'):
+        for entry in os.scandir(path):
+            yield (entry.name, entry.is_dir(follow_symlinks=False),
+                   entry.is_symlink())
+    else:
+        for name in os.listdir(path):
+            child = os.path.join(path, name)
+            is_link = os.path.islink(child)
+            yield name, not is_link and os.path.isdir(child), is_link
+
+
 def remove_link(src, dest):
     if not os.path.islink(dest):
         raise ValueError("%s is not a link tree!" % dest)
@@ -79,38 +93,72 @@ class LinkTree(object):
                 merge_map[src] = dest
         return merge_map
 
-    def merge_directories(self, dest_root, ignore):
-        for src, dest in traverse_tree(self._root, dest_root, ignore=ignore):
-            if os.path.isdir(src):
-                if not os.path.exists(dest):
-                    mkdirp(dest)
-                    continue
+    def scan(self, dest_root, ignore=None):
+        """Traverse the source tree once, collecting everything needed to
+        merge it into ``dest_root``.
 
-                if not os.path.isdir(dest):
-                    raise ValueError("File blocks directory: %s" % dest)
+        This is equivalent to calling :meth:`find_dir_conflicts`,
+        :meth:`get_file_map` and listing the directories traversed by
+        :meth:`merge_directories`, but lists each source directory only
+        once and does not look for destinations under directories that do
+        not exist in ``dest_root``.
 
-                # mark empty directories so they aren't removed on unmerge.
-                if not os.listdir(dest):
-                    marker = os.path.join(dest, empty_file_name)
-                    touch(marker)
+        Returns:
+            tuple: list of directory conflicts, list of (src, dest) pairs
+            for directories in pre-order, and dictionary mapping source
+            files to their destination
+        """
+        ignore = ignore or (lambda x: False)
+        conflicts, directories, file_map = [], [], {}
+
+        def visit(rel_path, parent_exists):
+            src = os.path.join(self._root, rel_path)
+            dest = os.path.join(dest_root, rel_path)
+            dest_exists = parent_exists and os.path.exists(dest)
+            if dest_exists and not os.path.isdir(dest):
+                conflicts.append("File blocks directory: %s" % dest)
+            directories.append((src, dest))
+
+            for name, is_dir, is_link in _list_dir(src):
+                rel_child = os.path.join(rel_path, name)
+                if ignore(rel_child):
+                    continue
+                if is_dir:
+                    visit(rel_child, dest_exists)
+                    continue
 
-    def unmerge_directories(self, dest_root, ignore):
-        for src, dest in traverse_tree(
-                self._root, dest_root, ignore=ignore, order='post'):
-            if os.path.isdir(src):
-                if not os.path.exists(dest):
+                dest_child = os.path.join(dest, name)
+                src_child = os.path.join(src, name)
+                if is_link and os.path.isdir(src_child):
+                    # symlinks to directories are not followed, but get an
+                    # (empty) directory in the destination
+                    if dest_exists and os.path.exists(dest_child) and \
+                            not os.path.isdir(dest_child):
+                        conflicts.append(
+                            "File blocks directory: %s" % dest_child)
+                    directories.append((src_child, dest_child))
                     continue
-                elif not os.path.isdir(dest):
-                    raise ValueError("File blocks directory: %s" % dest)
 
-                # remove directory if it is empty.
-                if not os.listdir(dest):
-                    shutil.rmtree(dest, ignore_errors=True)
+                file_map[src_child] = dest_child
+                if dest_exists and os.path.isdir(dest_child):
+                    conflicts.append(
+                        "Directory blocks directory: %s" % dest_child)
+
+        if not ignore(''):
+            visit('', True)
+        return conflicts, directories, file_map
+
+    def merge_directories(self, dest_root, ignore):
+        merge_directory_list(
+            (src, dest) for src, dest
+            in traverse_tree(self._root, dest_root, ignore=ignore)
+            if os.path.isdir(src))
 
-                # remove empty dir marker if present.
-                marker = os.path.join(dest, empty_file_name)
-                if os.path.exists(marker):
-                    os.remove(marker)
+    def unmerge_directories(self, dest_root, ignore):
+        unmerge_directory_list(
+            (src, dest) for src, dest in traverse_tree(
+                self._root, dest_root, ignore=ignore, order='post')
+            if os.path.isdir(src))
 
     def merge(self, dest_root, ignore_conflicts=False, ignore=None,
               link=os.symlink, relative=False):
@@ -168,6 +216,51 @@ class LinkTree(object):
         self.unmerge_directories(dest_root, ignore)
 
 
+def merge_directory_list(directories):
+    """Create destination directories for a merge.
+
+    Args:
+        directories: (src, dest) pairs of directories, parents first, as
+            returned by :meth:`LinkTree.scan`
+    """
+    for src, dest in directories:
+        if not os.path.exists(dest):
+            mkdirp(dest)
+            continue
+
+        if not os.path.isdir(dest):
+            raise ValueError("File blocks directory: %s" % dest)
+
+        # mark empty directories so they aren't removed on unmerge.
+        if not os.listdir(dest):
+            marker = os.path.join(dest, empty_file_name)
+            touch(marker)
+
+
+def unmerge_directory_list(directories):
+    """Remove the destination directories of a merge if they are empty.
+
+    The source directories do not need to exist anymore.
+
+    Args:
+        directories: (src, dest) pairs of directories, children first
+    """
+    for src, dest in directories:
+        if not os.path.exists(dest):
+            continue
+        elif not os.path.isdir(dest):
+            raise ValueError("File blocks directory: %s" % dest)
+
+        # remove directory if it is empty.
+        if not os.listdir(dest):
+            shutil.rmtree(dest, ignore_errors=True)
+
+        # remove empty dir marker if present.
+        marker = os.path.join(dest, empty_file_name)
+        if os.path.exists(marker):
+            os.remove(marker)
+
+
 class MergeConflictError(Exception):
 
     def __init__(self, path):
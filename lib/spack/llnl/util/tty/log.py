@@ -7,20 +7,25 @@
 """
 from __future__ import unicode_literals
 
+import codecs
 import multiprocessing
 import os
 import re
 import select
 import sys
+import threading
+import time
 import traceback
 from contextlib import contextmanager
 from six import string_types
 from six import StringIO
+from six.moves import queue
 
 import llnl.util.tty as tty
 
-# Use this to strip escape sequences
-_escape = re.compile(r'\x1b[^m]*m|\x1b\[?1034h')
+# Use this to strip escape sequences. Output is stripped many lines at
+# once, so sequences must not extend past the end of a line.
+_escape = re.compile(r'\x1b[^m\n]*m|\x1b\[?1034h')
 
 # control characters for enabling/disabling echo
 #
@@ -30,6 +35,16 @@ _escape = re.compile(r'\x1b[^m]*m|\x1b\[?1034h')
 xon, xoff = '\x11\n', '\x13\n'
 control = re.compile('(\x11\n|\x13\n)')
 
+#: Size of the chunks the writer daemon reads from the pipe at once
+read_chunk_size = 64 * 1024
+
+#: Seconds the writer daemon waits before flushing buffered log output
+flush_interval = 1.0
+
+#: Batches of lines the writer daemon queues for its parser, beyond which
+#: lines are not parsed
+parser_queue_size = 16
+
 
 def _strip(line):
     """Strip color and control characters from a line."""
@@ -153,6 +168,54 @@ def _file_descriptors_work(*streams):
         return False
 
 
+class _ParserThread(object):
+    """Runs the parser of a log in a thread of the writer daemon.
+
+    Lines are passed to the thread through a bounded queue, and are left
+    out when it is full, so that a slow parser never slows down the reading
+    of the output. A failing parser must not stop the logging of the output
+    either, so it is dropped.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.queue = queue.Queue(parser_queue_size)
+        self.skipped = 0
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def parse(self, lines):
+        try:
+            self.queue.put_nowait((lines, self.skipped))
+            self.skipped = 0
+        except queue.Full:
+            self.skipped += len(lines)
+
+    def _run(self):
+        parser = self.parser
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if parser:
+                try:
+                    parser.parse(*item)
+                except Exception:
+                    tty.error("Exception occurred in log parser!")
+                    traceback.print_exc()
+                    parser = None
+        if parser:
+            parser.close()
+
+    def close(self):
+        """Wait until the parser is done with the lines queued."""
+        if self.skipped:
+            self.queue.put(([], self.skipped))
+        self.queue.put(None)
+        self.thread.join()
+
+
 class log_output(object):
     """Context manager that logs its output to a file.
 
@@ -189,7 +252,8 @@ class log_output(object):
     work within test frameworks like nose and pytest.
     """
 
-    def __init__(self, file_like=None, echo=False, debug=False, buffer=False):
+    def __init__(self, file_like=None, echo=False, debug=False, buffer=False,
+                 parser=None):
         """Create a new output log context manager.
 
         Args:
@@ -199,6 +263,8 @@ class log_output(object):
             debug (bool): whether to enable tty debug mode during logging
             buffer (bool): pass buffer=True to skip unbuffering output; note
                 this doesn't set up any *new* buffering
+            parser (object): object with ``parse(lines)`` and ``close()``
+                methods, to look at the output while it is logged (see below)
 
         log_output can take either a file object or a filename. If a
         filename is passed, the file will be opened and closed entirely
@@ -212,15 +278,26 @@ class log_output(object):
 
         Logger daemon is not started until ``__enter__()``.
 
+        If a parser is passed, the logger daemon calls its
+        ``parse(lines, skipped)`` method with each batch of lines written
+        to the log, without their newlines, and its ``close()`` method when
+        the output ends. This happens in a thread of the daemon process, so
+        that parsing never holds up the output, and the parser has to save
+        what it finds somewhere the caller can read it. If the parser falls
+        behind, batches are not handed to it, and ``skipped`` is the number
+        of lines left out before ``lines``.
+
         """
         self.file_like = file_like
         self.echo = echo
         self.debug = debug
         self.buffer = buffer
+        self.parser = parser
 
         self._active = False  # used to prevent re-entry
 
-    def __call__(self, file_like=None, echo=None, debug=None, buffer=None):
+    def __call__(self, file_like=None, echo=None, debug=None, buffer=None,
+                 parser=None):
         """Thie behaves the same as init. It allows a logger to be reused.
 
         Arguments are the same as for ``__init__()``.  Args here take
@@ -247,6 +324,8 @@ class log_output(object):
             self.debug = debug
         if buffer is not None:
             self.buffer = buffer
+        if parser is not None:
+            self.parser = parser
         return self
 
     def __enter__(self):
@@ -413,25 +492,74 @@ class log_output(object):
         sys.stdout.flush()
 
     def _writer_daemon(self, stdin):
-        """Daemon that writes output to the log file and stdout."""
-        # Use line buffering (3rd param = 1) since Python 3 has a bug
-        # that prevents unbuffered text I/O.
-        in_pipe = os.fdopen(self.read_fd, 'r', 1)
+        """Daemon that writes output to the log file and stdout.
+
+        Output is read from the pipe in large chunks, and only whole lines
+        are processed, so that control characters and escape sequences are
+        stripped from many lines at once.  Writes to the log file are
+        buffered and flushed at most every ``flush_interval`` seconds, or
+        when the output stops for that long.
+        """
+        in_fd = self.read_fd
         os.close(self.write_fd)
 
+        # Python 3 needs text; Python 2 works with byte strings throughout,
+        # since mixing them with unicode fails on non-ASCII output
+        decoder = None
+        if sys.version_info[0] >= 3:
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            empty, newline, on = '', '\n', xon
+            controls, escape = control, _escape
+        else:
+            empty, newline, on = b'', b'\n', xon.encode()
+            controls = re.compile(control.pattern.encode())
+            escape = re.compile(_escape.pattern.encode())
+
         echo = self.echo        # initial echo setting, user-controllable
         force_echo = False      # parent can force echo for certain output
 
         # list of streams to select from
-        istreams = [in_pipe, stdin] if stdin else [in_pipe]
+        istreams = [in_fd, stdin] if stdin else [in_fd]
 
         log_file = self.log_file
+        parser = _ParserThread(self.parser) if self.parser else None
+        pending = empty         # last line read, until its newline arrives
+        last_flush = time.time()
+        unflushed = False
+
+        def write(text):
+            # The text is split around xon/xoff, which are in-band and
+            # toggle echo for what comes after them.
+            forced = force_echo
+            echoed = False
+            for i, part in enumerate(controls.split(text)):
+                if i % 2:
+                    forced = (part == on)
+                elif part and (echo or forced):
+                    sys.stdout.write(part)
+                    echoed = True
+            if echoed:
+                sys.stdout.flush()
+
+            # Stripped output to log file.
+            stripped = escape.sub(empty, controls.sub(empty, text))
+            log_file.write(stripped)
+
+            if parser:
+                lines = stripped.split(newline)
+                if not lines[-1]:
+                    lines.pop()
+                parser.parse(lines)
+
+            return forced
+
         try:
             with keyboard_input(stdin):
                 while True:
-                    # No need to set any timeout for select.select
-                    # Wait until a key press or an event on in_pipe.
-                    rlist, _, _ = select.select(istreams, [], [])
+                    # Wait until a key press or an event on in_fd, but no
+                    # longer than needed to flush the log in time.
+                    timeout = flush_interval if unflushed else None
+                    rlist, _, _ = select.select(istreams, [], [], timeout)
 
                     # Allow user to toggle echo with 'v' key.
                     # Currently ignores other chars.
@@ -440,31 +568,35 @@ class log_output(object):
                             echo = not echo
 
                     # Handle output from the with block process.
-                    if in_pipe in rlist:
-                        # If we arrive here it means that in_pipe was
-                        # ready for reading : it should never happen that
-                        # line is false-ish
-                        line = in_pipe.readline()
-                        if not line:
+                    if in_fd in rlist:
+                        data = os.read(in_fd, read_chunk_size)
+                        if not data:
                             break  # EOF
-
-                        # find control characters and strip them.
-                        controls = control.findall(line)
-                        line = re.sub(control, '', line)
-
-                        # Echo to stdout if requested or forced
-                        if echo or force_echo:
-                            sys.stdout.write(line)
-                            sys.stdout.flush()
-
-                        # Stripped output to log file.
-                        log_file.write(_strip(line))
+                        if decoder:
+                            data = decoder.decode(data)
+
+                        # Keep the trailing partial line for later
+                        text = pending + data
+                        end = text.rfind(newline) + 1
+                        text, pending = text[:end], text[end:]
+                        if text:
+                            force_echo = write(text)
+                            unflushed = True
+
+                    now = time.time()
+                    if unflushed and now - last_flush >= flush_interval:
                         log_file.flush()
+                        last_flush = now
+                        unflushed = False
+
+                # Write what is left of an output not ending in a newline
+                if decoder:
+                    pending += decoder.decode(b'', True)
+                if pending:
+                    write(pending)
+                if parser:
+                    parser.close()
 
-                        if xon in controls:
-                            force_echo = True
-                        if xoff in controls:
-                            force_echo = False
         except BaseException:
             tty.error("Exception occurred in writer daemon!")
             traceback.print_exc()
@@ -474,6 +606,7 @@ class log_output(object):
             if self.write_log_in_parent:
                 self.child.send(log_file.getvalue())
             log_file.close()
+            os.close(in_fd)
 
         # send echo value back to the parent so it can be preserved.
         self.child.send(echo)
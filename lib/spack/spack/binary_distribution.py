@@ -4,12 +4,15 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import codecs
+import multiprocessing.pool
 import os
 import re
 import tarfile
 import shutil
 import tempfile
+import threading
 import hashlib
+import zlib
 from contextlib import closing
 import ruamel.yaml as yaml
 
@@ -18,13 +21,15 @@ import json
 from six.moves.urllib.error import URLError
 
 import llnl.util.tty as tty
-from llnl.util.filesystem import mkdirp, install_tree
+from llnl.util.filesystem import mkdirp
 
+import spack.caches
 import spack.cmd
 import spack.config as config
 import spack.fetch_strategy as fs
 import spack.util.gpg as gpg_util
 import spack.relocate as relocate
+import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 import spack.mirror
 import spack.util.url as url_util
@@ -37,6 +42,20 @@ from spack.util.executable import ProcessError
 
 _build_cache_relative_path = 'build_cache'
 
+#: Consolidated index of all the spec files in a build cache (zlib-compressed
+#: JSON), and file containing the sha256 checksum of the index
+_spec_index_name = 'index.json.z'
+_spec_index_hash_name = 'index.json.hash'
+
+#: Version of the format of the consolidated index
+_spec_index_version = 1
+
+#: Number of threads downloading binary packages in the background
+prefetch_threads = 4
+
+#: Prefetcher whose results are used by download_tarball and extract_tarball
+_active_prefetcher = None
+
 BUILD_CACHE_INDEX_TEMPLATE = '''
 <html>
 <head>
@@ -110,6 +129,13 @@ class NewLayoutException(spack.error.SpackError):
     pass
 
 
+class InvalidTarballException(spack.error.SpackError):
+    """
+    Raised if a tarball contains files outside of the install prefix.
+    """
+    pass
+
+
 def has_gnupg2():
     try:
         gpg_util.Gpg.gpg()('--version', output=os.devnull)
@@ -155,32 +181,36 @@ def write_buildinfo_file(prefix, workdir, rel=False):
     link_to_relocate = []
     blacklist = (".spack", "man")
     # Do this at during tarball creation to save time when tarball unpacked.
-    # Used by make_package_relative to determine binaries to change.
+    # Used by write_prefix_tarball to determine binaries to change.
+    path_names = []
     for root, dirs, files in os.walk(prefix, topdown=True):
         dirs[:] = [d for d in dirs if d not in blacklist]
-        for filename in files:
-            path_name = os.path.join(root, filename)
-            m_type, m_subtype = relocate.mime_type(path_name)
-            if os.path.islink(path_name):
-                link = os.readlink(path_name)
-                if os.path.isabs(link):
-                    # Relocate absolute links into the spack tree
-                    if link.startswith(spack.store.layout.root):
-                        rel_path_name = os.path.relpath(path_name, prefix)
-                        link_to_relocate.append(rel_path_name)
-                    else:
-                        msg = 'Absolute link %s to %s ' % (path_name, link)
-                        msg += 'outside of stage %s ' % prefix
-                        msg += 'cannot be relocated.'
-                        tty.warn(msg)
-
-            if relocate.needs_binary_relocation(m_type, m_subtype):
-                if not filename.endswith('.o'):
+        path_names.extend(os.path.join(root, f) for f in files)
+
+    mime_types = relocate.mime_types(path_names)
+    for path_name in path_names:
+        filename = os.path.basename(path_name)
+        m_type, m_subtype = mime_types[path_name]
+        if os.path.islink(path_name):
+            link = os.readlink(path_name)
+            if os.path.isabs(link):
+                # Relocate absolute links into the spack tree
+                if link.startswith(spack.store.layout.root):
                     rel_path_name = os.path.relpath(path_name, prefix)
-                    binary_to_relocate.append(rel_path_name)
-            if relocate.needs_text_relocation(m_type, m_subtype):
+                    link_to_relocate.append(rel_path_name)
+                else:
+                    msg = 'Absolute link %s to %s ' % (path_name, link)
+                    msg += 'outside of stage %s ' % prefix
+                    msg += 'cannot be relocated.'
+                    tty.warn(msg)
+
+        if relocate.needs_binary_relocation(m_type, m_subtype):
+            if not filename.endswith('.o'):
                 rel_path_name = os.path.relpath(path_name, prefix)
-                text_to_relocate.append(rel_path_name)
+                binary_to_relocate.append(rel_path_name)
+        if relocate.needs_text_relocation(m_type, m_subtype):
+            rel_path_name = os.path.relpath(path_name, prefix)
+            text_to_relocate.append(rel_path_name)
 
     # Create buildinfo data and write it to disk
     buildinfo = {}
@@ -273,15 +303,19 @@ def generate_package_index(cache_prefix):
     Creates (or replaces) the "index.html" page at the location given in
     cache_prefix.  This page contains a link for each binary package (*.yaml)
     and signing key (*.key) under cache_prefix.
+
+    Also publishes a consolidated index with the content of every spec file,
+    so that clients can get all the specs in the build cache with a single
+    download, and its checksum.
     """
     tmpdir = tempfile.mkdtemp()
     try:
         index_html_path = os.path.join(tmpdir, 'index.html')
-        file_list = (
+        file_list = [
             entry
             for entry in web_util.list_url(cache_prefix)
             if (entry.endswith('.yaml')
-                or entry.endswith('.key')))
+                or entry.endswith('.key'))]
 
         with open(index_html_path, 'w') as f:
             f.write(BUILD_CACHE_INDEX_TEMPLATE.format(
@@ -295,10 +329,64 @@ def generate_package_index(cache_prefix):
             url_util.join(cache_prefix, 'index.html'),
             keep_original=False,
             extra_args={'ContentType': 'text/html'})
+
+        spec_files = [f for f in file_list if f.endswith('.spec.yaml')]
+        index_path = os.path.join(tmpdir, _spec_index_name)
+        write_spec_index(cache_prefix, spec_files, index_path)
+
+        hash_path = os.path.join(tmpdir, _spec_index_hash_name)
+        with open(hash_path, 'w') as f:
+            f.write(checksum_tarball(index_path))
+
+        # Push the index before its checksum: clients that see the new
+        # checksum with the old index ignore the index.
+        web_util.push_to_url(
+            index_path,
+            url_util.join(cache_prefix, _spec_index_name),
+            keep_original=False,
+            extra_args={'ContentType': 'application/octet-stream'})
+        web_util.push_to_url(
+            hash_path,
+            url_util.join(cache_prefix, _spec_index_hash_name),
+            keep_original=False,
+            extra_args={'ContentType': 'text/plain'})
     finally:
         shutil.rmtree(tmpdir)
 
 
+def write_spec_index(cache_prefix, spec_files, index_path):
+    """Write the consolidated index of the spec files of a build cache.
+
+    The index maps the name of each spec file to its content, including the
+    full hash of the spec and the checksum of its tarball.
+
+    Arguments:
+        cache_prefix (str): URL of the build cache
+        spec_files (list): names of the spec files in the build cache
+        index_path (str): path of the index file to write
+    """
+    specs = {}
+    for spec_file in spec_files:
+        url = url_util.join(cache_prefix, spec_file)
+        try:
+            _, _, response = web_util.read_from_url(url)
+            contents = codecs.getreader('utf-8')(response).read()
+            specs[spec_file] = syaml.load(contents)
+        except Exception as e:
+            tty.warn('Could not add {0} to the build cache index'.format(
+                url_util.format(url)), str(e))
+
+    index = {
+        'buildcache_index': {
+            'version': _spec_index_version,
+            'specs': specs,
+        }
+    }
+    data = json.dumps(index, sort_keys=True, separators=(',', ':'))
+    with open(index_path, 'wb') as f:
+        f.write(zlib.compress(data.encode('utf-8')))
+
+
 def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
                   allow_root=False, key=None, regenerate_index=False):
     """
@@ -345,38 +433,25 @@ def build_tarball(spec, outdir, force=False, rel=False, unsigned=False,
         else:
             raise NoOverwriteException(url_util.format(remote_specfile_path))
 
-    # make a copy of the install directory to work with
-    workdir = os.path.join(tempfile.mkdtemp(), os.path.basename(spec.prefix))
-    install_tree(spec.prefix, workdir, symlinks=True)
+    # files that must be modified in the tarball are copied here, all the
+    # others are read directly from the install prefix
+    workdir = tempfile.mkdtemp()
+    mkdirp(os.path.dirname(buildinfo_file_name(workdir)))
 
     # create info for later relocation and create tar
     write_buildinfo_file(spec.prefix, workdir, rel=rel)
 
-    # optionally make the paths in the binaries relative to each other
-    # in the spack install tree before creating tarball
-    if rel:
-        try:
-            make_package_relative(workdir, spec, allow_root)
-        except Exception as e:
-            shutil.rmtree(workdir)
-            shutil.rmtree(tarfile_dir)
-            shutil.rmtree(tmpdir)
-            tty.die(e)
-    else:
-        try:
-            make_package_placeholder(workdir, spec, allow_root)
-        except Exception as e:
-            shutil.rmtree(workdir)
-            shutil.rmtree(tarfile_dir)
-            shutil.rmtree(tmpdir)
-            tty.die(e)
-
-    # create compressed tarball of the install prefix
-    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
-        tar.add(name='%s' % workdir,
-                arcname='%s' % os.path.basename(spec.prefix))
-    # remove copy of install directory
-    shutil.rmtree(workdir)
+    # create compressed tarball of the install prefix, optionally making
+    # the paths in the binaries relative to each other in the spack
+    # install tree
+    try:
+        write_prefix_tarball(tarfile_path, spec, workdir, rel, allow_root)
+    except Exception as e:
+        shutil.rmtree(tarfile_dir)
+        shutil.rmtree(tmpdir)
+        tty.die(e)
+    finally:
+        shutil.rmtree(workdir)
 
     # get the sha256 checksum of the tarball
     checksum = checksum_tarball(tarfile_path)
@@ -444,6 +519,15 @@ def download_tarball(spec):
     Download binary tarball for given package into stage area
     Return True if successful
     """
+    if _active_prefetcher is not None:
+        verified = _active_prefetcher.result(spec)
+        if verified is not None:
+            return verified.filename
+
+    return _download_tarball(spec)
+
+
+def _download_tarball(spec):
     if not spack.mirror.MirrorCollection():
         tty.die("Please add a spack mirror to allow " +
                 "download of pre-compiled packages.")
@@ -465,49 +549,123 @@ def download_tarball(spec):
     return None
 
 
-def make_package_relative(workdir, spec, allow_root):
-    """
-    Change paths in binaries to relative paths. Change absolute symlinks
-    to relative symlinks.
+def _fetch_tarball(spec):
+    """Download the binary package of ``spec`` to its stage, like
+    :func:`_download_tarball`, without changing the working directory.
+
+    Fetch strategies run in the stage directory, which changes the working
+    directory of the whole process, so worker threads use this instead.
     """
-    prefix = spec.prefix
-    buildinfo = read_buildinfo_file(workdir)
-    old_path = buildinfo['buildpath']
-    orig_path_names = list()
-    cur_path_names = list()
-    for filename in buildinfo['relocate_binaries']:
-        orig_path_names.append(os.path.join(prefix, filename))
-        cur_path_names.append(os.path.join(workdir, filename))
-    if spec.architecture.platform == 'darwin':
-        relocate.make_macho_binaries_relative(cur_path_names, orig_path_names,
-                                              old_path, allow_root)
-    else:
-        relocate.make_elf_binaries_relative(cur_path_names, orig_path_names,
-                                            old_path, allow_root)
-    orig_path_names = list()
-    cur_path_names = list()
-    for filename in buildinfo.get('relocate_links', []):
-        orig_path_names.append(os.path.join(prefix, filename))
-        cur_path_names.append(os.path.join(workdir, filename))
-    relocate.make_link_relative(cur_path_names, orig_path_names)
+    tarball = tarball_path_name(spec, '.spack')
 
+    for mirror in spack.mirror.MirrorCollection().values():
+        url = url_util.join(
+            mirror.fetch_url, _build_cache_relative_path, tarball)
+
+        stage = Stage(url, name="build_cache", keep=True)
+        save_filename = stage.save_filename
+        if os.path.exists(save_filename):
+            return save_filename
 
-def make_package_placeholder(workdir, spec, allow_root):
+        try:
+            _, _, response = web_util.read_from_url(url)
+        except Exception as e:
+            tty.debug('Cannot download {0}: {1}'.format(url, str(e)))
+            continue
+
+        # download to a temporary file, so that a partial download is
+        # never taken for the package
+        stage.create()
+        fd, partial = tempfile.mkstemp(
+            prefix='.' + os.path.basename(save_filename),
+            dir=os.path.dirname(save_filename))
+        try:
+            with closing(response):
+                with os.fdopen(fd, 'wb') as f:
+                    shutil.copyfileobj(response, f)
+            os.rename(partial, save_filename)
+        except BaseException:
+            os.remove(partial)
+            raise
+        return save_filename
+
+    return None
+
+
+def write_prefix_tarball(tarfile_path, spec, workdir, rel, allow_root):
     """
-    Check if package binaries are relocatable.
-    Change links to placeholder links.
+    Write the install prefix of ``spec`` to a compressed tarball.
+
+    Files are streamed from the prefix into the tarball.  Absolute links are
+    made relative (or point to a placeholder) in the tarball itself, and
+    only the binaries whose RPATHs are made relative and the buildinfo file
+    are copied to ``workdir`` first.
     """
     prefix = spec.prefix
+    arcroot = os.path.basename(prefix)
     buildinfo = read_buildinfo_file(workdir)
+    buildinfo_path = buildinfo_file_name(prefix)
+
+    links = {}
+    for filename in buildinfo.get('relocate_links', []):
+        path_name = os.path.join(prefix, filename)
+        if rel:
+            links[path_name] = relocate.relative_link_target(path_name)
+        else:
+            links[path_name] = relocate.placeholder_link_target(
+                path_name, prefix, prefix)
+
+    orig_path_names = list()
     cur_path_names = list()
     for filename in buildinfo['relocate_binaries']:
+        orig_path_names.append(os.path.join(prefix, filename))
         cur_path_names.append(os.path.join(workdir, filename))
-    relocate.check_files_relocatable(cur_path_names, allow_root)
 
-    cur_path_names = list()
-    for filename in buildinfo.get('relocate_links', []):
-        cur_path_names.append(os.path.join(workdir, filename))
-    relocate.make_link_placeholder(cur_path_names, workdir, prefix)
+    copies = {}
+    if rel:
+        for orig_path, cur_path in zip(orig_path_names, cur_path_names):
+            mkdirp(os.path.dirname(cur_path))
+            shutil.copy2(orig_path, cur_path)
+            copies[orig_path] = cur_path
+        old_path = buildinfo['buildpath']
+        if spec.architecture.platform == 'darwin':
+            relocate.make_macho_binaries_relative(
+                cur_path_names, orig_path_names, old_path, allow_root)
+        else:
+            relocate.make_elf_binaries_relative(
+                cur_path_names, orig_path_names, old_path, allow_root)
+    else:
+        relocate.check_files_relocatable(orig_path_names, allow_root)
+
+    def add(path_name):
+        arcname = os.path.join(arcroot, os.path.relpath(path_name, prefix))
+        if path_name in links:
+            tarinfo = tar.gettarinfo(path_name, arcname=arcname)
+            tarinfo.linkname = links[path_name]
+            tar.addfile(tarinfo)
+        else:
+            tar.add(copies.get(path_name, path_name),
+                    arcname=arcname, recursive=False)
+
+    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
+        tar.add(prefix, arcname=arcroot, recursive=False)
+        for root, dirs, files in os.walk(prefix):
+            dirs.sort()
+            # links to directories are not walked, add them as links
+            entries = files + [d for d in dirs
+                               if os.path.islink(os.path.join(root, d))]
+            for name in sorted(entries):
+                path_name = os.path.join(root, name)
+                if path_name != buildinfo_path:
+                    add(path_name)
+            for name in dirs:
+                path_name = os.path.join(root, name)
+                if not os.path.islink(path_name):
+                    add(path_name)
+
+        tar.add(buildinfo_file_name(workdir),
+                arcname=os.path.join(
+                    arcroot, os.path.relpath(buildinfo_path, prefix)))
 
 
 def relocate_package(workdir, spec, allow_root):
@@ -568,85 +726,243 @@ def relocate_package(workdir, spec, allow_root):
         relocate.relocate_links(path_names, old_path, new_path)
 
 
-def extract_tarball(spec, filename, allow_root=False, unsigned=False,
-                    force=False):
-    """
-    extract binary tarball for given package into install area
+class VerifiedTarball(object):
+    """A downloaded binary package whose signature has been checked.
+
+    The checksum of the tarball of the install prefix is checked while the
+    tarball is extracted.
     """
-    if os.path.exists(spec.prefix):
-        if force:
-            shutil.rmtree(spec.prefix)
-        else:
-            raise NoOverwriteException(str(spec.prefix))
 
+    def __init__(self, filename, tmpdir, spackfile_path, checksum):
+        self.filename = filename
+        self.tmpdir = tmpdir
+        self.spackfile_path = spackfile_path
+        self.checksum = checksum
+
+    def cleanup(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def verify_tarball(spec, filename, unsigned=False):
+    """Check the signature of a downloaded binary package, and that it can
+    be relocated.
+
+    Only the spec file and its signature are extracted, in a temporary
+    directory.
+
+    Arguments:
+        spec (Spec): spec of the package
+        filename (str): path of the downloaded ``.spack`` file
+        unsigned (bool): whether to skip the signature verification
+
+    Returns:
+        VerifiedTarball: the verified package
+    """
     tmpdir = tempfile.mkdtemp()
     stagepath = os.path.dirname(filename)
     spackfile_name = tarball_name(spec, '.spack')
     spackfile_path = os.path.join(stagepath, spackfile_name)
-    tarfile_name = tarball_name(spec, '.tar.gz')
-    tarfile_path = os.path.join(tmpdir, tarfile_name)
     specfile_name = tarball_name(spec, '.spec.yaml')
     specfile_path = os.path.join(tmpdir, specfile_name)
 
-    with closing(tarfile.open(spackfile_path, 'r')) as tar:
-        tar.extractall(tmpdir)
-    if not unsigned:
-        if os.path.exists('%s.asc' % specfile_path):
-            try:
-                suppress = config.get('config:suppress_gpg_warnings', False)
-                Gpg.verify('%s.asc' % specfile_path, specfile_path, suppress)
-            except Exception as e:
-                shutil.rmtree(tmpdir)
-                tty.die(e)
+    try:
+        with closing(tarfile.open(spackfile_path, 'r')) as tar:
+            names = tar.getnames()
+            for name in (specfile_name, '%s.asc' % specfile_name):
+                if name in names:
+                    tar.extract(name, tmpdir)
+        if not unsigned:
+            if os.path.exists('%s.asc' % specfile_path):
+                try:
+                    suppress = config.get(
+                        'config:suppress_gpg_warnings', False)
+                    Gpg.verify(
+                        '%s.asc' % specfile_path, specfile_path, suppress)
+                except Exception as e:
+                    raise NoVerifyException(
+                        "Package spec file failed signature verification: "
+                        "%s" % str(e))
+            else:
+                raise NoVerifyException(
+                    "Package spec file failed signature verification.\n"
+                    "Use spack buildcache keys to download "
+                    "and install a key for verification from the mirror.")
+
+        # get the sha256 checksum recorded at creation
+        spec_dict = {}
+        with open(specfile_path, 'r') as inputfile:
+            content = inputfile.read()
+            spec_dict = syaml.load(content)
+        bchecksum = spec_dict['binary_cache_checksum']
+
+        new_relative_prefix = str(os.path.relpath(spec.prefix,
+                                                  spack.store.layout.root))
+        # if the original relative prefix is in the spec file use it
+        buildinfo = spec_dict.get('buildinfo', {})
+        old_relative_prefix = buildinfo.get(
+            'relative_prefix', new_relative_prefix)
+        # if the original relative prefix and new relative prefix differ the
+        # directory layout has changed and the  buildcache cannot be installed
+        if old_relative_prefix != new_relative_prefix:
+            msg = "Package tarball was created from an install "
+            msg += "prefix with a different directory layout.\n"
+            msg += "It cannot be relocated."
+            raise NewLayoutException(msg)
+    except BaseException:
+        shutil.rmtree(tmpdir)
+        raise
+
+    return VerifiedTarball(
+        filename, tmpdir, spackfile_path, bchecksum['hash'])
+
+
+class _HashingReader(object):
+    """Read-only file object updating a hash with the data read."""
+
+    def __init__(self, fileobj, hasher):
+        self.fileobj = fileobj
+        self.hasher = hasher
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+
+def extract_prefix_tarball(spec, verified):
+    """
+    Stream the tarball of the install prefix, stored in a ``.spack`` file,
+    into a staging directory next to the prefix, checking its checksum on
+    the fly.
+
+    The staging directory is renamed to the prefix only once the checksum
+    matches, so nothing is installed from a tarball that fails the check.
+    Members whose path goes through a symbolic link of the tarball, and
+    symbolic links to paths outside of the prefix and of the install tree,
+    are rejected.
+    """
+    prefix = str(spec.prefix)
+    arcroot = os.path.basename(prefix)
+    tarfile_name = tarball_name(spec, '.tar.gz')
+    hasher = hashlib.sha256()
+
+    def relative_name(name):
+        # the base of the install prefix is used when creating the tarball,
+        # and the directory layout is confirmed, so members only need to be
+        # moved to the actual prefix
+        relative = os.path.normpath(name)
+        if not relative.startswith(arcroot + os.sep):
+            raise InvalidTarballException(
+                "Package tarball contains %s, outside of %s" %
+                (name, arcroot))
+        return relative[len(arcroot) + 1:]
+
+    def contained(path, root):
+        return path == root or path.startswith(root + os.sep)
+
+    # links to the prefix of dependencies are made relative, or point to a
+    # placeholder of the install tree, when creating the tarball
+    placeholder = relocate.set_placeholder(spack.store.layout.root)
+    store_root = os.path.normpath(spack.store.layout.root)
+
+    def check_link_target(tarinfo):
+        target = tarinfo.linkname
+        if target.startswith(placeholder):
+            target = target.replace(placeholder, store_root, 1)
+        target = os.path.normpath(os.path.join(
+            prefix, os.path.dirname(tarinfo.name), target))
+        if not (contained(target, prefix) or contained(target, store_root)):
+            raise InvalidTarballException(
+                "Package tarball contains a link from %s to %s, outside "
+                "of %s" % (tarinfo.name, tarinfo.linkname, arcroot))
+
+    symlinks = set()
+
+    def check_not_through_symlink(name):
+        # members are never extracted over or through links of the tarball,
+        # which could point anywhere once extracted
+        while name:
+            if name in symlinks:
+                raise InvalidTarballException(
+                    "Package tarball contains %s, through the link %s" %
+                    (name, os.path.join(arcroot, name)))
+            name = os.path.dirname(name)
+
+    parent = os.path.dirname(prefix)
+    mkdirp(parent)
+    tmpdir = tempfile.mkdtemp(prefix='.%s-' % arcroot, dir=parent)
+    try:
+        staging = os.path.join(tmpdir, arcroot)
+        mkdirp(staging)
+
+        directories = []
+        with closing(tarfile.open(verified.spackfile_path, 'r')) as spackfile:
+            stream = _HashingReader(
+                spackfile.extractfile(tarfile_name), hasher)
+            with closing(tarfile.open(fileobj=stream, mode='r|gz')) as tar:
+                for tarinfo in tar:
+                    if os.path.normpath(tarinfo.name) == arcroot:
+                        directories.append((staging, tarinfo))
+                        continue
+
+                    tarinfo.name = relative_name(tarinfo.name)
+                    check_not_through_symlink(tarinfo.name)
+                    if tarinfo.islnk():
+                        tarinfo.linkname = relative_name(tarinfo.linkname)
+                        check_not_through_symlink(tarinfo.linkname)
+                    elif tarinfo.issym():
+                        check_link_target(tarinfo)
+                        symlinks.add(tarinfo.name)
+
+                    if tarinfo.isdir():
+                        # set permissions once the content is extracted, in
+                        # case the directory is not writable
+                        path_name = os.path.join(staging, tarinfo.name)
+                        mkdirp(path_name)
+                        directories.append((path_name, tarinfo))
+                    else:
+                        tar.extract(tarinfo, staging)
+
+            # the checksum covers the whole compressed tarball
+            while stream.read(65536):
+                pass
+
+        # if the checksums don't match don't install
+        if hasher.hexdigest() != verified.checksum:
+            raise NoChecksumException(
+                "Package tarball failed checksum verification.\n"
+                "It cannot be installed.")
+
+        for path_name, tarinfo in reversed(directories):
+            os.chmod(path_name, tarinfo.mode)
+            os.utime(path_name, (tarinfo.mtime, tarinfo.mtime))
+
+        os.rename(staging, prefix)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def extract_tarball(spec, filename, allow_root=False, unsigned=False,
+                    force=False):
+    """
+    extract binary tarball for given package into install area
+    """
+    if os.path.exists(spec.prefix):
+        if force:
+            shutil.rmtree(spec.prefix)
         else:
-            shutil.rmtree(tmpdir)
-            raise NoVerifyException(
-                "Package spec file failed signature verification.\n"
-                "Use spack buildcache keys to download "
-                "and install a key for verification from the mirror.")
-    # get the sha256 checksum of the tarball
-    checksum = checksum_tarball(tarfile_path)
+            raise NoOverwriteException(str(spec.prefix))
 
-    # get the sha256 checksum recorded at creation
-    spec_dict = {}
-    with open(specfile_path, 'r') as inputfile:
-        content = inputfile.read()
-        spec_dict = syaml.load(content)
-    bchecksum = spec_dict['binary_cache_checksum']
+    verified = None
+    if _active_prefetcher is not None:
+        verified = _active_prefetcher.take(spec, filename, unsigned)
+    if verified is None:
+        verified = verify_tarball(spec, filename, unsigned)
 
-    # if the checksums don't match don't install
-    if bchecksum['hash'] != checksum:
-        shutil.rmtree(tmpdir)
-        raise NoChecksumException(
-            "Package tarball failed checksum verification.\n"
-            "It cannot be installed.")
-
-    new_relative_prefix = str(os.path.relpath(spec.prefix,
-                                              spack.store.layout.root))
-    # if the original relative prefix is in the spec file use it
-    buildinfo = spec_dict.get('buildinfo', {})
-    old_relative_prefix = buildinfo.get('relative_prefix', new_relative_prefix)
-    # if the original relative prefix and new relative prefix differ the
-    # directory layout has changed and the  buildcache cannot be installed
-    if old_relative_prefix != new_relative_prefix:
-        shutil.rmtree(tmpdir)
-        msg = "Package tarball was created from an install "
-        msg += "prefix with a different directory layout.\n"
-        msg += "It cannot be relocated."
-        raise NewLayoutException(msg)
-
-    # extract the tarball in a temp directory
-    with closing(tarfile.open(tarfile_path, 'r')) as tar:
-        tar.extractall(path=tmpdir)
-    # the base of the install prefix is used when creating the tarball
-    # so the pathname should be the same now that the directory layout
-    # is confirmed
-    workdir = os.path.join(tmpdir, os.path.basename(spec.prefix))
-    install_tree(workdir, spec.prefix, symlinks=True)
-
-    # cleanup
-    os.remove(tarfile_path)
-    os.remove(specfile_path)
+    try:
+        extract_prefix_tarball(spec, verified)
+    finally:
+        verified.cleanup()
 
     try:
         relocate_package(spec.prefix, spec, allow_root)
@@ -660,13 +976,229 @@ def extract_tarball(spec, filename, allow_root=False, unsigned=False,
         if not os.path.exists(manifest_file):
             spec_id = spec.format('{name}/{hash:7}')
             tty.warn('No manifest file in tarball for spec %s' % spec_id)
-    finally:
-        shutil.rmtree(tmpdir)
+
+
+class BinaryCachePrefetcher(object):
+    """Download and verify the binary packages of many specs in the
+    background.
+
+    Packages are downloaded by a pool of ``prefetch_threads`` threads, and
+    their signature is checked as soon as they are downloaded, while the
+    caller installs other packages.  Inside the
+    ``with`` block of a prefetcher, :func:`download_tarball` and
+    :func:`extract_tarball` wait for its results instead of downloading and
+    verifying packages themselves.  If prefetching a package fails, they
+    download it again, so that errors are reported as usual.
+
+    Args:
+        specs (list): concrete specs to prefetch, in the order they are
+            needed; specs that are not in any build cache are ignored
+        unsigned (bool): whether to skip signature verification
+    """
+
+    def __init__(self, specs, unsigned=False):
+        self.unsigned = unsigned
+        self._results = {}
+        self._pool = None
+        self._previous = None
+        self._closed = threading.Event()
+
+        # Worker threads are not copied to forked processes
+        self._pid = os.getpid()
+
+        specs = list(specs)
+        if not specs or not spack.mirror.MirrorCollection():
+            return
+
+        available = set(s.dag_hash() for s in get_specs())
+        specs = [s for s in specs if s.dag_hash() in available]
+        if not specs:
+            return
+
+        self._pool = multiprocessing.pool.ThreadPool(
+            min(prefetch_threads, len(specs)))
+        for spec in specs:
+            self._results[spec.dag_hash()] = self._pool.apply_async(
+                self._prefetch, (spec,))
+        self._pool.close()
+
+    def __enter__(self):
+        global _active_prefetcher
+        self._previous = _active_prefetcher
+        _active_prefetcher = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _active_prefetcher
+        _active_prefetcher = self._previous
+        self.close()
+
+    def _prefetch(self, spec):
+        # packages that are still queued when closing are not downloaded
+        if self._closed.is_set():
+            return None
+        return _prefetch(spec, self.unsigned)
+
+    def ready(self, spec):
+        """Whether ``spec`` is not being prefetched anymore."""
+        result = self._results.get(spec.dag_hash())
+        return result is None or result.ready()
+
+    def result(self, spec):
+        """Wait until the package of ``spec`` is downloaded and verified.
+
+        Returns:
+            (VerifiedTarball or None): the package, or None if it was not
+            prefetched or if prefetching it failed
+        """
+        result = self._results.get(spec.dag_hash())
+        if result is None:
+            return None
+        if os.getpid() != self._pid and not result.ready():
+            return None
+
+        verified = result.get()
+        if isinstance(verified, BaseException):
+            tty.debug('Prefetching the binary package of {0} failed: {1}'
+                      .format(spec.name, str(verified)))
+            return None
+        return verified
+
+    def take(self, spec, filename, unsigned):
+        """Return the verified package of ``spec`` for extraction.
+
+        Each verified package can be extracted only once.
+        """
+        verified = self.result(spec)
+        if (verified is None or verified.filename != filename or
+                (self.unsigned and not unsigned)):
+            return None
+        del self._results[spec.dag_hash()]
+        return verified
+
+    def close(self):
+        """Stop prefetching, and remove packages that were not extracted.
+
+        Threads can't be interrupted, so this waits for the packages being
+        downloaded, and cleans them up too.
+        """
+        self._closed.set()
+        if self._pool is not None and os.getpid() == self._pid:
+            self._pool.join()
+            self._pool = None
+
+        for result in self._results.values():
+            if result.ready():
+                verified = result.get()
+                if isinstance(verified, VerifiedTarball):
+                    verified.cleanup()
+        self._results.clear()
+
+
+def _prefetch(spec, unsigned):
+    """Download and verify a binary package in a worker thread.
+
+    Exceptions are returned rather than raised, so that they are reported
+    by the thread using the package.
+    """
+    try:
+        filename = _fetch_tarball(spec)
+        if filename is None:
+            return None
+        return verify_tarball(spec, filename, unsigned)
+    except BaseException as e:
+        return e
 
 
 #: Internal cache for get_specs
 _cached_specs = None
 
+#: Internal cache of the consolidated indexes read from build caches
+_cached_spec_indexes = {}
+
+
+def _spec_index_cache_key(cache_prefix):
+    url_hash = hashlib.sha1(
+        url_util.format(cache_prefix).encode('utf-8')).hexdigest()
+    return os.path.join('build_cache', url_hash + '.json')
+
+
+def fetch_spec_index(cache_prefix, force=False):
+    """Get the consolidated index of a build cache.
+
+    A copy of the index is kept in the misc cache together with its
+    checksum, and it is downloaded again only if the checksum published in
+    the build cache changed, or if ``force`` is True.
+
+    Arguments:
+        cache_prefix (str): URL of the build cache
+        force (bool): ignore cached copies of the index
+
+    Returns:
+        (dict or None): mapping from the name of each spec file in the build
+        cache to its content, or None if the build cache has no valid index
+    """
+    cache_prefix = url_util.format(cache_prefix)
+    if not force and cache_prefix in _cached_spec_indexes:
+        return _cached_spec_indexes[cache_prefix]
+
+    index = _fetch_spec_index(cache_prefix, force)
+    _cached_spec_indexes[cache_prefix] = index
+    return index
+
+
+def _fetch_spec_index(cache_prefix, force):
+    hash_url = url_util.join(cache_prefix, _spec_index_hash_name)
+    try:
+        _, _, response = web_util.read_from_url(hash_url)
+        remote_hash = codecs.getreader('utf-8')(response).read().strip()
+    except Exception as e:
+        tty.debug('No build cache index at {0}: {1}'.format(
+            cache_prefix, str(e)))
+        return None
+
+    cache = spack.caches.misc_cache
+    key = _spec_index_cache_key(cache_prefix)
+    if not force and cache.init_entry(key):
+        try:
+            with cache.read_transaction(key) as f:
+                cached = sjson.load(f)
+            if cached['hash'] == remote_hash:
+                return cached['specs']
+        except Exception as e:
+            tty.debug('Ignoring cached build cache index: {0}'.format(e))
+
+    index_url = url_util.join(cache_prefix, _spec_index_name)
+    try:
+        _, _, response = web_util.read_from_url(index_url)
+        compressed = response.read()
+    except Exception as e:
+        tty.debug('Cannot read build cache index at {0}: {1}'.format(
+            index_url, str(e)))
+        return None
+
+    if hashlib.sha256(compressed).hexdigest() != remote_hash:
+        tty.warn('Ignoring build cache index at {0}: checksum does not '
+                 'match'.format(index_url))
+        return None
+
+    try:
+        index = sjson.load(zlib.decompress(compressed).decode('utf-8'))
+        index = index['buildcache_index']
+        if index['version'] != _spec_index_version:
+            raise ValueError('unknown version {0}'.format(index['version']))
+        specs = index['specs']
+    except Exception as e:
+        tty.warn('Ignoring build cache index at {0}'.format(index_url),
+                 str(e))
+        return None
+
+    cache.init_entry(key)
+    with cache.write_transaction(key) as (old, new):
+        sjson.dump({'hash': remote_hash, 'specs': specs}, new)
+
+    return specs
+
 
 def get_specs(force=False):
     """
@@ -682,21 +1214,42 @@ def get_specs(force=False):
         tty.warn("No Spack mirrors are currently configured")
         return {}
 
+    _cached_specs = []
     urls = set()
     for mirror in spack.mirror.MirrorCollection().values():
         fetch_url_build_cache = url_util.join(
             mirror.fetch_url, _build_cache_relative_path)
 
+        # Read all the specs at once from the consolidated index, if the
+        # build cache has one
+        index = fetch_spec_index(fetch_url_build_cache, force)
+        indexed = set()
+        if index is not None:
+            tty.msg("Reading buildcache index at %s" %
+                    url_util.format(fetch_url_build_cache))
+            for spec_file, spec_dict in index.items():
+                try:
+                    spec = Spec.from_dict(spec_dict)
+                except Exception as e:
+                    tty.debug('Invalid spec {0} in buildcache index: {1}'
+                              .format(spec_file, str(e)))
+                    continue
+                spec._mark_concrete()
+                _cached_specs.append(spec)
+                indexed.add(spec_file)
+
         mirror_dir = url_util.local_file_path(fetch_url_build_cache)
         if mirror_dir:
+            # Listing a local mirror is cheap, so also pick up spec files
+            # added after the index was generated
             tty.msg("Finding buildcaches in %s" % mirror_dir)
             if os.path.exists(mirror_dir):
                 files = os.listdir(mirror_dir)
                 for file in files:
-                    if re.search('spec.yaml', file):
+                    if re.search('spec.yaml', file) and file not in indexed:
                         link = url_util.join(fetch_url_build_cache, file)
                         urls.add(link)
-        else:
+        elif index is None:
             tty.msg("Finding buildcaches at %s" %
                     url_util.format(fetch_url_build_cache))
             p, links = web_util.spider(
@@ -705,7 +1258,6 @@ def get_specs(force=False):
                 if re.search("spec.yaml", link):
                     urls.add(link)
 
-    _cached_specs = []
     for link in urls:
         with Stage(link, name="build_cache", keep=True) as stage:
             if force and os.path.exists(stage.save_filename):
@@ -800,25 +1352,30 @@ def needs_rebuild(spec, mirror_url, rebuild_on_errors=False):
     result_of_error = 'Package ({0}) will {1}be rebuilt'.format(
         spec.short_spec, '' if rebuild_on_errors else 'not ')
 
-    try:
-        _, _, yaml_file = web_util.read_from_url(file_path)
-        yaml_contents = codecs.getreader('utf-8')(yaml_file).read()
-    except URLError as url_err:
-        err_msg = [
-            'Unable to determine whether {0} needs rebuilding,',
-            ' caught URLError attempting to read from {1}.',
-        ]
-        tty.error(''.join(err_msg).format(spec.short_spec, file_path))
-        tty.debug(url_err)
-        tty.warn(result_of_error)
-        return rebuild_on_errors
-
-    if not yaml_contents:
-        tty.error('Reading {0} returned nothing'.format(file_path))
-        tty.warn(result_of_error)
-        return rebuild_on_errors
-
-    spec_yaml = syaml.load(yaml_contents)
+    # The consolidated index is enough to tell that the spec is up to date.
+    # Otherwise the spec file is read, as the index may predate it.
+    index = fetch_spec_index(cache_prefix) or {}
+    spec_yaml = index.get(spec_yaml_file_name)
+    if spec_yaml is None or spec_yaml.get('full_hash') != pkg_full_hash:
+        try:
+            _, _, yaml_file = web_util.read_from_url(file_path)
+            yaml_contents = codecs.getreader('utf-8')(yaml_file).read()
+        except (URLError, web_util.SpackWebError) as url_err:
+            err_msg = [
+                'Unable to determine whether {0} needs rebuilding,',
+                ' caught URLError attempting to read from {1}.',
+            ]
+            tty.error(''.join(err_msg).format(spec.short_spec, file_path))
+            tty.debug(url_err)
+            tty.warn(result_of_error)
+            return rebuild_on_errors
+
+        if not yaml_contents:
+            tty.error('Reading {0} returned nothing'.format(file_path))
+            tty.warn(result_of_error)
+            return rebuild_on_errors
+
+        spec_yaml = syaml.load(yaml_contents)
 
     # If either the full_hash didn't exist in the .spec.yaml file, or it
     # did, but didn't match the one we computed locally, then we should
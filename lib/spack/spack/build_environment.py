@@ -62,6 +62,7 @@ from spack.error import NoLibrariesError, NoHeadersError
 from spack.util.executable import Executable
 from spack.util.module_cmd import load_module, get_path_from_module
 from spack.util.log_parse import parse_log_events, make_log_context
+from spack.util.log_parse import load_log_events
 
 
 #
@@ -833,8 +834,10 @@ def fork(pkg, function, dirty, fake):
             package_context = get_package_context(tb)
 
             build_log = None
+            log_events = None
             if hasattr(pkg, 'log_path'):
                 build_log = pkg.log_path
+                log_events = pkg.log_events_path
 
             # make a pickleable exception to send to parent.
             msg = "%s: %s" % (exc_type.__name__, str(exc))
@@ -842,7 +845,8 @@ def fork(pkg, function, dirty, fake):
             ce = ChildError(msg,
                             exc_type.__module__,
                             exc_type.__name__,
-                            tb_string, build_log, package_context)
+                            tb_string, build_log, package_context,
+                            log_events)
             child_pipe.send(ce)
 
         finally:
@@ -999,13 +1003,14 @@ class ChildError(InstallError):
     build_errors = [('spack.util.executable', 'ProcessError')]
 
     def __init__(self, msg, module, classname, traceback_string, build_log,
-                 context):
+                 context, log_events=None):
         super(ChildError, self).__init__(msg)
         self.module = module
         self.name = classname
         self.traceback = traceback_string
         self.build_log = build_log
         self.context = context
+        self.log_events = log_events
 
     @property
     def long_message(self):
@@ -1014,20 +1019,27 @@ class ChildError(InstallError):
 
         if (self.module, self.name) in ChildError.build_errors:
             # The error happened in some external executed process. Show
-            # the build log with errors or warnings highlighted.
-            if self.build_log and os.path.exists(self.build_log):
+            # the build log with errors or warnings highlighted. Use the
+            # events found while the build was running, if any, rather
+            # than parse the whole log again.
+            events = None
+            if self.log_events and os.path.exists(self.log_events):
+                events = load_log_events(self.log_events)
+            elif self.build_log and os.path.exists(self.build_log):
                 errors, warnings = parse_log_events(self.build_log)
-                nerr = len(errors)
-                nwar = len(warnings)
+                events = errors, warnings, len(errors), len(warnings)
+
+            if events:
+                errors, warnings, nerr, nwar = events
                 if nerr > 0:
                     # If errors are found, only display errors
-                    out.write(
-                        "\n%s found in build log:\n" % plural(nerr, 'error'))
+                    out.write("\n%s found in build log%s:\n" % (
+                        plural(nerr, 'error'), _shown(errors, nerr)))
                     out.write(make_log_context(errors))
                 elif nwar > 0:
                     # If no errors are found but warnings are, display warnings
-                    out.write(
-                        "\n%s found in build log:\n" % plural(nwar, 'warning'))
+                    out.write("\n%s found in build log%s:\n" % (
+                        plural(nwar, 'warning'), _shown(warnings, nwar)))
                     out.write(make_log_context(warnings))
 
         else:
@@ -1062,9 +1074,19 @@ class ChildError(InstallError):
             self.name,
             self.traceback,
             self.build_log,
-            self.context)
+            self.context,
+            self.log_events)
+
+
+def _shown(events, total):
+    """Note on how many of the events found in a log are displayed."""
+    if len(events) < total:
+        return ', showing the first %d' % len(events)
+    return ''
 
 
-def _make_child_error(msg, module, name, traceback, build_log, context):
+def _make_child_error(msg, module, name, traceback, build_log, context,
+                      log_events=None):
     """Used by __reduce__ in ChildError to reconstruct pickled errors."""
-    return ChildError(msg, module, name, traceback, build_log, context)
+    return ChildError(msg, module, name, traceback, build_log, context,
+                      log_events)
@@ -49,6 +49,22 @@ def _fetch_cache():
     return spack.fetch_strategy.FsCache(path)
 
 
+def expanded_source_cache():
+    """Filesystem cache of expanded source archives, shared by the stages
+    of the packages built from the same archive.
+
+    Returns:
+        (spack.fetch_strategy.ExpandedSourceCache or None): the cache, or
+            None if ``config:expanded_source_cache`` is not set
+    """
+    path = spack.config.get('config:expanded_source_cache')
+    if not path:
+        return None
+    path = spack.util.path.canonicalize_path(path)
+
+    return spack.fetch_strategy.ExpandedSourceCache(path)
+
+
 class MirrorCache(object):
     def __init__(self, root):
         self.root = os.path.abspath(root)
@@ -11,6 +11,7 @@ import llnl.util.tty as tty
 
 import spack.caches
 import spack.cmd
+import spack.config
 import spack.repo
 import spack.stage
 from spack.paths import lib_path, var_path
@@ -33,10 +34,11 @@ def setup_parser(subparser):
         help="remove all temporary build stages (default)")
     subparser.add_argument(
         '-d', '--downloads', action='store_true',
-        help="remove cached downloads")
+        help="remove cached downloads and expanded sources")
     subparser.add_argument(
         '-m', '--misc-cache', action='store_true',
-        help="remove long-lived caches, like the virtual package index")
+        help="remove long-lived caches, like the virtual package index and"
+             " parsed configuration files")
     subparser.add_argument(
         '-p', '--python-cache', action='store_true',
         help="remove .pyc, .pyo files and __pycache__ folders")
@@ -72,10 +74,15 @@ def clean(parser, args):
     if args.downloads:
         tty.msg('Removing cached downloads')
         spack.caches.fetch_cache.destroy()
+        expanded_source_cache = spack.caches.expanded_source_cache()
+        if expanded_source_cache:
+            expanded_source_cache.destroy()
 
     if args.misc_cache:
         tty.msg('Removing cached information on repositories')
         spack.caches.misc_cache.destroy()
+        tty.msg('Removing cached configuration files')
+        spack.config.clear_config_file_cache()
 
     if args.python_cache:
         tty.msg('Removing python cache files')
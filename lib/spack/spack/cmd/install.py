@@ -14,6 +14,7 @@ import llnl.util.tty as tty
 import spack.build_environment
 import spack.cmd
 import spack.cmd.common.arguments as arguments
+import spack.config
 import spack.environment as ev
 import spack.fetch_strategy
 import spack.paths
@@ -73,6 +74,9 @@ the dependencies"""
         '-u', '--until', type=str, dest='until', default=None,
         help="phase to stop after when installing (default None)")
     arguments.add_common_arguments(subparser, ['jobs', 'install_status'])
+    subparser.add_argument(
+        '-p', '--install-jobs', type=int, dest='install_jobs', default=None,
+        help="maximum number of packages to build at the same time")
     subparser.add_argument(
         '--overwrite', action='store_true',
         help="reinstall an existing spec, even if it has dependents")
@@ -221,6 +225,12 @@ def install_spec(cli_args, kwargs, abstract_spec, spec):
 
 
 def install(parser, args, **kwargs):
+    if args.install_jobs is not None:
+        if args.install_jobs < 1:
+            tty.die('--install-jobs must be a positive integer')
+        spack.config.set(
+            'config:install_jobs', args.install_jobs, scope='command_line')
+
     if not args.package and not args.specfiles:
         # if there are no args but an active environment or spack.yaml file
         # then install the packages from it.
@@ -57,6 +57,13 @@ def setup_parser(subparser):
         '-n', '--versions-per-spec',
         help="the number of versions to fetch for each spec, choose 'all' to"
              " retrieve all versions of each package")
+    create_parser.add_argument(
+        '-j', '--jobs', type=int, default=4,
+        help="number of specs to fetch at the same time (default 4)")
+    create_parser.add_argument(
+        '--jobs-per-host', type=int, default=None,
+        help="maximum number of specs fetched from the same host at the"
+             " same time (default: no limit)")
 
     # used to construct scope arguments below
     scopes = spack.config.scopes()
@@ -307,8 +314,14 @@ def mirror_create(args):
 
     existed = web_util.url_exists(directory)
 
+    if args.jobs is not None and args.jobs < 1:
+        tty.die("The number of jobs must be a positive integer")
+
     # Actually do the work to create the mirror
-    present, mirrored, error = spack.mirror.create(directory, mirror_specs)
+    mirror_stats = spack.mirror.MirrorStats()
+    present, mirrored, error = spack.mirror.create(
+        directory, mirror_specs, jobs=args.jobs,
+        jobs_per_host=args.jobs_per_host, mirror_stats=mirror_stats)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -317,7 +330,9 @@ def mirror_create(args):
         "Archive stats:",
         "  %-4d already present"  % p,
         "  %-4d added"            % m,
-        "  %-4d failed to fetch." % e)
+        "  %-4d failed to fetch." % e,
+        "  %.1f MB added at %.1f MB/s" % (
+            mirror_stats.bytes_added / 1e6, mirror_stats.throughput() / 1e6))
     if error:
         tty.error("Failed downloads:")
         colify(s.cformat("{name}{@version}") for s in error)
@@ -291,20 +291,34 @@ def refresh(module_type, specs, args):
 
     # If we arrived here we have at least one writer
     module_type_root = writers[0].layout.dirname()
-    spack.modules.common.generate_module_index(module_type_root, writers)
     # Proceed regenerating module files
     tty.msg('Regenerating {name} module files'.format(name=module_type))
     if os.path.isdir(module_type_root) and args.delete_tree:
         shutil.rmtree(module_type_root, ignore_errors=False)
     filesystem.mkdirp(module_type_root)
-    for x in writers:
-        try:
-            x.write(overwrite=True)
-        except Exception as e:
-            tty.debug(e)
-            msg = 'Could not write module file [{0}]'
-            tty.warn(msg.format(x.layout.filename))
-            tty.warn('\t--> {0} <--'.format(str(e)))
+
+    # Skip module files whose inputs did not change since the last refresh
+    recorded = spack.modules.common.read_module_digests(module_type_root)
+    digests = dict((x.spec.dag_hash(), x.digest) for x in writers)
+    outdated = [
+        x for x in writers
+        if digests[x.spec.dag_hash()] is None or
+        digests[x.spec.dag_hash()] != recorded.get(x.spec.dag_hash()) or
+        not os.path.exists(x.layout.filename)]
+    if len(outdated) < len(writers):
+        msg = '{0} module files are up to date'
+        tty.msg(msg.format(len(writers) - len(outdated)))
+
+    failed = spack.modules.common.write_module_files(outdated, overwrite=True)
+    for x, error in failed:
+        msg = 'Could not write module file [{0}]'
+        tty.warn(msg.format(x.layout.filename))
+        tty.warn('\t--> {0} <--'.format(error))
+        # Make sure the next refresh tries again
+        digests.pop(x.spec.dag_hash())
+
+    spack.modules.common.generate_module_index(
+        module_type_root, writers, digests)
 
 
 #: Dictionary populated with the list of sub-commands.
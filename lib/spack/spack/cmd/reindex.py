@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import spack.database
 import spack.store
 
 description = "rebuild Spack's package database"
@@ -10,5 +11,13 @@ section = "admin"
 level = "long"
 
 
+def setup_parser(subparser):
+    subparser.add_argument(
+        '--format', choices=spack.database.index_formats, default=None,
+        help="format of the index file; 'compact' is a binary index that "
+        "is faster to load on large stores (default: keep the current "
+        "format)")
+
+
 def reindex(parser, args):
-    spack.store.store.reindex()
+    spack.store.store.reindex(format=args.format)
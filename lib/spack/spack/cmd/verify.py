@@ -4,6 +4,8 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 from __future__ import print_function
 import argparse
+import json
+import time
 
 import llnl.util.tty as tty
 
@@ -25,6 +27,14 @@ def setup_parser(subparser):
                            help="Ouptut json-formatted errors")
     subparser.add_argument('-a', '--all', action='store_true',
                            help="Verify all packages")
+    subparser.add_argument('--fast', action='store_true',
+                           help="Do not hash files whose size, mtime and "
+                           "inode match the manifest")
+    subparser.add_argument('-t', '--threads', type=int, default=None,
+                           help="Number of threads hashing files")
+    subparser.add_argument('--report', metavar='FILE',
+                           help="Write the progress and throughput of the "
+                           "verification to FILE, as one json object per line")
     subparser.add_argument('files_or_specs', nargs=argparse.REMAINDER,
                            help="Files or specs to verify")
 
@@ -48,7 +58,7 @@ def verify(parser, args):
             return 1
 
         for file in args.files_or_specs:
-            results = spack.verify.check_file_manifest(file)
+            results = spack.verify.check_file_manifest(file, fast=args.fast)
             if results.has_errors():
                 if args.json:
                     print(results.json_string())
@@ -81,9 +91,36 @@ def verify(parser, args):
         setup_parser.parser.print_help()
         return 1
 
-    for spec in specs:
-        tty.debug("Verifying package %s")
-        results = spack.verify.check_spec_manifest(spec)
+    report = open(args.report, 'w') if args.report else None
+    try:
+        return _verify_specs(specs, args, report)
+    finally:
+        if report:
+            report.close()
+
+
+def _verify_specs(specs, args, report):
+    start = time.time()
+    totals = {'files': 0, 'hashed_files': 0, 'hashed_bytes': 0}
+
+    checks = spack.verify.check_spec_manifests(
+        specs, fast=args.fast, threads=args.threads)
+    for i, (spec, results, stats) in enumerate(checks):
+        tty.debug("Verified package %s" % spec.format('{name}/{hash:7}'))
+        for key in totals:
+            totals[key] += stats[key]
+        if report:
+            entry = {
+                'spec': spec.format('{name}/{hash:7}'),
+                'done': i + 1,
+                'total': len(specs),
+                'errors': len(results.errors),
+            }
+            entry.update(stats)
+            entry['bytes_per_second'] = _throughput(
+                stats['hashed_bytes'], stats['seconds'])
+            _write_report_entry(report, entry)
+
         if results.has_errors():
             if args.json:
                 print(results.json_string())
@@ -93,3 +130,19 @@ def verify(parser, args):
             return 1
         else:
             tty.debug(results)
+
+    if report:
+        totals['specs'] = len(specs)
+        totals['seconds'] = time.time() - start
+        totals['bytes_per_second'] = _throughput(
+            totals['hashed_bytes'], totals['seconds'])
+        _write_report_entry(report, {'summary': totals})
+
+
+def _throughput(size, seconds):
+    return int(size / seconds) if seconds > 0 else 0
+
+
+def _write_report_entry(report, entry):
+    report.write(json.dumps(entry, sort_keys=True) + '\n')
+    report.flush()
@@ -31,12 +31,17 @@ schemas are in submodules of :py:mod:`spack.schema`.
 """
 
 import copy
+import hashlib
+import json
 import os
 import re
+import shutil
+import stat
 import sys
 import multiprocessing
 from contextlib import contextmanager
 from six import iteritems
+from six.moves import cPickle
 from ordereddict_backport import OrderedDict
 
 import ruamel.yaml as yaml
@@ -46,6 +51,7 @@ import llnl.util.lang
 import llnl.util.tty as tty
 from llnl.util.filesystem import mkdirp
 
+import spack
 import spack.paths
 import spack.architecture
 import spack.schema
@@ -112,6 +118,19 @@ scopes_metavar = '{defaults,system,site,user}[/PLATFORM]'
 #: Base name for the (internal) overrides scope.
 overrides_base_name = 'overrides-'
 
+#: Per-user cache of parsed and validated configuration files, so that
+#: commands do not parse YAML and run jsonschema on every start. None
+#: disables the cache.
+config_file_cache_path = os.path.join(
+    spack.paths.user_config_path, 'cache', 'config')
+
+#: Version of the entries in the config file cache. Increase it when the
+#: way configuration files are read or validated changes.
+_config_file_cache_version = 1
+
+#: Hashes of the schemas that config files were validated with
+_schema_hashes = {}
+
 
 def first_existing(dictionary, keys):
     """Get the value of the first key in keys that is in the dictionary."""
@@ -133,6 +152,9 @@ class ConfigScope(object):
         self.path = path           # path to directory containing configs.
         self.sections = syaml.syaml_dict()  # sections read from config files.
 
+        #: Incremented whenever the data in this scope may have changed
+        self.generation = 0
+
     def get_section_filename(self, section):
         _validate_section_name(section)
         return os.path.join(self.path, "%s.yaml" % section)
@@ -146,6 +168,7 @@ class ConfigScope(object):
         return self.sections[section]
 
     def write_section(self, section):
+        self.generation += 1
         filename = self.get_section_filename(section)
         data = self.get_section(section)
         validate(data, section_schemas[section])
@@ -162,6 +185,7 @@ class ConfigScope(object):
     def clear(self):
         """Empty cached config information."""
         self.sections = syaml.syaml_dict()
+        self.generation += 1
 
     def __repr__(self):
         return '<ConfigScope: %s: %s>' % (self.name, self.path)
@@ -236,6 +260,7 @@ class SingleFileScope(ConfigScope):
         return self.sections.get(section, None)
 
     def write_section(self, section):
+        self.generation += 1
         validate(self.sections, self.schema)
         try:
             parent = os.path.dirname(self.path)
@@ -297,6 +322,7 @@ class InternalConfigScope(ConfigScope):
 
     def write_section(self, section):
         """This only validates, as the data is already in memory."""
+        self.generation += 1
         data = self.get_section(section)
         if data is not None:
             validate(data, section_schemas[section])
@@ -321,9 +347,17 @@ class Configuration(object):
 
         """
         self.scopes = OrderedDict()
+
+        #: Merged sections, by section name and merged scopes with their
+        #: generation. Cleared whenever scopes are added or removed.
+        self._merged_sections = {}
+
         for scope in scopes:
             self.push_scope(scope)
 
+    def _clear_merged_sections(self):
+        self._merged_sections = {}
+
     def push_scope(self, scope):
         """Add a higher precedence scope to the Configuration."""
         cmd_line_scope = None
@@ -337,14 +371,18 @@ class Configuration(object):
         self.scopes[scope.name] = scope
         if cmd_line_scope:
             self.scopes['command_line'] = cmd_line_scope
+        self._clear_merged_sections()
 
     def pop_scope(self):
         """Remove the highest precedence scope and return it."""
         name, scope = self.scopes.popitem(last=True)
+        self._clear_merged_sections()
         return scope
 
     def remove_scope(self, scope_name):
-        return self.scopes.pop(scope_name)
+        scope = self.scopes.pop(scope_name)
+        self._clear_merged_sections()
+        return scope
 
     @property
     def file_scopes(self):
@@ -400,6 +438,7 @@ class Configuration(object):
         This will cause files to be re-read upon the next request."""
         for scope in self.scopes.values():
             scope.clear()
+        self._clear_merged_sections()
 
     def update_config(self, section, update_data, scope=None):
         """Update the configuration file for a particular scope.
@@ -416,6 +455,7 @@ class Configuration(object):
 
         # read only the requested section's data.
         scope.sections[section] = {section: update_data}
+        self._clear_merged_sections()
         scope.write_section(section)
 
     def get_config(self, section, scope=None):
@@ -442,6 +482,24 @@ class Configuration(object):
            }
 
         """
+        return _copy_containers(self._get_merged_section(section, scope))
+
+    def _get_merged_section(self, section, scope=None):
+        """Like ``get_config()``, but returns the cached merged section
+        itself, which callers must not modify."""
+        if scope is None:
+            scopes = self.scopes.values()
+        else:
+            scopes = [self._validate_scope(scope)]
+        key = (section, tuple((s, s.generation) for s in scopes))
+
+        merged = self._merged_sections.get(key)
+        if merged is None:
+            merged = self._merge_section(section, scope)
+            self._merged_sections[key] = merged
+        return merged
+
+    def _merge_section(self, section, scope=None):
         _validate_section_name(section)
 
         if scope is None:
@@ -488,16 +546,14 @@ class Configuration(object):
         # TODO: Currently only handles maps. Think about lists if neded.
         section, _, rest = path.partition(':')
 
-        value = self.get_config(section, scope=scope)
-        if not rest:
-            return value
-
-        parts = rest.split(':')
-        while parts:
-            key = parts.pop(0)
-            value = value.get(key, default)
+        value = self._get_merged_section(section, scope=scope)
+        if rest:
+            for key in rest.split(':'):
+                value = value.get(key, default)
 
-        return value
+        # Values are shared with the cached section: copy those that
+        # callers could modify
+        return _copy_containers(value)
 
     def set(self, path, value, scope=None):
         """Convenience function for setting single values in config files.
@@ -702,6 +758,11 @@ def _read_config_file(filename, schema):
     elif not os.access(filename, os.R_OK):
         raise ConfigFileError("Config file is not readable: %s" % filename)
 
+    entry, key = _config_file_cache_entry(filename, schema)
+    cached = _read_config_file_cache(entry, key)
+    if cached is not None:
+        return cached[0]
+
     try:
         tty.debug("Reading config file %s" % filename)
         with open(filename) as f:
@@ -709,6 +770,7 @@ def _read_config_file(filename, schema):
 
         if data:
             validate(data, schema)
+        _write_config_file_cache(entry, key, data)
         return data
 
     except MarkedYAMLError as e:
@@ -720,6 +782,90 @@ def _read_config_file(filename, schema):
             "Error reading configuration file %s: %s" % (filename, str(e)))
 
 
+def _schema_hash(schema):
+    """Hash of a schema, which identifies the version of a config file
+    format."""
+    try:
+        return _schema_hashes[id(schema)][1]
+    except KeyError:
+        text = json.dumps(schema, sort_keys=True, default=str)
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        # keep the schema alive, so that its id is not reused
+        _schema_hashes[id(schema)] = (schema, digest)
+        return digest
+
+
+def _config_file_cache_entry(filename, schema):
+    """Get the cache entry of a config file, and the key it must hold.
+
+    Data is cached after validation, with its marks, so it is keyed by
+    the file's path, modification time and size, and by the schema and
+    the Spack and Python versions it was read with.
+
+    Returns:
+        (tuple): path of the entry and key, or Nones if there is no cache
+    """
+    if not config_file_cache_path:
+        return None, None
+
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None, None
+    path = os.path.realpath(filename)
+    versions = (_schema_hash(schema), str(spack.spack_version),
+                sys.version_info[:2], _config_file_cache_version)
+    key = (path, st.st_mtime, st.st_size, versions)
+
+    name = hashlib.sha1(repr((path, versions)).encode('utf-8')).hexdigest()
+    return os.path.join(config_file_cache_path, name), key
+
+
+def _read_config_file_cache(entry, key):
+    """Read data cached for a config file.
+
+    Returns:
+        (tuple): the data in a tuple, or None if it is not in the cache
+    """
+    if entry is None or not os.path.exists(entry):
+        return None
+
+    try:
+        with open(entry, 'rb') as f:
+            cached_key, data = cPickle.load(f)
+    except Exception as e:
+        # Entries may be truncated, or from incompatible versions of Spack
+        tty.debug("Ignoring config file cache entry %s: %s" % (entry, e))
+        return None
+
+    if cached_key != key:
+        return None
+    return (data,)
+
+
+def _write_config_file_cache(entry, key, data):
+    """Store data read from a config file in the cache, if possible."""
+    if entry is None:
+        return
+
+    tmp = '%s.%d.tmp' % (entry, os.getpid())
+    try:
+        mkdirp(os.path.dirname(entry), mode=stat.S_IRWXU)
+        with open(tmp, 'wb') as f:
+            cPickle.dump((key, data), f, protocol=2)
+        os.rename(tmp, entry)
+    except Exception as e:
+        tty.debug("Could not cache config file %s: %s" % (key[0], e))
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def clear_config_file_cache():
+    """Remove all entries from the cache of config files."""
+    if config_file_cache_path and os.path.isdir(config_file_cache_path):
+        shutil.rmtree(config_file_cache_path, ignore_errors=True)
+
+
 def _override(string):
     """Test if a spack YAML string is an override.
 
@@ -751,6 +897,28 @@ def _mark_internal(data, name):
     return d
 
 
+def _copy_containers(data):
+    """Copy a dict or list from a merged section, and the dicts and lists
+    directly in it, sharing everything else.
+
+    This is as deep as merging scopes copies their data, and much cheaper
+    than ``copy.deepcopy()``, which also copies the marks of the data and
+    the text of the files they point to.
+    """
+    if isinstance(data, dict):
+        result = copy.copy(data)
+        for key, value in iteritems(data):
+            if isinstance(value, (dict, list)):
+                result[key] = copy.copy(value)
+        return result
+    elif isinstance(data, list):
+        result = copy.copy(data)
+        result[:] = [copy.copy(x) if isinstance(x, (dict, list)) else x
+                     for x in data]
+        return result
+    return data
+
+
 def _merge_yaml(dest, source):
     """Merges source into dest; entries in source take precedence over dest.
 
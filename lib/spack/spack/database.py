@@ -20,12 +20,15 @@ provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 
 """
+import contextlib
 import datetime
-import time
+import functools
+import json
 import os
-import sys
 import socket
-import contextlib
+import sys
+import time
+import uuid
 from six import string_types
 from six import iteritems
 
@@ -37,13 +40,14 @@ from llnl.util.filesystem import mkdirp
 import spack.store
 import spack.repo
 import spack.spec
+import spack.util.compact_index
 import spack.util.spack_yaml as syaml
 import spack.util.spack_json as sjson
 from spack.filesystem_view import YamlFilesystemView
 from spack.util.crypto import bit_length
 from spack.directory_layout import DirectoryLayoutError
 from spack.error import SpackError
-from spack.version import Version
+from spack.version import Version, VersionList
 from spack.util.lock import Lock, WriteTransaction, ReadTransaction, LockError
 
 # DB goes in this directory underneath the root
@@ -52,7 +56,7 @@ _db_dirname = '.spack-db'
 # DB version.  This is stuck in the DB file to track changes in format.
 # Increment by one when the database format changes.
 # Versions before 5 were not integers.
-_db_version = Version('5')
+_db_version = Version('6')
 
 # For any version combinations here, skip reindex when upgrading.
 # Reindexing can take considerable time and is not always necessary.
@@ -63,14 +67,30 @@ _skip_reindex = [
     # fields.  So, skip the reindex for this transition. The new
     # version is saved to disk the first time the DB is written.
     (Version('0.9.3'), Version('5')),
+
+    # Version 6 adds a journal of changes next to the index file. Version 5
+    # indexes have no journal, so they can be read as they are.
+    (Version('0.9.3'), Version('6')),
+    (Version('5'), Version('6')),
 ]
 
+#: Formats of the index file: JSON, or a memory-mapped binary index
+#: (see :mod:`spack.util.compact_index`)
+index_formats = ('json', 'compact')
+
+# Maximum number of transactions appended to the journal before it is
+# folded back into the index file
+_max_journal_entries = 200
+
 # Timeout for spack database locks in seconds
 _db_lock_timeout = 120
 
 # Types of dependencies tracked by the database
 _tracked_deps = ('link', 'run')
 
+# Version constraint of specs with no version constraint
+_any_version = VersionList([':'])
+
 
 def _now():
     """Returns the time since the epoch"""
@@ -154,7 +174,9 @@ class InstallRecord(object):
             installation_time=None,
             deprecated_for=None
     ):
-        self.spec = spec
+        self._spec = spec
+        self._node = None
+        self._materialize = None
         self.path = str(path) if path else None
         self.installed = bool(installed)
         self.ref_count = ref_count
@@ -162,6 +184,23 @@ class InstallRecord(object):
         self.installation_time = installation_time or _now()
         self.deprecated_for = deprecated_for
 
+    @property
+    def spec(self):
+        if self._spec is None:
+            self._spec = self._materialize()
+            self._node = self._materialize = None
+        return self._spec
+
+    @spec.setter
+    def spec(self, spec):
+        self._spec = spec
+        self._node = self._materialize = None
+
+    @property
+    def materialized(self):
+        """Whether the spec of this record has been constructed."""
+        return self._spec is not None
+
     def install_type_matches(self, installed):
         installed = InstallStatuses.canonicalize(installed)
         if self.installed:
@@ -172,8 +211,13 @@ class InstallRecord(object):
             return InstallStatuses.MISSING in installed
 
     def to_dict(self):
+        if self.materialized:
+            node = self.spec.to_node_dict()
+        else:
+            node = self._node()
+
         rec_dict = {
-            'spec': self.spec.to_node_dict(),
+            'spec': node,
             'path': self.path,
             'installed': self.installed,
             'ref_count': self.ref_count,
@@ -195,6 +239,206 @@ class InstallRecord(object):
 
         return InstallRecord(spec, **d)
 
+    @classmethod
+    def from_node(cls, node, dictionary, materialize):
+        """Create a record whose spec is constructed on first access.
+
+        Args:
+            node: raw spec node, either a
+                :class:`~spack.util.compact_index.LazyNode` or a
+                :class:`NodeDict`
+            dictionary (dict): other fields of the record
+            materialize (function): called without arguments to construct
+                the spec
+        """
+        record = cls.from_dict(None, dictionary)
+        record._node = node
+        record._materialize = materialize
+        return record
+
+
+class NodeDict(object):
+    """Spec node read from a JSON or YAML index.
+
+    Gives node dictionaries the interface of
+    :class:`~spack.util.compact_index.LazyNode`, so that records can be
+    indexed without constructing their specs whatever the index format.
+    """
+
+    __slots__ = ('_node', 'name')
+
+    def __init__(self, node):
+        self._node = node
+        self.name = next(iter(node))
+
+    @property
+    def summary(self):
+        return self._node[self.name]
+
+    @property
+    def dependencies(self):
+        return list(spack.spec.Spec.read_yaml_dep_specs(
+            self.summary.get('dependencies', {})))
+
+    def __call__(self):
+        return self._node
+
+
+class InstallRecordIndex(object):
+    """Secondary indexes over the install records of a database.
+
+    Records are grouped by package name, version, compiler and
+    architecture, so that a query can narrow down the records it needs to
+    check with ``Spec.satisfies()``.  Version, compiler and architecture
+    constraints of the query are matched once against each distinct value
+    in the index rather than once per record.
+
+    Records whose spec has not been constructed yet are indexed from their
+    raw node, and each distinct version, compiler or architecture is parsed
+    only once.
+
+    The index does no locking, and it is up to the database to keep it
+    up to date when records are added or removed.
+    """
+
+    def __init__(self, data=None):
+        self.by_name = {}
+        self.by_version = {}
+        self.by_compiler = {}
+        self.by_architecture = {}
+
+        # Buckets each key was added to, and parsed raw node values
+        self._keys = {}
+        self._parsed = {}
+
+        for key, rec in (data or {}).items():
+            self.add(key, rec)
+
+    def _buckets(self, rec):
+        if rec.materialized:
+            spec = rec.spec
+            name, versions = spec.name, spec.versions
+            compiler, architecture = spec.compiler, spec.architecture
+        else:
+            name, fields = rec._node.name, rec._node.summary
+            versions = self._parse(
+                fields, ('version', 'versions'), VersionList,
+                _any_version)
+            compiler = self._parse(
+                fields, ('compiler',), spack.spec.CompilerSpec)
+            architecture = self._parse(
+                fields, ('arch',), spack.spec.ArchSpec)
+
+        yield self.by_name, name, name
+        yield self.by_version, str(versions), versions
+        yield self.by_compiler, _str_or_none(compiler), compiler
+        yield (self.by_architecture, _str_or_none(architecture),
+               architecture)
+
+    def _parse(self, fields, names, cls, default=None):
+        """Parse node fields with ``cls.from_dict``, once per distinct
+        value."""
+        raw = dict((name, fields[name]) for name in names if name in fields)
+        if not raw:
+            return default
+
+        cache_key = (cls, json.dumps(raw, sort_keys=True))
+        if cache_key not in self._parsed:
+            self._parsed[cache_key] = cls.from_dict(raw)
+        return self._parsed[cache_key]
+
+    def add(self, key, rec):
+        """Index the install record ``rec``, stored under ``key``."""
+        names = []
+        for index, name, value in self._buckets(rec):
+            index.setdefault(name, (value, set()))[1].add(key)
+            names.append((index, name))
+        self._keys[key] = names
+
+    def remove(self, key):
+        """Remove the record stored under ``key`` from the index."""
+        for index, name in self._keys.pop(key, ()):
+            if name in index:
+                keys = index[name][1]
+                keys.discard(key)
+                if not keys:
+                    del index[name]
+
+    def candidates(self, query_spec):
+        """Return keys of the records that may satisfy ``query_spec``.
+
+        Every record whose spec satisfies ``query_spec`` is among the
+        returned keys, but the converse is not true: callers still need to
+        call ``satisfies()`` on the candidates.
+
+        Returns:
+            (set or None): set of candidate keys, or None if the index
+            cannot narrow down the query.
+        """
+        if not isinstance(query_spec, spack.spec.Spec):
+            return None
+
+        # A virtual query is satisfied by providers, whatever their name,
+        # version, compiler, etc.
+        if query_spec.virtual:
+            return None
+
+        result = None
+
+        def narrow(keys):
+            return keys if result is None else result & keys
+
+        if query_spec.name:
+            result = set(self.by_name.get(query_spec.name, (None, ()))[1])
+
+        if query_spec.versions and query_spec.versions != _any_version:
+            result = narrow(self._matching(
+                self.by_version,
+                lambda v: v.satisfies(query_spec.versions)))
+
+        if query_spec.compiler:
+            result = narrow(self._matching(
+                self.by_compiler,
+                lambda c: c.satisfies(query_spec.compiler)))
+
+        if query_spec.architecture:
+            result = narrow(self._matching(
+                self.by_architecture,
+                lambda a: a.satisfies(query_spec.architecture, False)))
+
+        return result
+
+    @staticmethod
+    def _matching(index, predicate):
+        """Union of the keys in ``index`` whose value satisfies
+        ``predicate``.  Records with no value are unconstrained, so they
+        always match."""
+        keys = set()
+        for value, value_keys in index.values():
+            if value is None or (value_keys and predicate(value)):
+                keys |= value_keys
+        return keys
+
+
+def _str_or_none(value):
+    return str(value) if value else None
+
+
+def _load_compact_index(path):
+    """Read a compact index into the same structure as ``index.json``.
+
+    Spec nodes are :class:`~spack.util.compact_index.LazyNode` objects,
+    which are decoded only if the spec of their record is needed.
+    """
+    index = spack.util.compact_index.load(path)
+    return {
+        'database': {
+            'installs': dict(index.records()),
+            'version': index.version,
+            'generation': index.generation,
+        }
+    }
+
 
 class ForbiddenLockError(SpackError):
     """Raised when an upstream DB attempts to acquire a lock"""
@@ -290,6 +534,8 @@ class Database(object):
         # Set up layout of database files within the db dir
         self._old_yaml_index_path = os.path.join(self._db_dir, 'index.yaml')
         self._index_path = os.path.join(self._db_dir, 'index.json')
+        self._compact_index_path = os.path.join(self._db_dir, 'index.bin')
+        self._journal_path = os.path.join(self._db_dir, 'index.journal')
         self._lock_path = os.path.join(self._db_dir, 'lock')
 
         # This is for other classes to use to lock prefix directories.
@@ -319,12 +565,31 @@ class Database(object):
             self.lock = Lock(self._lock_path,
                              default_timeout=self.db_lock_timeout)
         self._data = {}
+        self._index = InstallRecordIndex()
+
+        # Format of the index file, 'json' or 'compact'
+        self._index_format = 'json'
 
         self.upstream_dbs = list(upstream_dbs) if upstream_dbs else []
 
         # whether there was an error at the start of a read transaction
         self._error = None
 
+        # Stat of the index and journal files when they were last read or
+        # written; used to avoid re-reading an index that did not change in
+        # between transactions
+        self._index_file_state = None
+
+        # Identifier of the index file that the journal applies to, number of
+        # entries in the journal, and whether the last entry is truncated
+        self._generation = None
+        self._journal_entries = 0
+        self._journal_truncated = False
+
+        # State of the records as last read or written, used to append only
+        # the records changed by a transaction to the journal
+        self._saved_records = None
+
         # For testing: if this is true, an exception is thrown when missing
         # dependencies are detected (rather than just printing a warning
         # message)
@@ -398,14 +663,20 @@ class Database(object):
         else:
             prefix_lock.release_write()
 
-    def _write_to_file(self, stream):
-        """Write out the databsae to a JSON file.
+    def _write_to_file(self, stream, format='json'):
+        """Write out the databsae to a JSON file, or to a binary stream if
+        ``format`` is ``'compact'``.
 
         This function does not do any locking or transactions.
         """
         # map from per-spec hash code to installation record.
         installs = dict((k, v.to_dict()) for k, v in self._data.items())
 
+        if format == 'compact':
+            spack.util.compact_index.dump(
+                installs, str(_db_version), self._generation, stream)
+            return
+
         # database includes installation list and version.
 
         # NOTE: this DB version does not handle multiple installs of
@@ -418,6 +689,8 @@ class Database(object):
                 'version': str(_db_version)
             }
         }
+        if self._generation:
+            database['database']['generation'] = self._generation
 
         try:
             sjson.dump(database, stream)
@@ -425,22 +698,51 @@ class Database(object):
             raise syaml.SpackYAMLError(
                 "error writing YAML database:", str(e))
 
-    def _read_spec_from_dict(self, hash_key, installs):
-        """Recursively construct a spec from a hash in a YAML database.
+    def _materialize_spec(self, hash_key, node, data):
+        """Construct the spec of a record from its raw node.
+
+        Dependencies are taken from the other records in ``data`` (or
+        upstream), so that ALL specs in the database share nodes (i.e.,
+        its specs are a true Merkle DAG, unlike most specs.)  Missing
+        dependencies were reported when the database was read.
 
         Does not do any locking.
         """
-        spec_dict = installs[hash_key]['spec']
+        try:
+            # Install records don't include hash with spec, so we add it in
+            # here to ensure it is read properly.
+            fields = dict(node()[node.name])
+            fields['hash'] = hash_key
+            spec = spack.spec.Spec.from_node_dict({node.name: fields})
 
-        # Install records don't include hash with spec, so we add it in here
-        # to ensure it is read properly.
-        for name in spec_dict:
-            spec_dict[name]['hash'] = hash_key
+            for dname, dhash, dtypes in node.dependencies:
+                # It is important that we always check upstream installations
+                # in the same order, and that we always check the local
+                # installation first: if a downstream Spack installs a package
+                # then dependents in that installation could be using it.
+                # If a hash is installed locally and upstream, there isn't
+                # enough information to determine which one a local package
+                # depends on, so the convention ensures that this isn't an
+                # issue.
+                upstream, record = self.query_by_spec_hash(dhash, data=data)
+                if record:
+                    spec._add_dependency(record.spec, dtypes)
+        except CorruptDatabaseError:
+            raise
+        except Exception as e:
+            self._invalid_record(hash_key, e)
 
-        # Build spec from dict first.
-        spec = spack.spec.Spec.from_node_dict(spec_dict)
+        # Mark the spec concrete only once its dependencies are connected,
+        # as doing it earlier causes hashes to be cached prematurely.
+        spec._mark_concrete()
         return spec
 
+    def _invalid_record(self, hash_key, error):
+        msg = ("Invalid record in Spack database: "
+               "hash: %s, cause: %s: %s")
+        msg %= (hash_key, type(error).__name__, str(error))
+        raise CorruptDatabaseError(msg, self._index_path)
+
     def db_for_spec_hash(self, hash_key):
         with self.read_transaction():
             if hash_key in self._data:
@@ -462,54 +764,53 @@ class Database(object):
                 return True, db._data[hash_key]
         return False, None
 
-    def _assign_dependencies(self, hash_key, installs, data):
-        # Add dependencies from other records in the install DB to
-        # form a full spec.
-        spec = data[hash_key].spec
-        spec_dict = installs[hash_key]['spec']
-        if 'dependencies' in spec_dict[spec.name]:
-            yaml_deps = spec_dict[spec.name]['dependencies']
-            for dname, dhash, dtypes in spack.spec.Spec.read_yaml_dep_specs(
-                    yaml_deps):
-                # It is important that we always check upstream installations
-                # in the same order, and that we always check the local
-                # installation first: if a downstream Spack installs a package
-                # then dependents in that installation could be using it.
-                # If a hash is installed locally and upstream, there isn't
-                # enough information to determine which one a local package
-                # depends on, so the convention ensures that this isn't an
-                # issue.
-                upstream, record = self.query_by_spec_hash(dhash, data=data)
-                child = record.spec if record else None
+    def _check_dependencies(self, data):
+        """Warn about dependencies of records that are not in the database.
+        """
+        for hash_key, rec in data.items():
+            try:
+                dependencies = rec._node.dependencies
+            except Exception as e:
+                self._invalid_record(hash_key, e)
 
-                if not child:
+            for dname, dhash, _ in dependencies:
+                upstream, record = self.query_by_spec_hash(dhash, data=data)
+                if not record:
                     msg = ("Missing dependency not in database: "
                            "%s needs %s-%s" % (
-                               spec.cformat('{name}{/hash:7}'),
+                               '%s/%s' % (rec._node.name, hash_key[:7]),
                                dname, dhash[:7]))
                     if self._fail_when_missing_deps:
                         raise MissingDependenciesError(msg)
                     tty.warn(msg)
-                    continue
 
-                spec._add_dependency(child, dtypes)
-
-    def _read_from_file(self, stream, format='json'):
+    def _read_from_file(self, stream, format='json', journal=None):
         """
         Fill database from file, do not maintain old data
-        Translate the spec portions from node-dict form to spec form
+
+        Specs are not constructed from their node-dict form until they are
+        first needed: records are indexed from the raw nodes, and each
+        spec is built on first access by ``_materialize_spec()``.
+
+        If ``journal`` is the path of a journal, the changes recorded in it
+        are applied on top of the records read from ``stream``.
+
+        A compact index can only be read from a path.
 
         Does not do any locking.
         """
-        if format.lower() == 'json':
+        format = format.lower()
+        if format == 'json':
             load = sjson.load
-        elif format.lower() == 'yaml':
+        elif format == 'yaml':
             load = syaml.load
+        elif format == 'compact':
+            load = _load_compact_index
         else:
             raise ValueError("Invalid database format: %s" % format)
 
         try:
-            if isinstance(stream, string_types):
+            if isinstance(stream, string_types) and format != 'compact':
                 with open(stream, 'r') as f:
                     fdata = load(f)
             else:
@@ -536,6 +837,12 @@ class Database(object):
 
         installs = db['installs']
 
+        self._generation = db.get('generation')
+        self._journal_entries = 0
+        self._journal_truncated = False
+        if journal:
+            self._replay_journal(journal, installs)
+
         # TODO: better version checking semantics.
         version = Version(db['version'])
         if version > _db_version:
@@ -555,80 +862,115 @@ class Database(object):
                     (k, v.to_dict()) for k, v in self._data.items()
                 )
 
-        def invalid_record(hash_key, error):
-            msg = ("Invalid record in Spack database: "
-                   "hash: %s, cause: %s: %s")
-            msg %= (hash_key, type(error).__name__, str(error))
-            raise CorruptDatabaseError(msg, self._index_path)
-
-        # Build up the database in three passes:
-        #
-        #   1. Read in all specs without dependencies.
-        #   2. Hook dependencies up among specs.
-        #   3. Mark all specs concrete.
-        #
-        # The database is built up so that ALL specs in it share nodes
-        # (i.e., its specs are a true Merkle DAG, unlike most specs.)
-
-        # Pass 1: Iterate through database and build specs w/o dependencies
+        # Create the records, deferring the construction of their specs.
         data = {}
         for hash_key, rec in installs.items():
             try:
-                # This constructs a spec DAG from the list of all installs
-                spec = self._read_spec_from_dict(hash_key, installs)
-
-                # Insert the brand new spec in the database.  Each
-                # spec has its own copies of its dependency specs.
-                # TODO: would a more immmutable spec implementation simplify
-                #       this?
-                data[hash_key] = InstallRecord.from_dict(spec, rec)
+                node = rec['spec']
+                if not isinstance(node, spack.util.compact_index.LazyNode):
+                    node = NodeDict(node)
+
+                materialize = functools.partial(
+                    self._materialize_spec, hash_key, node, data)
+                data[hash_key] = InstallRecord.from_node(
+                    node, rec, materialize)
             except Exception as e:
-                invalid_record(hash_key, e)
+                self._invalid_record(hash_key, e)
 
-        # Pass 2: Assign dependencies once all specs are created.
-        for hash_key in data:
-            try:
-                self._assign_dependencies(hash_key, installs, data)
-            except MissingDependenciesError:
-                raise
-            except Exception as e:
-                invalid_record(hash_key, e)
+        self._check_dependencies(data)
 
-        # Pass 3: Mark all specs concrete.  Specs representing real
-        # installations must be explicitly marked.
-        # We do this *after* all dependencies are connected because if we
-        # do it *while* we're constructing specs,it causes hashes to be
-        # cached prematurely.
-        for hash_key, rec in data.items():
-            rec.spec._mark_concrete()
+        try:
+            index = InstallRecordIndex(data)
+        except Exception as e:
+            raise CorruptDatabaseError(
+                "error indexing database:", str(e))
 
         self._data = data
+        self._index = index
+
+    def _replay_journal(self, journal, installs):
+        """Apply the changes recorded in a journal to raw install records.
+
+        Only entries written for the current index file are applied:
+        entries left over from before the last compaction are skipped.
+
+        Does not do any locking.
+        """
+        if not os.path.isfile(journal):
+            return
+
+        with open(journal, 'r') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # An append was interrupted; compact at the next write
+                    self._journal_truncated = True
+                    break
+
+                self._journal_entries += 1
+                try:
+                    entry = sjson.load(line)
+                except Exception as e:
+                    raise CorruptDatabaseError(
+                        "error parsing database journal:", str(e))
+
+                if (self._generation is None or
+                        entry.get('generation') != self._generation):
+                    continue
+
+                installs.update(entry['installs'])
+                for hash_key in entry['removed']:
+                    installs.pop(hash_key, None)
 
-    def reindex(self, directory_layout):
+    def reindex(self, directory_layout, format=None):
         """Build database index from scratch based on a directory layout.
 
         Locks the DB if it isn't locked already.
 
+        Args:
+            directory_layout (DirectoryLayout): layout of the installations
+            format (str, optional): format of the new index file, either
+                ``'json'`` or ``'compact'``.  Defaults to the format of the
+                current index file.
+
         """
         if self.is_upstream:
             raise UpstreamDatabaseLockingError(
                 "Cannot reindex an upstream database")
 
+        if format not in (None,) + index_formats:
+            raise ValueError("Invalid database format: %s" % format)
+
         # Special transaction to avoid recursive reindex calls and to
         # ignore errors if we need to rebuild a corrupt database.
         def _read_suppress_error():
+            # Every record is rebuilt: write a whole new index
+            self._saved_records = None
             try:
-                if os.path.isfile(self._index_path):
-                    self._read_from_file(self._index_path)
+                index_path, index_format = self._find_index_file()
+                if index_path:
+                    self._index_format = index_format
+                    self._read_from_file(
+                        index_path, format=index_format,
+                        journal=self._journal_path)
+
+                    # Specs are constructed lazily: construct them all now,
+                    # so that invalid records are found while errors are
+                    # suppressed, not while the database is rebuilt.
+                    for record in self._data.values():
+                        record.spec
             except CorruptDatabaseError as e:
                 self._error = e
                 self._data = {}
+                self._index = InstallRecordIndex()
 
         transaction = WriteTransaction(
             self.lock, acquire=_read_suppress_error, release=self._write
         )
 
         with transaction:
+            if format:
+                self._index_format = format
+
             if self._error:
                 tty.warn(
                     "Spack database was corrupt. Will rebuild. Error was:",
@@ -643,6 +985,7 @@ class Database(object):
             except BaseException:
                 # If anything explodes, restore old data, skip write.
                 self._data = old_data
+                self._index = InstallRecordIndex(old_data)
                 raise
 
     def _construct_entry_from_directory_layout(self, directory_layout,
@@ -679,6 +1022,7 @@ class Database(object):
         with directory_layout.disable_upstream_check():
             # Initialize data in the reconstructed DB
             self._data = {}
+            self._index = InstallRecordIndex()
 
             # Start inspecting the installed prefixes
             processed_specs = set()
@@ -771,21 +1115,49 @@ class Database(object):
         database *may* be left in an inconsistent state.  It will be consistent
         after the start of the next transaction, when it read from disk again.
 
+        Records changed by the transaction are appended to the journal when
+        possible; otherwise, or once the journal grows too long, the whole
+        index file is written again and the journal discarded.
+
         This routine does no locking.
 
         """
         # Do not write if exceptions were raised
         if type is not None:
+            # The in-memory database may be inconsistent: make sure it is
+            # read again from file at the start of the next transaction.
+            self._index_file_state = None
             return
 
-        temp_file = self._index_path + (
+        try:
+            if not self._append_to_journal():
+                self._write_index()
+            self._index_file_state = self._current_index_file_state()
+            self._saved_records = self._record_states()
+        except BaseException:
+            self._index_file_state = None
+            raise
+
+    def _write_index(self):
+        """Write all records to a new index file and remove the journal.
+
+        The index is written in the current format, and an index in the
+        other format is removed.
+        """
+        index_path = self._index_path_for(self._index_format)
+        temp_file = index_path + (
             '.%s.%s.temp' % (socket.getfqdn(), os.getpid()))
+        mode = 'wb' if self._index_format == 'compact' else 'w'
+
+        # A new generation tells readers to ignore the current journal, in
+        # case we fail to remove it below
+        self._generation = uuid.uuid4().hex
 
         # Write a temporary database file them move it into place
         try:
-            with open(temp_file, 'w') as f:
-                self._write_to_file(f)
-            os.rename(temp_file, self._index_path)
+            with open(temp_file, mode) as f:
+                self._write_to_file(f, format=self._index_format)
+            os.rename(temp_file, index_path)
         except BaseException as e:
             tty.debug(e)
             # Clean up temp file if something goes wrong.
@@ -793,6 +1165,106 @@ class Database(object):
                 os.remove(temp_file)
             raise
 
+        for path in (self._index_path, self._compact_index_path):
+            if path != index_path and os.path.exists(path):
+                os.remove(path)
+
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._journal_entries = 0
+        self._journal_truncated = False
+
+    def _append_to_journal(self):
+        """Append the records changed since the last read or write.
+
+        Returns:
+            (bool): True if the changes were journaled (or if there were
+            none), False if the whole index needs to be written instead.
+        """
+        if (self._saved_records is None or self._generation is None or
+                self._journal_truncated or
+                self._journal_entries >= _max_journal_entries or
+                not os.path.isfile(self._index_path_for(self._index_format))):
+            return False
+
+        states = self._record_states()
+        changed = [key for key, state in states.items()
+                   if self._saved_records.get(key) != state]
+        removed = [key for key in self._saved_records if key not in states]
+
+        if not changed and not removed:
+            return True
+
+        # Large changes (e.g. a reindex) are better written as a whole
+        if len(changed) + len(removed) > len(states) // 2:
+            return False
+
+        entry = {
+            'generation': self._generation,
+            'installs': dict((key, self._data[key].to_dict())
+                             for key in changed),
+            'removed': removed,
+        }
+        with open(self._journal_path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal_entries += 1
+        return True
+
+    def _record_states(self):
+        """Return what is written to disk about each record, cheaply."""
+        return dict(
+            (key, (id(rec), rec.path, rec.installed, rec.ref_count,
+                   rec.explicit, rec.installation_time, rec.deprecated_for))
+            for key, rec in self._data.items())
+
+    def _current_index_file_state(self):
+        """Return what identifies the current version of the index files.
+
+        Every write either replaces the index file with a new one or appends
+        to the journal, so the inode, size and modification time of the two
+        files together change whenever another process modifies the
+        database.
+        """
+        def file_state(path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+            return stat.st_ino, stat.st_size, mtime
+
+        index_states = (file_state(self._index_path),
+                        file_state(self._compact_index_path))
+        if index_states == (None, None):
+            return None
+        return index_states + (file_state(self._journal_path),)
+
+    def _index_path_for(self, format):
+        """Path of the index file in a given format."""
+        if format == 'compact':
+            return self._compact_index_path
+        return self._index_path
+
+    def _find_index_file(self):
+        """Return the path and format of the index file, or (None, None) if
+        there is no index.
+
+        If there is an index in both formats (e.g., because converting it
+        was interrupted), the most recently written one is used.
+        """
+        found = []
+        for format in index_formats:
+            path = self._index_path_for(format)
+            try:
+                found.append((os.stat(path).st_mtime, path, format))
+            except OSError:
+                continue
+
+        if not found:
+            return None, None
+        _, path, format = max(found)
+        return path, format
+
     def _read(self):
         """Re-read Database from the data in the set location.
 
@@ -801,14 +1273,29 @@ class Database(object):
         taking a write lock.
 
         """
-        if os.path.isfile(self._index_path):
-            # Read from JSON file if a JSON database exists
-            self._read_from_file(self._index_path, format='json')
+        index_path, index_format = self._find_index_file()
+        if index_path:
+            # Nothing to do if no other process wrote the index since we
+            # last read or wrote it.
+            current_state = self._current_index_file_state()
+            if (current_state is not None and
+                    current_state == self._index_file_state):
+                return
+
+            # Read from JSON or compact file if such a database exists
+            self._index_file_state = None
+            self._saved_records = None
+            self._index_format = index_format
+            self._read_from_file(
+                index_path, format=index_format, journal=self._journal_path)
+            self._index_file_state = current_state
+            self._saved_records = self._record_states()
 
         elif os.path.isfile(self._old_yaml_index_path):
             if (not self.is_upstream) and os.access(
                     self._db_dir, os.R_OK | os.W_OK):
                 # if we can write, then read AND write a JSON file.
+                self._saved_records = None
                 self._read_from_file(self._old_yaml_index_path, format='yaml')
                 with WriteTransaction(self.lock):
                     self._write(None, None, None)
@@ -903,6 +1390,7 @@ class Database(object):
             self._data[key] = InstallRecord(
                 new_spec, path, installed, ref_count=0, **extra_args
             )
+            self._index.add(key, self._data[key])
 
             # Connect dependencies from the DB to the new copy.
             for name, dep in iteritems(spec.dependencies_dict(_tracked_deps)):
@@ -965,6 +1453,7 @@ class Database(object):
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
+            self._index.remove(key)
             for dep in spec.dependencies(_tracked_deps):
                 self._decrement_ref_count(dep)
 
@@ -988,6 +1477,7 @@ class Database(object):
             return rec.spec
 
         del self._data[key]
+        self._index.remove(key)
         for dep in rec.spec.dependencies(_tracked_deps):
             self._decrement_ref_count(dep)
 
@@ -1062,8 +1552,17 @@ class Database(object):
         if direction not in ('parents', 'children'):
             raise ValueError("Invalid direction: %s" % direction)
 
+        specs = self.query(spec)
+        if direction == 'parents':
+            # Dependents are only connected to specs once constructed
+            keys = [s.dag_hash() for s in specs]
+            with self.read_transaction():
+                self._materialize_dependents(keys)
+            for db in self.upstream_dbs:
+                db._materialize_dependents(keys)
+
         relatives = set()
-        for spec in self.query(spec):
+        for spec in specs:
             if transitive:
                 to_add = spec.traverse(
                     direction=direction, root=False, deptype=deptype)
@@ -1091,6 +1590,30 @@ class Database(object):
                 relatives.add(relative)
         return relatives
 
+    def _materialize_dependents(self, hash_keys):
+        """Construct the specs of the records that depend, directly or
+        transitively, on the given hashes.
+
+        Does not do any locking.
+        """
+        parents = {}
+        for key, rec in self._data.items():
+            if rec.materialized:
+                dependencies = [d.dag_hash() for d in rec.spec.dependencies()]
+            else:
+                dependencies = [h for _, h, _ in rec._node.dependencies]
+            for dep_key in dependencies:
+                parents.setdefault(dep_key, []).append(key)
+
+        stack = list(hash_keys)
+        visited = set(stack)
+        while stack:
+            for key in parents.get(stack.pop(), ()):
+                if key not in visited:
+                    visited.add(key)
+                    stack.append(key)
+                    self._data[key].spec  # constructs the spec
+
     @_autospec
     def installed_extensions_for(self, extendee_spec):
         """
@@ -1204,6 +1727,8 @@ class Database(object):
             hashes=None
     ):
         """Run a query on the database."""
+        if isinstance(query_spec, string_types):
+            query_spec = spack.spec.Spec(query_spec)
 
         # TODO: Specs are a lot like queries.  Should there be a
         # TODO: wildcard spec object, and should specs have attributes
@@ -1220,14 +1745,20 @@ class Database(object):
             else:
                 return []
 
-        # Abstract specs require more work -- currently we test
-        # against everything.
+        # Abstract specs require more work -- narrow down the records
+        # with the index, then test the remaining candidates.
         results = []
         start_date = start_date or datetime.datetime.min
         end_date = end_date or datetime.datetime.max
 
-        for key, rec in self._data.items():
-            if hashes is not None and rec.spec.dag_hash() not in hashes:
+        candidates = self._index.candidates(query_spec)
+        if candidates is None:
+            records = self._data.items()
+        else:
+            records = ((key, self._data[key]) for key in candidates)
+
+        for key, rec in records:
+            if hashes is not None and key not in hashes:
                 continue
 
             if not rec.install_type_matches(installed):
@@ -1262,6 +1793,10 @@ class Database(object):
 
     def query(self, *args, **kwargs):
         """Query the Spack database including all upstream databases."""
+        # Parse a query string once rather than once per database record
+        if args and isinstance(args[0], string_types):
+            args = (spack.spec.Spec(args[0]),) + args[1:]
+
         upstream_results = []
         for upstream_db in self.upstream_dbs:
             # queries for upstream DBs need to *not* lock - we may not
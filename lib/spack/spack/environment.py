@@ -10,6 +10,7 @@ import sys
 import shutil
 import copy
 import socket
+import tempfile
 
 import six
 
@@ -447,7 +448,7 @@ def _eval_conditional(string):
 
 class ViewDescriptor(object):
     def __init__(self, root, projections={}, select=[], exclude=[],
-                 link=default_view_link):
+                 link=default_view_link, atomic=False):
         self.root = root
         self.projections = projections
         self.select = select
@@ -456,13 +457,15 @@ class ViewDescriptor(object):
         self.exclude_fn = lambda x: not any(x.satisfies(e)
                                             for e in self.exclude)
         self.link = link
+        self.atomic = atomic
 
     def __eq__(self, other):
         return all([self.root == other.root,
                     self.projections == other.projections,
                     self.select == other.select,
                     self.exclude == other.exclude,
-                    self.link == other.link])
+                    self.link == other.link,
+                    self.atomic == other.atomic])
 
     def to_dict(self):
         ret = {'root': self.root}
@@ -474,6 +477,8 @@ class ViewDescriptor(object):
             ret['exclude'] = self.exclude
         if self.link != default_view_link:
             ret['link'] = self.link
+        if self.atomic:
+            ret['atomic'] = self.atomic
         return ret
 
     @staticmethod
@@ -482,10 +487,11 @@ class ViewDescriptor(object):
                               d.get('projections', {}),
                               d.get('select', []),
                               d.get('exclude', []),
-                              d.get('link', default_view_link))
+                              d.get('link', default_view_link),
+                              d.get('atomic', False))
 
-    def view(self):
-        return YamlFilesystemView(self.root, spack.store.layout,
+    def view(self, root=None):
+        return YamlFilesystemView(root or self.root, spack.store.layout,
                                   ignore_conflicts=True,
                                   projections=self.projections)
 
@@ -527,10 +533,19 @@ class ViewDescriptor(object):
             installed_specs_for_view = set(
                 s for s in specs_for_view if s in self and s.package.installed)
 
+            if self.atomic and self._regenerate_atomic(
+                    installed_specs_for_view):
+                return
+
             view = self.view()
 
-            view.clean()
-            specs_in_view = set(view.get_all_specs())
+            if view.get_all_hashes() is None:
+                # older views do not have a manifest: remove what was left
+                # by uninstalled packages and start keeping one
+                view.clean()
+                view.init_manifest()
+            specs_in_view = self._specs_in_view(
+                view, installed_specs_for_view)
             tty.msg("Updating view at {0}".format(self.root))
 
             rm_specs = specs_in_view - installed_specs_for_view
@@ -542,6 +557,94 @@ class ViewDescriptor(object):
                               all_specs=specs_in_view)
             view.add_specs(*add_specs, with_dependencies=False)
 
+    def _specs_in_view(self, view, wanted):
+        """Specs linked in ``view``, from its manifest.
+
+        Specs that are also in ``wanted`` are taken from there, so only the
+        spec files of the specs to be removed from the view are read. Specs
+        whose spec file cannot be read are removed from the view right away.
+        """
+        wanted = dict((s.dag_hash(), s) for s in wanted)
+        specs, unreadable = set(), []
+        for dag_hash in view.get_all_hashes():
+            spec = wanted.get(dag_hash) or view.get_spec_by_hash(dag_hash)
+            if spec:
+                specs.add(spec)
+            else:
+                unreadable.append(dag_hash)
+
+        # Specs that were uninstalled only left broken links behind
+        if unreadable:
+            view.remove_hashes(*unreadable)
+        return specs
+
+    def _regenerate_atomic(self, specs):
+        """Build the view in a new directory and replace the old view with
+        it at once, by pointing the symlink at the root of the view to it.
+
+        Returns:
+            bool: False if the root of the view is not a symlink, and the
+            view has to be updated in place instead
+        """
+        root = self.root
+        if os.path.lexists(root) and not os.path.islink(root):
+            tty.warn("Cannot update view at {0} atomically, as it is not a "
+                     "symlink. Updating it in place.".format(root))
+            return False
+
+        old = self._atomic_view_dir()
+        if old:
+            hashes = self.view(old).get_all_hashes()
+            if hashes == set(s.dag_hash() for s in specs):
+                return True
+
+        tty.msg("Updating view at {0}".format(root))
+        parent, name = os.path.split(os.path.abspath(root))
+        fs.mkdirp(parent)
+        staging = tempfile.mkdtemp(prefix=self._atomic_prefix, dir=parent)
+        try:
+            os.chmod(staging, 0o755)
+            self.view(staging).add_specs(*specs, with_dependencies=False)
+
+            # renaming a symlink over another one is atomic
+            tmp_link = os.path.join(parent, '.%s.tmp' % os.path.basename(
+                staging))
+            os.symlink(staging, tmp_link)
+            os.rename(tmp_link, root)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+        return True
+
+    @property
+    def _atomic_prefix(self):
+        return '.%s-' % os.path.basename(os.path.abspath(self.root))
+
+    def _atomic_view_dir(self):
+        """Directory the root of an atomic view points to, or None if the
+        root is not a symlink to a directory created by Spack."""
+        if not os.path.islink(self.root):
+            return None
+        target = os.path.realpath(self.root)
+        parent = os.path.realpath(os.path.dirname(os.path.abspath(self.root)))
+        if (os.path.dirname(target) == parent and os.path.isdir(target) and
+                os.path.basename(target).startswith(self._atomic_prefix)):
+            return target
+        return None
+
+    def destroy(self):
+        """Remove the view from the filesystem."""
+        if os.path.islink(self.root):
+            target = self._atomic_view_dir()
+            os.remove(self.root)
+            if target:
+                shutil.rmtree(target)
+        elif os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
 
 class Environment(object):
     def __init__(self, path, init_file=None, with_view=None):
@@ -1047,7 +1150,7 @@ class Environment(object):
     def update_default_view(self, viewpath):
         name = default_view_name
         if name in self.views and self.default_view.root != viewpath:
-            shutil.rmtree(self.default_view.root)
+            self.default_view.destroy()
 
         if viewpath:
             if name in self.views:
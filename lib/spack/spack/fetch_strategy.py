@@ -28,6 +28,9 @@ import sys
 import re
 import shutil
 import copy
+import hashlib
+import json
+import tempfile
 import xml.etree.ElementTree
 from functools import wraps
 from six import string_types, with_metaclass
@@ -37,6 +40,7 @@ import llnl.util.tty as tty
 from llnl.util.filesystem import (
     working_dir, mkdirp, temp_rename, temp_cwd, get_single_file)
 
+import spack.caches
 import spack.config
 import spack.error
 import spack.util.crypto as crypto
@@ -427,9 +431,16 @@ class URLFetchStrategy(FetchStrategy):
         tarball_container = os.path.join(self.stage.path,
                                          "spack-expanded-archive")
 
-        mkdirp(tarball_container)
-        with working_dir(tarball_container):
-            decompress(self.archive_file)
+        # gunzip decompresses next to the archive rather than in the
+        # working directory, so its output cannot be cached
+        cache = spack.caches.expanded_source_cache()
+        if cache and os.path.basename(decompress.path) != 'gunzip':
+            cache.expand(self.archive_file, self.extension, decompress,
+                         tarball_container)
+        else:
+            mkdirp(tarball_container)
+            with working_dir(tarball_container):
+                decompress(self.archive_file)
 
         # Check for an exploding tarball, i.e. one that doesn't expand to
         # a single directory.  If the tarball *didn't* explode, move its
@@ -1383,6 +1394,125 @@ class FsCache(object):
         shutil.rmtree(self.root, ignore_errors=True)
 
 
+class ExpandedSourceCache(object):
+    """Filesystem cache of expanded source archives.
+
+    Entries are keyed by the sha256 and the extension of an archive. They
+    hold its expansion, before any patch is applied, and a manifest with
+    the size and mtime of each file. Stages are populated with copy-on-write
+    clones of an entry when the filesystem supports them, and with copies
+    of its files otherwise, so that builds never modify the entry. If a file
+    of an entry was modified anyway, the manifest no longer matches and the
+    archive is expanded again.
+    """
+
+    #: Whether copy-on-write clones work, by root, once they were tried
+    _reflink = {}
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def expand(self, archive_file, extension, decompress, dest):
+        """Expand an archive into ``dest``, which must not exist, using the
+        entry of the archive (created first if needed).
+
+        Args:
+            archive_file (str): path of the archive
+            extension (str): extension of the archive
+            decompress (Executable): decompressor for the archive, which
+                expands it into the working directory
+            dest (str): where to expand the archive
+        """
+        # The checksum of the package may not have been verified, so the
+        # key is computed from the archive itself
+        sha256 = crypto.checksum(hashlib.sha256, archive_file)
+        entry = os.path.join(self.root, '%s-%s' % (sha256, extension))
+
+        if not self._is_valid(entry):
+            self._store(entry, archive_file, decompress)
+        else:
+            tty.debug('Using expanded source in %s' % entry)
+        self._clone(os.path.join(entry, 'source'), dest)
+
+    def _is_valid(self, entry):
+        """Whether ``entry`` exists and none of its files were modified.
+        Invalid entries are removed."""
+        manifest_path = os.path.join(entry, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return False
+
+        source = os.path.join(entry, 'source')
+        try:
+            with open(manifest_path) as f:
+                files = json.load(f)['files']
+            for path, (size, mtime) in files.items():
+                st = os.lstat(os.path.join(source, path))
+                if st.st_size != size or int(st.st_mtime) != mtime:
+                    raise ValueError('%s was modified' % path)
+        except (OSError, IOError, ValueError, KeyError) as e:
+            tty.debug('Removing invalid expanded source %s: %s' % (entry, e))
+            self._remove(entry)
+            return False
+        return True
+
+    def _store(self, entry, archive_file, decompress):
+        mkdirp(self.root)
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            source = os.path.join(tmp, 'source')
+            mkdirp(source)
+            with working_dir(source):
+                decompress(archive_file)
+
+            files = {}
+            for root, _, names in os.walk(source):
+                for name in names:
+                    path = os.path.join(root, name)
+                    st = os.lstat(path)
+                    if not os.path.islink(path):
+                        files[os.path.relpath(path, source)] = [
+                            st.st_size, int(st.st_mtime)]
+            with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+                json.dump({'files': files}, f)
+
+            # Another process may have stored the same archive meanwhile
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _clone(self, source, dest):
+        reflink = self._reflink.get(self.root)
+        if reflink is not False and sys.platform.startswith('linux'):
+            cp = which('cp')
+            if cp:
+                mkdirp(dest)
+                cp('-a', '--reflink=always', os.path.join(source, '.'), dest,
+                   fail_on_error=False, output=os.devnull, error=os.devnull)
+                self._reflink[self.root] = cp.returncode == 0
+                if cp.returncode == 0:
+                    return
+                shutil.rmtree(dest)
+
+        # Hard links would let builds modify the entry through the stage
+        shutil.copytree(source, dest, symlinks=True)
+
+    def _remove(self, entry):
+        # Rename first, so that no other process uses a partial entry
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            os.rename(entry, os.path.join(tmp, 'entry'))
+        except OSError:
+            pass
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    def destroy(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
 class FetchError(spack.error.SpackError):
     """Superclass fo fetcher errors."""
 
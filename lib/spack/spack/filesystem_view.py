@@ -3,14 +3,17 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import contextlib
 import filecmp
 import functools as ft
+import json
 import os
 import re
 import shutil
 import sys
 
-from llnl.util.link_tree import LinkTree, MergeConflictError
+from llnl.util.link_tree import (
+    LinkTree, MergeConflictError, merge_directory_list, unmerge_directory_list)
 from llnl.util import tty
 from llnl.util.lang import match_predicate, index_by
 from llnl.util.tty.color import colorize
@@ -39,6 +42,13 @@ __all__ = ["FilesystemView", "YamlFilesystemView"]
 
 _projections_path = '.spack/projections.yaml'
 
+#: Records, for each spec in a view, its metadata folder and the files and
+#: directories it contributed, so that the view can be updated incrementally
+_manifest_path = '.spack/view-manifest.json'
+
+#: Version of the manifest format
+_manifest_version = 1
+
 
 class FilesystemView(object):
     """
@@ -186,6 +196,17 @@ class YamlFilesystemView(FilesystemView):
     def __init__(self, root, layout, **kwargs):
         super(YamlFilesystemView, self).__init__(root, layout, **kwargs)
 
+        # Only keep a manifest for views that had one or are new. Anything
+        # else may contain specs that are not in a manifest.
+        self.manifest_path = os.path.join(self._root, _manifest_path)
+        self._manifest = None
+        self._keep_manifest = (os.path.exists(self.manifest_path) or
+                               not os.path.exists(self._root) or
+                               not os.listdir(self._root))
+        self._manifest_batch_depth = 0
+        self._manifest_dirty = False
+        self._purge_candidates = set()
+
         # Super class gets projections from the kwargs
         # YAML specific to get projections from YAML file
         self.projections_path = os.path.join(self._root, _projections_path)
@@ -223,7 +244,136 @@ class YamlFilesystemView(FilesystemView):
         else:
             return {}
 
+    @property
+    def manifest(self):
+        """Dictionary of the specs in this view by DAG hash, or None if this
+        view does not have a manifest."""
+        if self._manifest is None and self._keep_manifest:
+            self._manifest = {}
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path) as f:
+                    data = json.load(f)
+                if data.get('version') == _manifest_version:
+                    self._manifest = data['specs']
+                else:
+                    # written by another version of Spack; start over
+                    self._manifest = self._read_manifest_from_view()
+        return self._manifest
+
+    def init_manifest(self):
+        """Start keeping a manifest for a view that does not have one.
+
+        Files merged before this are not recorded in the manifest, so
+        removing those specs still traverses their prefix.
+        """
+        if self.manifest is None:
+            self._keep_manifest = True
+            self._manifest = self._read_manifest_from_view()
+            self.write_manifest()
+
+    def _read_manifest_from_view(self):
+        """Make a manifest listing the metadata folders in the view, without
+        files and directories."""
+        entries = {}
+        for meta in self._find_meta_folders():
+            spec = get_spec_from_file(
+                os.path.join(meta, spack.store.layout.spec_file_name))
+            if spec:
+                entries[spec.dag_hash()] = {
+                    'name': spec.name,
+                    'meta': os.path.relpath(meta, self._root)}
+        self._manifest_dirty = True
+        return entries
+
+    def _manifest_changed(self):
+        self._manifest_dirty = True
+        if not self._manifest_batch_depth:
+            self.write_manifest()
+
+    @contextlib.contextmanager
+    def _manifest_batch(self):
+        """Write the manifest only once, when leaving the outermost batch."""
+        self._manifest_batch_depth += 1
+        try:
+            yield
+        finally:
+            self._manifest_batch_depth -= 1
+            if not self._manifest_batch_depth:
+                self.write_manifest()
+
+    def write_manifest(self):
+        """Write the manifest of this view if it changed."""
+        if not self._manifest_dirty or self._manifest is None:
+            return
+        mkdirp(os.path.dirname(self.manifest_path))
+        # write and rename so that readers never see a partial manifest
+        tmp = '%s.%d.tmp' % (self.manifest_path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump({'version': _manifest_version,
+                       'specs': self._manifest}, f)
+        os.rename(tmp, self.manifest_path)
+        self._manifest_dirty = False
+
+    def get_all_hashes(self):
+        """DAG hashes of the specs in this view, or None if the view has no
+        manifest. This does not read any spec file."""
+        manifest = self.manifest
+        if manifest is None:
+            return None
+        return set(manifest)
+
+    def get_spec_by_hash(self, dag_hash):
+        """Read the spec with the given DAG hash from its metadata folder in
+        the view, or return None if it is not in the manifest."""
+        entry = (self.manifest or {}).get(dag_hash)
+        if entry is None:
+            return None
+        return get_spec_from_file(os.path.join(
+            self._root, entry['meta'], spack.store.layout.spec_file_name))
+
+    def remove_hashes(self, *hashes):
+        """Remove specs from this view using only the manifest.
+
+        This is for specs whose spec file cannot be read anymore, e.g.
+        because they were uninstalled: only broken links to their prefix
+        are removed.
+        """
+        purge_links = False
+        with self._manifest_batch():
+            for dag_hash in hashes:
+                entry = self.manifest.pop(dag_hash, None)
+                if entry is None:
+                    continue
+                self._manifest_changed()
+
+                if 'files' in entry:
+                    dst = os.path.join(self._root, entry['destination'])
+                    for f in entry['files']:
+                        path = os.path.join(dst, f)
+                        if os.path.islink(path) and not os.path.exists(path):
+                            os.remove(path)
+                    unmerge_directory_list(
+                        (os.path.join(entry['source'], d),
+                         os.path.join(dst, d))
+                        for d in reversed(entry['directories']))
+                    self._purge_candidates.add(dst)
+                elif 'meta' in entry:
+                    purge_links = True
+
+                if 'meta' in entry:
+                    meta = os.path.join(self._root, entry['meta'])
+                    shutil.rmtree(meta, ignore_errors=True)
+                    self._purge_candidates.add(os.path.dirname(meta))
+
+            if purge_links:
+                self._purge_broken_links()
+            self._purge_empty_directories()
+
     def add_specs(self, *specs, **kwargs):
+        with self._manifest_batch():
+            self._add_specs(*specs, **kwargs)
+
+    def _add_specs(self, *specs, **kwargs):
         assert all((s.concrete for s in specs))
         specs = set(specs)
 
@@ -319,9 +469,7 @@ class YamlFilesystemView(FilesystemView):
             self.layout.hidden_file_paths, ignore)
 
         # check for dir conflicts
-        conflicts = tree.find_dir_conflicts(view_dst, ignore_file)
-
-        merge_map = tree.get_file_map(view_dst, ignore_file)
+        conflicts, directories, merge_map = tree.scan(view_dst, ignore_file)
         if not self.ignore_conflicts:
             conflicts.extend(pkg.view_file_conflicts(self, merge_map))
 
@@ -329,15 +477,45 @@ class YamlFilesystemView(FilesystemView):
             raise MergeConflictError(conflicts[0])
 
         # merge directories with the tree
-        tree.merge_directories(view_dst, ignore_file)
+        merge_directory_list(directories)
 
         pkg.add_files_to_view(self, merge_map)
 
+        entry = self._manifest_entry(spec)
+        if entry is not None:
+            entry['source'] = view_source
+            entry['destination'] = os.path.relpath(view_dst, self._root)
+            entry['files'] = sorted(
+                os.path.relpath(src, view_source) for src in merge_map)
+            entry['directories'] = [
+                os.path.relpath(src, view_source) for src, _ in directories]
+            self._manifest_changed()
+
     def unmerge(self, spec, ignore=None):
         pkg = spec.package
         view_source = pkg.view_source()
         view_dst = pkg.view_destination(self)
 
+        entry = (self.manifest or {}).get(spec.dag_hash())
+        if entry is not None and 'files' in entry:
+            # The manifest knows what was merged; the source does not even
+            # need to exist anymore
+            source = entry['source']
+            dst = os.path.join(self._root, entry['destination'])
+            merge_map = dict(
+                (os.path.join(source, f), os.path.join(dst, f))
+                for f in entry['files'])
+            pkg.remove_files_from_view(self, merge_map)
+
+            unmerge_directory_list(
+                (os.path.join(source, d), os.path.join(dst, d))
+                for d in reversed(entry['directories']))
+            self._purge_candidates.add(dst)
+
+            del entry['files'], entry['directories']
+            self._manifest_changed()
+            return
+
         tree = LinkTree(view_source)
 
         ignore = ignore or (lambda f: False)
@@ -356,6 +534,12 @@ class YamlFilesystemView(FilesystemView):
             return
         if not os.path.islink(dest):
             raise ValueError("%s is not a link tree!" % dest)
+        if not os.path.exists(src):
+            # the package was uninstalled: remove dest if it is a broken
+            # link, as it cannot be compared to src anymore
+            if not os.path.exists(dest):
+                os.remove(dest)
+            return
         # remove if dest is a hardlink/symlink to src; this will only
         # be false if two packages are merged into a prefix and have a
         # conflicting file
@@ -367,6 +551,10 @@ class YamlFilesystemView(FilesystemView):
         return spec == self.get_spec(spec)
 
     def remove_specs(self, *specs, **kwargs):
+        with self._manifest_batch():
+            self._remove_specs(*specs, **kwargs)
+
+    def _remove_specs(self, *specs, **kwargs):
         assert all((s.concrete for s in specs))
         with_dependents = kwargs.get("with_dependents", True)
         with_dependencies = kwargs.get("with_dependencies", False)
@@ -481,22 +669,30 @@ class YamlFilesystemView(FilesystemView):
         return self._root
 
     def get_all_specs(self):
+        if self.manifest is not None:
+            specs = map(self.get_spec_by_hash, sorted(self.manifest))
+            return [s for s in specs if s]
+
+        specs = []
+        for meta in self._find_meta_folders():
+            spec = get_spec_from_file(
+                os.path.join(meta, spack.store.layout.spec_file_name))
+            if spec:
+                specs.append(spec)
+        return specs
+
+    def _find_meta_folders(self):
+        """Walk the whole view to find the metadata folders of its specs."""
         md_dirs = []
         for root, dirs, files in os.walk(self._root):
             if spack.store.layout.metadata_dir in dirs:
                 md_dirs.append(os.path.join(root,
                                             spack.store.layout.metadata_dir))
 
-        specs = []
         for md_dir in md_dirs:
             if os.path.exists(md_dir):
                 for name_dir in os.listdir(md_dir):
-                    filename = os.path.join(md_dir, name_dir,
-                                            spack.store.layout.spec_file_name)
-                    spec = get_spec_from_file(filename)
-                    if spec:
-                        specs.append(spec)
-        return specs
+                    yield os.path.join(md_dir, name_dir)
 
     def get_conflicts(self, *specs):
         """
@@ -528,6 +724,18 @@ class YamlFilesystemView(FilesystemView):
         # there should be no conflicts when linking the meta folder
         tree.merge(tgt, link=self.link)
 
+        entry = self._manifest_entry(spec)
+        if entry is not None:
+            entry['meta'] = os.path.relpath(tgt, self._root)
+            self._manifest_changed()
+
+    def _manifest_entry(self, spec):
+        """Manifest entry of a spec, created if needed, or None if this view
+        does not have a manifest."""
+        if self.manifest is None:
+            return None
+        return self.manifest.setdefault(spec.dag_hash(), {'name': spec.name})
+
     def print_conflict(self, spec_active, spec_specified, level="error"):
         "Singular print function for spec conflicts."
         cprint = getattr(tty, level)
@@ -595,7 +803,22 @@ class YamlFilesystemView(FilesystemView):
             tty.warn(self._croot + "No packages found.")
 
     def _purge_empty_directories(self):
-        remove_empty_directories(self._root)
+        if self.manifest is None:
+            remove_empty_directories(self._root)
+            return
+
+        # only the parents of what was removed can have become empty
+        candidates = sorted(self._purge_candidates, reverse=True)
+        self._purge_candidates = set()
+        root = os.path.realpath(self._root)
+        for path in candidates:
+            path = os.path.realpath(path)
+            while path.startswith(root + os.sep):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    break
+                path = os.path.dirname(path)
 
     def _purge_broken_links(self):
         remove_dead_links(self._root)
@@ -608,6 +831,11 @@ class YamlFilesystemView(FilesystemView):
         path = self.get_path_meta_folder(spec)
         assert os.path.exists(path)
         shutil.rmtree(path)
+        self._purge_candidates.add(os.path.dirname(path))
+
+        if self.manifest is not None:
+            self.manifest.pop(spec.dag_hash(), None)
+            self._manifest_changed()
 
     def _check_no_ext_conflicts(self, spec):
         """
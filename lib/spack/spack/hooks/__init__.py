@@ -15,13 +15,20 @@
       * pre_run()
       * pre_install(spec)
       * post_install(spec)
+      * post_install_scanner(spec)
       * pre_uninstall(spec)
       * post_uninstall(spec)
 
+   ``post_install_scanner`` hooks return a ``PrefixScanner``, or None.
+   After the ``post_install`` hooks have run, every entry in the prefix
+   is handed to the scanners in a single traversal of the prefix, so that
+   hooks that inspect each file do not walk the prefix each.
+
    This can be used to implement support for things like module
    systems (e.g. modules, lmod, etc.) or to add other custom
    features.
 """
+import os
 import os.path
 
 import spack.paths
@@ -60,13 +67,109 @@ class HookRunner(object):
                     hook(*args, **kwargs)
 
 
+class PrefixEntry(object):
+    """A file, directory or link found while scanning a prefix."""
+
+    def __init__(self, path, is_dir, is_link):
+        self.path = path
+        #: whether this is a directory (not a link to one)
+        self.is_dir = is_dir
+        #: whether this is a symbolic link
+        self.is_link = is_link
+
+
+class PrefixScanner(object):
+    """Inspects the entries of a prefix, see ``scan_prefix()``."""
+
+    def visit(self, entry):
+        """Called with each ``PrefixEntry`` in the prefix, parent
+        directories first."""
+
+    def finish(self):
+        """Called once all entries have been visited."""
+
+    def close(self):
+        """Called after ``finish()``, or if the scan failed."""
+
+
+def _scandir(directory):
+    """Entries of a directory, as ``PrefixEntry`` objects."""
+    if hasattr(os, 'scandir'):
+        # File types come with directory entries on most filesystems, so
+        # that scanning does not need to stat every file
+        for dir_entry in os.scandir(directory):
+            is_link = dir_entry.is_symlink()
+            yield PrefixEntry(dir_entry.path,
+                              not is_link and dir_entry.is_dir(), is_link)
+    else:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            is_link = os.path.islink(path)
+            yield PrefixEntry(path, not is_link and os.path.isdir(path),
+                              is_link)
+
+
+def scan_prefix(prefix, scanners):
+    """Hand every entry in a prefix, including the prefix itself, to each
+    scanner in turn, traversing the prefix only once.
+
+    Directories are visited before the entries they contain, and links to
+    directories are not followed.
+
+    Args:
+        prefix (str): directory to scan
+        scanners (list): ``PrefixScanner`` objects, called in order for each
+            entry
+    """
+    try:
+        directories = [prefix]
+        root = PrefixEntry(prefix, True, os.path.islink(prefix))
+        for scanner in scanners:
+            scanner.visit(root)
+
+        while directories:
+            subdirectories = []
+            for entry in _scandir(directories.pop()):
+                for scanner in scanners:
+                    scanner.visit(entry)
+                if entry.is_dir:
+                    subdirectories.append(entry.path)
+            # Visit directories depth-first, in the order they were found
+            directories.extend(reversed(subdirectories))
+
+        for scanner in scanners:
+            scanner.finish()
+    finally:
+        for scanner in scanners:
+            scanner.close()
+
+
+class PostInstallHookRunner(HookRunner):
+    """Runs ``post_install`` hooks, then scans the prefix with the scanners
+    returned by ``post_install_scanner`` hooks."""
+
+    def __call__(self, spec):
+        super(PostInstallHookRunner, self).__call__(spec)
+
+        scanners = []
+        for module in all_hook_modules():
+            make_scanner = getattr(module, 'post_install_scanner', None)
+            if hasattr(make_scanner, '__call__'):
+                scanner = make_scanner(spec)
+                if scanner is not None:
+                    scanners.append(scanner)
+
+        if scanners:
+            scan_prefix(spec.prefix, scanners)
+
+
 #
 # Define some functions that can be called to fire off hooks.
 #
 pre_run = HookRunner('pre_run')
 
 pre_install = HookRunner('pre_install')
-post_install = HookRunner('post_install')
+post_install = PostInstallHookRunner('post_install')
 
 pre_uninstall = HookRunner('pre_uninstall')
 post_uninstall = HookRunner('post_uninstall')
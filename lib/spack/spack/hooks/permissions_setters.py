@@ -3,19 +3,27 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
-import os
+import spack.hooks
+import spack.package_prefs as pp
 import spack.util.file_permissions as fp
 
 
-def post_install(spec):
-    if not spec.external:
-        fp.set_permissions_by_spec(spec.prefix, spec)
+class PermissionsSetter(spack.hooks.PrefixScanner):
+    """Sets the permissions configured for a spec on its prefix, and on
+    everything in it except links."""
+
+    def __init__(self, spec):
+        self.dir_perms = pp.get_package_dir_permissions(spec)
+        self.file_perms = pp.get_package_permissions(spec)
+        self.group = pp.get_package_group(spec)
+
+    def visit(self, entry):
+        if entry.is_dir:
+            fp.set_permissions(entry.path, self.dir_perms, self.group)
+        elif not entry.is_link:
+            fp.set_permissions(entry.path, self.file_perms, self.group)
 
-        # os.walk explicitly set not to follow links
-        for root, dirs, files in os.walk(spec.prefix, followlinks=False):
-            for d in dirs:
-                if not os.path.islink(os.path.join(root, d)):
-                    fp.set_permissions_by_spec(os.path.join(root, d), spec)
-            for f in files:
-                if not os.path.islink(os.path.join(root, f)):
-                    fp.set_permissions_by_spec(os.path.join(root, f), spec)
+
+def post_install_scanner(spec):
+    if not spec.external:
+        return PermissionsSetter(spec)
@@ -10,6 +10,7 @@ import sys
 
 import llnl.util.tty as tty
 
+import spack.hooks
 import spack.paths
 import spack.modules
 
@@ -81,35 +82,45 @@ def filter_shebang(path):
     tty.debug("Patched overlong shebang in %s" % path)
 
 
+def filter_shebang_in_file(path):
+    """Filters the shebang of a file in a prefix if it is too long."""
+    # only handle files
+    if not os.path.isfile(path):
+        return
+
+    # only handle links that resolve within THIS package's prefix.
+    if os.path.islink(path):
+        real_path = os.path.realpath(path)
+        if not real_path.startswith(os.path.dirname(path) + os.sep):
+            return
+
+    # test the file for a long shebang, and filter
+    if shebang_too_long(path):
+        filter_shebang(path)
+
+
 def filter_shebangs_in_directory(directory, filenames=None):
     if filenames is None:
         filenames = os.listdir(directory)
     for file in filenames:
-        path = os.path.join(directory, file)
+        filter_shebang_in_file(os.path.join(directory, file))
 
-        # only handle files
-        if not os.path.isfile(path):
-            continue
 
-        # only handle links that resolve within THIS package's prefix.
-        if os.path.islink(path):
-            real_path = os.path.realpath(path)
-            if not real_path.startswith(directory + os.sep):
-                continue
+class ShebangFilter(spack.hooks.PrefixScanner):
+    """Filters the shebangs of scripts in a prefix."""
 
-        # test the file for a long shebang, and filter
-        if shebang_too_long(path):
-            filter_shebang(path)
+    def visit(self, entry):
+        if not entry.is_dir:
+            filter_shebang_in_file(entry.path)
 
 
-def post_install(spec):
+def post_install_scanner(spec):
     """This hook edits scripts so that they call /bin/bash
     $spack_prefix/bin/sbang instead of something longer than the
     shebang limit.
     """
     if spec.external:
         tty.debug('SKIP: shebang filtering [external package]')
-        return
+        return None
 
-    for directory, _, filenames in os.walk(spec.prefix):
-        filter_shebangs_in_directory(directory, filenames)
+    return ShebangFilter()
@@ -0,0 +1,351 @@
+# Copyright 2013-2019 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Scheduler for installing the dependencies of a concrete spec.
+
+The dependencies of a spec form a DAG, and any node whose dependencies are
+all installed can be built independently of every other such node. The
+:class:`InstallScheduler` keeps a ready-queue of those nodes and installs up
+to ``config:install_jobs`` of them at the same time, each in its own forked
+process.  The ``config:build_jobs`` budget is split among the concurrent
+builds, so that e.g. four concurrent builds with ``build_jobs: 16`` each run
+``make -j4``.
+
+Cooperation with other Spack processes working on the same store relies on
+the per-prefix locks in :class:`spack.database.Database`: a node whose
+prefix is write-locked by somebody else is skipped until the lock is
+released, and the scheduler builds other ready nodes in the meantime.
+
+When binary packages may be used, those of all the dependencies are
+downloaded and verified in the background by a
+:class:`spack.binary_distribution.BinaryCachePrefetcher`, while earlier
+nodes are extracted and relocated.
+"""
+
+import multiprocessing
+import select
+import time
+
+import llnl.util.tty as tty
+from llnl.util.lock import LockError
+
+import spack.binary_distribution
+import spack.config
+import spack.error
+import spack.store
+
+
+#: Seconds to wait before re-checking nodes locked by another process
+_lock_poll_interval = 0.5
+
+
+class BuildTask(object):
+    """Bookkeeping for the installation of a single node of the DAG."""
+
+    def __init__(self, spec, position):
+        self.spec = spec
+
+        #: Order of the node in a post-order traversal; used to break ties
+        #: so that the serial install order is preserved
+        self.position = position
+
+        #: DAG hashes of dependencies that are not yet installed
+        self.pending = set()
+
+        #: DAG hashes of dependents waiting for this node
+        self.dependents = set()
+
+        self.ready_time = None
+        self.start_time = None
+        self.end_time = None
+
+        self.process = None
+        self.connection = None
+
+    @property
+    def key(self):
+        return self.spec.dag_hash()
+
+    @property
+    def wait_time(self):
+        """Time spent in the ready-queue before the build started."""
+        if self.ready_time is None or self.start_time is None:
+            return 0.0
+        return self.start_time - self.ready_time
+
+    @property
+    def build_time(self):
+        """Time spent installing the node."""
+        if self.start_time is None or self.end_time is None:
+            return 0.0
+        return self.end_time - self.start_time
+
+
+class InstallScheduler(object):
+    """Install all the dependencies of a concrete spec in DAG order.
+
+    Args:
+        spec (Spec): concrete spec whose dependencies are installed. The
+            spec itself is not installed by the scheduler.
+        install_kwargs (dict): arguments forwarded to
+            :meth:`PackageBase.do_install` for every node
+        jobs (int): maximum number of nodes installed at the same time.
+            Defaults to ``config:install_jobs``.
+    """
+
+    def __init__(self, spec, install_kwargs, jobs=None):
+        if jobs is None:
+            jobs = spack.config.get('config:install_jobs', 1)
+        self.jobs = max(1, jobs)
+        self.install_kwargs = install_kwargs
+
+        self.tasks = {}
+        for position, dep in enumerate(
+                spec.traverse(order='post', root=False)):
+            self.tasks[dep.dag_hash()] = BuildTask(dep, position)
+
+        for task in self.tasks.values():
+            for dep in task.spec.dependencies():
+                key = dep.dag_hash()
+                if key in self.tasks:
+                    task.pending.add(key)
+                    self.tasks[key].dependents.add(task.key)
+
+        #: Nodes whose dependencies are all installed
+        self.ready = []
+
+        #: Nodes currently being installed in a child process
+        self.running = {}
+
+        self.errors = []
+
+    @property
+    def build_jobs(self):
+        """Share of ``config:build_jobs`` given to each concurrent build."""
+        total = spack.config.get('config:build_jobs')
+        if not total:
+            return None
+        return max(1, total // min(self.jobs, len(self.tasks) or 1))
+
+    def install(self):
+        """Install every dependency, raising the first error encountered."""
+        now = time.time()
+        for task in self.tasks.values():
+            if not task.pending:
+                task.ready_time = now
+                self.ready.append(task)
+
+        try:
+            with self._binary_prefetcher() as prefetcher:
+                if self.jobs == 1:
+                    self._install_serial()
+                else:
+                    self._install_concurrent(prefetcher)
+        finally:
+            for task in self.running.values():
+                task.process.terminate()
+                task.process.join()
+
+        if self.tasks:
+            self.report()
+
+        if self.errors:
+            raise self.errors[0]
+
+    def _binary_prefetcher(self):
+        """Prefetch the binary packages of the nodes that are not installed
+        yet, in the order they will be installed."""
+        specs = []
+        if self.install_kwargs.get('use_cache', True):
+            tasks = sorted(self.tasks.values(), key=lambda t: t.position)
+            specs = [t.spec for t in tasks if not _trivial_install(t.spec)]
+        return spack.binary_distribution.BinaryCachePrefetcher(specs)
+
+    def _install_serial(self):
+        while self.ready:
+            task = self._pop_ready()
+            self._install_in_process(task)
+
+    def _install_concurrent(self, prefetcher=None):
+        while self.ready or self.running:
+            blocked = []
+            while self.ready and len(self.running) < self.jobs:
+                if self.errors:
+                    # Do not start anything new after a failure, but let
+                    # running builds complete.
+                    del self.ready[:]
+                    break
+
+                task = self._pop_ready()
+                if _trivial_install(task.spec):
+                    self._install_in_process(task)
+                elif _locked_by_other_process(task.spec):
+                    tty.debug('{0} is locked by another process'.format(
+                        task.spec.cshort_spec))
+                    blocked.append(task)
+                elif prefetcher is not None and \
+                        not prefetcher.ready(task.spec):
+                    # Fork only once the binary package is available, so
+                    # that the child does not download it again
+                    blocked.append(task)
+                else:
+                    self._start(task)
+
+            self.ready.extend(blocked)
+
+            if not self.running:
+                if blocked:
+                    time.sleep(_lock_poll_interval)
+                continue
+
+            timeout = _lock_poll_interval if blocked else None
+            connections = [t.connection for t in self.running.values()]
+            readable, _, _ = select.select(connections, [], [], timeout)
+            for task in list(self.running.values()):
+                if task.connection in readable:
+                    self._finish(task)
+
+    def _pop_ready(self):
+        self.ready.sort(key=lambda t: t.position)
+        return self.ready.pop(0)
+
+    def _install_in_process(self, task):
+        task.start_time = time.time()
+        try:
+            _install_node(task.spec, self.install_kwargs)
+        except Exception as e:
+            self.errors.append(e)
+            del self.ready[:]
+            if self.jobs == 1:
+                raise
+        else:
+            self._mark_installed(task)
+        finally:
+            task.end_time = time.time()
+
+    def _start(self, task):
+        parent_connection, child_connection = multiprocessing.Pipe()
+        task.connection = parent_connection
+        task.process = multiprocessing.Process(
+            target=_install_in_child,
+            args=(task.spec, self.install_kwargs,
+                  self.build_jobs, child_connection))
+
+        task.start_time = time.time()
+        task.process.start()
+        child_connection.close()
+        self.running[task.key] = task
+
+    def _finish(self, task):
+        try:
+            error = task.connection.recv()
+        except EOFError:
+            error = InstallSchedulerError(
+                'Installation of {0} terminated unexpectedly'.format(
+                    task.spec.cshort_spec))
+
+        task.end_time = time.time()
+        task.process.join()
+        task.connection.close()
+        del self.running[task.key]
+
+        if error is not None:
+            self.errors.append(error)
+        else:
+            self._mark_installed(task)
+
+    def _mark_installed(self, task):
+        now = time.time()
+        for key in sorted(task.dependents):
+            dependent = self.tasks[key]
+            dependent.pending.discard(task.key)
+            if not dependent.pending:
+                dependent.ready_time = now
+                self.ready.append(dependent)
+
+    def critical_path(self):
+        """Return the chain of dependencies with the largest build time.
+
+        Returns:
+            tuple: total build time and list of tasks, from the leaf of the
+            DAG up to the last node installed
+        """
+        longest = {}
+        for task in sorted(self.tasks.values(), key=lambda t: t.position):
+            best = (0.0, [])
+            for dep in task.spec.dependencies():
+                candidate = longest.get(dep.dag_hash())
+                if candidate and candidate[0] > best[0]:
+                    best = candidate
+            longest[task.key] = (best[0] + task.build_time,
+                                 best[1] + [task])
+
+        if not longest:
+            return 0.0, []
+        return max(longest.values(), key=lambda item: item[0])
+
+    def report(self):
+        """Print the time each node waited and built, and the critical
+        path through the DAG."""
+        level = tty.msg if self.jobs > 1 else tty.debug
+
+        tasks = sorted(self.tasks.values(), key=lambda t: t.position)
+        lines = ['{0:>10.2f}s {1:>10.2f}s  {2}'.format(
+            t.wait_time, t.build_time, t.spec.cshort_spec) for t in tasks
+            if t.start_time is not None]
+        level('Install times (wait, build) for dependencies:', *lines)
+
+        total, path = self.critical_path()
+        level('Critical path ({0:.2f}s): {1}'.format(
+            total, ' -> '.join(t.spec.name for t in path)))
+
+
+def _trivial_install(spec):
+    """Whether installing ``spec`` is cheap enough to be done in-process."""
+    pkg = spec.package
+    return spec.external or pkg.installed_upstream or pkg.installed
+
+
+def _locked_by_other_process(spec):
+    """Whether another process holds the prefix write lock for ``spec``."""
+    lock = spack.store.db.prefix_lock(spec)
+    try:
+        lock.acquire_read(timeout=1e-9)
+    except LockError:
+        return True
+    lock.release_read()
+    return False
+
+
+def _install_node(spec, install_kwargs):
+    """Install a single node, without its dependencies."""
+    if spack.config.get('config:install_missing_compilers', False):
+        spec.package._install_bootstrap_compiler(
+            spec.package, **install_kwargs)
+    spec.package.do_install(**install_kwargs)
+
+
+def _install_in_child(spec, install_kwargs, build_jobs, connection):
+    """Entry point of the processes forked by the scheduler."""
+    try:
+        if build_jobs:
+            spack.config.set(
+                'config:build_jobs', build_jobs, scope='command_line')
+        _install_node(spec, install_kwargs)
+        connection.send(None)
+    except BaseException as e:
+        try:
+            connection.send(e)
+        except Exception:
+            # The exception could not be pickled, send its message instead
+            connection.send(InstallSchedulerError(
+                'Installation of {0} failed: {1}'.format(
+                    spec.cshort_spec, str(e))))
+    finally:
+        connection.close()
+
+
+class InstallSchedulerError(spack.error.SpackError):
+    """Raised when a node of the DAG could not be installed."""
@@ -16,6 +16,9 @@ import os
 import traceback
 import os.path
 import operator
+import multiprocessing
+import threading
+import time
 
 import six
 
@@ -398,7 +401,7 @@ def get_matching_versions(specs, num_versions=1):
     return matching
 
 
-def create(path, specs):
+def create(path, specs, jobs=1, jobs_per_host=None, mirror_stats=None):
     """Create a directory to be used as a spack mirror, and fill it with
     package archives.
 
@@ -406,6 +409,11 @@ def create(path, specs):
         path: Path to create a mirror directory hierarchy in.
         specs: Any package versions matching these specs will be added \
             to the mirror.
+        jobs (int): Number of specs to fetch at the same time.
+        jobs_per_host (int): Maximum number of specs whose sources are \
+            fetched from the same host at the same time (no limit if None).
+        mirror_stats (MirrorStats): Object in which to record what was \
+            mirrored; a new one is used if None.
 
     Return Value:
         Returns a tuple of lists: (present, mirrored, error)
@@ -417,6 +425,10 @@ def create(path, specs):
     This routine iterates through all known package versions, and
     it creates specs for those versions.  If the version satisfies any spec
     in the specs list, it is downloaded and added to the mirror.
+
+    With more than one job, specs are added by a pool of processes, so that
+    downloads overlap with each other and with the verification and copy of
+    archives that were already downloaded.
     """
     parsed = url_util.parse(path)
     mirror_root = url_util.local_file_path(parsed)
@@ -438,58 +450,209 @@ def create(path, specs):
                 "Cannot create directory '%s':" % mirror_root, str(e))
 
     mirror_cache = spack.caches.MirrorCache(mirror_root)
-    mirror_stats = MirrorStats()
+    if mirror_stats is None:
+        mirror_stats = MirrorStats()
     try:
         spack.caches.mirror_cache = mirror_cache
-        # Iterate through packages and download all safe tarballs for each
-        for spec in specs:
-            mirror_stats.next_spec(spec)
-            add_single_spec(spec, mirror_root, mirror_stats)
+        # Daemonic processes, like some build processes, cannot fork
+        if (jobs > 1 and len(specs) > 1 and
+                not multiprocessing.current_process().daemon):
+            _add_specs_in_parallel(
+                specs, mirror_root, mirror_stats, jobs, jobs_per_host)
+        else:
+            # Iterate through packages and download all safe tarballs for each
+            for spec in specs:
+                mirror_stats.next_spec(spec)
+                add_single_spec(spec, mirror_root, mirror_stats)
     finally:
         spack.caches.mirror_cache = None
 
     return mirror_stats.stats()
 
 
+def _source_host(spec):
+    """Host from which the main source of a spec is fetched, if any."""
+    try:
+        fetch_url = getattr(spec.package.fetcher, 'url', None)
+    except Exception:
+        return None
+    if not fetch_url:
+        return None
+    return url_util.parse(fetch_url).netloc or None
+
+
+def _add_specs_in_parallel(specs, mirror_root, mirror_stats, jobs,
+                           jobs_per_host):
+    """Add specs to a mirror with a pool of ``jobs`` processes.
+
+    Fetchers change the working directory, so specs are added by separate
+    processes rather than threads. Specs are handed to the pool only when
+    fewer than ``jobs_per_host`` specs are being fetched from the same host,
+    and when no other spec for the same version of the package, which would
+    store the same archives, is being added.
+    """
+    # Load packages before forking, so that workers do not all do it
+    hosts = [_source_host(s) for s in specs]
+    versions = [s.format('{name}@{version}') for s in specs]
+
+    # Workers write the pid of the process adding each spec in shared memory
+    workers = multiprocessing.Array('i', len(specs), lock=False)
+
+    # Specs hold packages and fetchers, which cannot always be pickled:
+    # forked workers inherit them and receive only their position
+    global _pool_specs
+    _pool_specs = (specs, mirror_root, workers)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        pending = list(range(len(specs)))
+        running = {}  # position of a spec -> result of adding it
+        while pending or running:
+            for i in list(pending):
+                if len(running) >= jobs:
+                    break
+                if versions[i] in (versions[j] for j in running):
+                    continue
+                same_host = [j for j in running
+                             if hosts[i] and hosts[j] == hosts[i]]
+                if jobs_per_host and len(same_host) >= jobs_per_host:
+                    continue
+                pending.remove(i)
+                running[i] = pool.apply_async(_add_pool_spec, (i,))
+
+            # A worker that dies, e.g. killed for using too much memory,
+            # never returns a result, and the pool does not run its task
+            # again: poll results, and count the specs of dead workers as
+            # failed instead of waiting for them forever.
+            time.sleep(0.05)
+            alive = set(p.pid for p in multiprocessing.active_children())
+            for i, result in list(running.items()):
+                if result.ready():
+                    try:
+                        added, existing, failed = result.get()
+                    except Exception as e:
+                        tty.debug(e)
+                        added, existing, failed = {}, set(), True
+                elif workers[i] and workers[i] not in alive:
+                    tty.debug('Process adding {0} died'.format(specs[i]))
+                    added, existing, failed = {}, set(), True
+                else:
+                    continue
+                del running[i]
+                mirror_stats.record(specs[i], added, existing, failed)
+    finally:
+        pool.terminate()
+        pool.join()
+        _pool_specs = None
+
+
+#: Specs and mirror root of the mirror being filled by a pool of processes,
+#: and pids of the workers adding each spec
+_pool_specs = None
+
+
+def _add_pool_spec(i):
+    """Add a spec to the mirror in a worker process, and return what was
+    recorded for it."""
+    specs, mirror_root, workers = _pool_specs
+    workers[i] = os.getpid()
+    spec_stats = MirrorStats()
+    spec_stats.next_spec(specs[i])
+    try:
+        add_single_spec(specs[i], mirror_root, spec_stats)
+    except BaseException as e:
+        # Results must always reach the parent, which waits for them
+        tty.debug(e)
+        spec_stats.error()
+    current = spec_stats._current()
+    return current.added, current.existing, bool(spec_stats.errors)
+
+
 class MirrorStats(object):
+    """Records which specs had resources added to, or already present in,
+    a mirror, and how many bytes were added.
+
+    The current spec and its resources are kept per thread, and tallies are
+    updated under a lock, so that several threads can record specs at the
+    same time.
+    """
+
     def __init__(self):
         self.present = {}
         self.new = {}
         self.errors = set()
 
-        self.current_spec = None
-        self.added_resources = set()
-        self.existing_resources = set()
+        #: Total size of the resources added to the mirror
+        self.bytes_added = 0
+        self.start_time = time.time()
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _current(self):
+        """Current spec and resources of the calling thread."""
+        current = self._local
+        if not hasattr(current, 'spec'):
+            current.spec = None
+            current.added = {}
+            current.existing = set()
+        return current
 
     def next_spec(self, spec):
         self._tally_current_spec()
-        self.current_spec = spec
+        self._current().spec = spec
 
     def _tally_current_spec(self):
-        if self.current_spec:
-            if self.added_resources:
-                self.new[self.current_spec] = len(self.added_resources)
-            if self.existing_resources:
-                self.present[self.current_spec] = len(self.existing_resources)
-            self.added_resources = set()
-            self.existing_resources = set()
-        self.current_spec = None
+        current = self._current()
+        if current.spec:
+            self.record(current.spec, current.added, current.existing)
+        current.spec = None
+        current.added = {}
+        current.existing = set()
+
+    def record(self, spec, added, existing, failed=False):
+        """Record the resources of a spec.
+
+        Args:
+            spec (Spec): spec whose resources were mirrored
+            added (dict): size of each resource added to the mirror
+            existing (set): resources that were already in the mirror
+            failed (bool): whether mirroring some resource failed
+        """
+        with self._lock:
+            if added:
+                self.new[spec] = len(added)
+                self.bytes_added += sum(added.values())
+            if existing:
+                self.present[spec] = len(existing)
+            if failed:
+                self.errors.add(spec)
 
     def stats(self):
         self._tally_current_spec()
-        return list(self.present), list(self.new), list(self.errors)
+        with self._lock:
+            return list(self.present), list(self.new), list(self.errors)
+
+    def throughput(self):
+        """Bytes added to the mirror per second since it was created."""
+        elapsed = time.time() - self.start_time
+        return self.bytes_added / elapsed if elapsed > 0 else 0.0
 
     def already_existed(self, resource):
         # If an error occurred after caching a subset of a spec's
         # resources, a secondary attempt may consider them already added
-        if resource not in self.added_resources:
-            self.existing_resources.add(resource)
+        current = self._current()
+        if resource not in current.added:
+            current.existing.add(resource)
 
     def added(self, resource):
-        self.added_resources.add(resource)
+        size = 0
+        if os.path.isfile(resource):
+            size = os.path.getsize(resource)
+        self._current().added[resource] = size
 
     def error(self):
-        self.errors.add(self.current_spec)
+        with self._lock:
+            self.errors.add(self._current().spec)
 
 
 def add_single_spec(spec, mirror_root, mirror_stats):
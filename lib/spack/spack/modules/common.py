@@ -30,16 +30,22 @@ module type.
 """
 import copy
 import datetime
+import hashlib
 import inspect
+import json
+import multiprocessing
 import os.path
 import re
 import collections
 
+import jinja2.meta
 import six
 import llnl.util.filesystem
 import llnl.util.tty as tty
 
+import spack
 import spack.paths
+import spack.repo
 import spack.build_environment as build_environment
 import spack.util.environment
 import spack.tengine as tengine
@@ -58,6 +64,9 @@ roots = spack.config.get('config:module_roots', {})
 #: Inspections that needs to be done on spec prefixes
 prefix_inspections = spack.config.get('modules:prefix_inspections', {})
 
+#: Minimum number of module files to write them in parallel
+parallel_write_threshold = 64
+
 #: Valid tokens for naming scheme and env variable names
 _valid_tokens = (
     'name',
@@ -223,14 +232,27 @@ def root_path(name):
     return spack.util.path.canonicalize_path(path)
 
 
-def generate_module_index(root, modules):
+def generate_module_index(root, modules, digests=None):
+    """Write the index of the module files under ``root``.
+
+    Args:
+        root (str): root folder of a module type
+        modules (list): writers of the module files to be indexed
+        digests (dict): digest of each module file, by dag hash of its
+            spec, recorded so that the next refresh can skip the module
+            files that are up to date
+    """
+    digests = digests or {}
     entries = syaml.syaml_dict()
     for m in modules:
         entry = {
             'path': m.layout.filename,
             'use_name': m.layout.use_name
         }
-        entries[m.spec.dag_hash()] = entry
+        dag_hash = m.spec.dag_hash()
+        if digests.get(dag_hash):
+            entry['digest'] = digests[dag_hash]
+        entries[dag_hash] = entry
     index = {'module_index': entries}
     index_path = os.path.join(root, 'module-index.yaml')
     llnl.util.filesystem.mkdirp(root)
@@ -238,6 +260,79 @@ def generate_module_index(root, modules):
         syaml.dump(index, default_flow_style=False, stream=index_file)
 
 
+def read_module_digests(root):
+    """Read the digests recorded in the index of the module files under
+    ``root``.
+
+    Returns:
+        dict: digest of each module file, by dag hash of its spec
+    """
+    index_path = os.path.join(root, 'module-index.yaml')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r') as index_file:
+        yaml_content = syaml.load(index_file)
+    if not yaml_content or not yaml_content.get('module_index'):
+        return {}
+    return dict((dag_hash, entry['digest'])
+                for dag_hash, entry in yaml_content['module_index'].items()
+                if 'digest' in entry)
+
+
+def write_module_files(writers, overwrite=False):
+    """Write many module files, using a pool of processes if there are
+    enough of them.
+
+    Args:
+        writers (list): writers of the module files
+        overwrite (bool): passed to ``BaseModuleFileWriter.write``
+
+    Returns:
+        list: pairs of a writer and the error message it raised, for each
+            module file that could not be written
+    """
+    jobs = min(spack.config.get('config:build_jobs') or 1,
+               multiprocessing.cpu_count())
+    # Daemonic processes, like some build processes, cannot fork
+    if (jobs < 2 or len(writers) < parallel_write_threshold or
+            multiprocessing.current_process().daemon):
+        results = [_write_module_file(w, overwrite) for w in writers]
+        return [(w, e) for w, e in zip(writers, results) if e is not None]
+
+    # Writers hold modules and packages, which cannot be pickled: forked
+    # workers inherit them and receive only their position in the list
+    global _pool_writers
+    _pool_writers = (writers, overwrite)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        chunksize = max(1, len(writers) // (4 * jobs))
+        results = pool.map(
+            _write_pool_module_file, range(len(writers)), chunksize=chunksize)
+    finally:
+        pool.terminate()
+        pool.join()
+        _pool_writers = None
+    return [(writers[i], e) for i, e in enumerate(results) if e is not None]
+
+
+#: Writers and overwrite flag of the module files written in parallel
+_pool_writers = None
+
+
+def _write_pool_module_file(i):
+    writers, overwrite = _pool_writers
+    return _write_module_file(writers[i], overwrite)
+
+
+def _write_module_file(writer, overwrite):
+    """Write a module file, returning the error message if that fails."""
+    try:
+        writer.write(overwrite=overwrite)
+    except Exception as e:
+        tty.debug(e)
+        return str(e)
+
+
 def _generate_upstream_module_index():
     module_indices = read_module_indices()
 
@@ -727,6 +822,33 @@ class BaseContext(tengine.Context):
         return self.conf.verbose
 
 
+#: Names of the templates referenced by the source of a template
+_template_references = {}
+
+
+def _template_sources(template):
+    """Returns the file name and source of a template and of all the
+    templates it extends, includes or imports.
+    """
+    env = template.environment
+    names, seen, sources = [template.name], set([template.name]), []
+    while names:
+        source, filename, _ = env.loader.get_source(env, names.pop())
+        sources.append((filename, source))
+        # Parsing is slow compared to the rest of the digest, and the same
+        # templates are used by most module files
+        if source not in _template_references:
+            ast = env.parse(source)
+            _template_references[source] = list(
+                jinja2.meta.find_referenced_templates(ast))
+        # Names computed while rendering are None, and can't be followed
+        for name in _template_references[source]:
+            if name is not None and name not in seen:
+                seen.add(name)
+                names.append(name)
+    return sources
+
+
 class BaseModuleFileWriter(object):
     def __init__(self, spec):
         self.spec = spec
@@ -769,6 +891,55 @@ class BaseModuleFileWriter(object):
         # ... and return the first match
         return choices.pop(0)
 
+    def _load_template(self):
+        """Loads the template that will be rendered for this spec."""
+        template_name = self._get_template()
+        try:
+            env = tengine.make_environment()
+            return env.get_template(template_name)
+        except tengine.TemplateNotFound:
+            # If the template was not found raise an exception with a little
+            # more information
+            msg = 'template \'{0}\' was not found for \'{1}\''
+            name = type(self).__name__
+            msg = msg.format(template_name, name)
+            raise ModulesTemplateNotFoundError(msg)
+
+    @property
+    def digest(self):
+        """Hash of the inputs of the module file: the spec, the
+        configuration of this module type, the templates and the package
+        files of the spec and its link and run dependencies.
+
+        If the digest did not change since the module file was written, the
+        module file is up to date. None if the template cannot be found.
+        """
+        try:
+            template = self._load_template()
+            templates = _template_sources(template)
+        except (ModulesTemplateNotFoundError, tengine.TemplateNotFound):
+            return None
+
+        inputs = [
+            spack.spack_version,
+            self.spec.dag_hash(),
+            self.layout.filename,
+            json.dumps([self.module.configuration, prefix_inspections],
+                       sort_keys=True, default=str),
+            templates,
+        ]
+        # Packages set up the run environment of modules, so edits to
+        # package.py files must regenerate them
+        for node in self.spec.traverse(deptype=('link', 'run')):
+            try:
+                package_file = spack.repo.path.filename_for_package_name(node)
+                inputs.append((node.name, os.stat(package_file).st_mtime))
+            except (OSError, spack.repo.RepoError):
+                inputs.append((node.name, None))
+
+        sha = hashlib.sha1(repr(inputs).encode('utf-8'))
+        return sha.hexdigest()
+
     def write(self, overwrite=False):
         """Writes the module file.
 
@@ -803,17 +974,7 @@ class BaseModuleFileWriter(object):
             llnl.util.filesystem.mkdirp(module_dir)
 
         # Get the template for the module
-        template_name = self._get_template()
-        try:
-            env = tengine.make_environment()
-            template = env.get_template(template_name)
-        except tengine.TemplateNotFound:
-            # If the template was not found raise an exception with a little
-            # more information
-            msg = 'template \'{0}\' was not found for \'{1}\''
-            name = type(self).__name__
-            msg = msg.format(template_name, name)
-            raise ModulesTemplateNotFoundError(msg)
+        template = self._load_template()
 
         # Construct the context following the usual hierarchy of updates:
         # 1. start with the default context from the module writer class
@@ -15,6 +15,7 @@ import contextlib
 import copy
 import functools
 import glob
+import gzip
 import hashlib
 import inspect
 import os
@@ -40,6 +41,7 @@ import spack.directory_layout
 import spack.error
 import spack.fetch_strategy as fs
 import spack.hooks
+import spack.installer
 import spack.mirror
 import spack.mixins
 import spack.multimethod
@@ -52,6 +54,7 @@ import spack.binary_distribution as binary_distribution
 
 from llnl.util.filesystem import mkdirp, touch, chgrp
 from llnl.util.filesystem import working_dir, install_tree, install
+from llnl.util.filesystem import set_install_permissions, copy_mode
 from llnl.util.lang import memoized
 from llnl.util.link_tree import LinkTree
 from llnl.util.tty.log import log_output
@@ -60,6 +63,7 @@ from spack.filesystem_view import YamlFilesystemView
 from spack.util.executable import which
 from spack.stage import stage_prefix, Stage, ResourceStage, StageComposite
 from spack.util.environment import dump_environment
+from spack.util.log_parse import LogEventParser
 from spack.util.package_hash import package_hash
 from spack.version import Version
 from spack.package_prefs import get_package_dir_permissions, get_package_group
@@ -74,6 +78,9 @@ _spack_build_logfile = 'spack-build-out.txt'
 # Filename for the Spack build/install environment file.
 _spack_build_envfile = 'spack-build-env.txt'
 
+# Filename for the errors and warnings found in the build log.
+_spack_build_eventsfile = 'spack-build-events.json'
+
 
 class InstallPhase(object):
     """Manages a single phase of the installation.
@@ -860,8 +867,28 @@ class PackageBase(with_metaclass(PackageMeta, PackageViewMixin, object)):
             if os.path.exists(old_log):
                 return old_log
 
-        # Otherwise, return the current install log path name.
-        return os.path.join(install_path, _spack_build_logfile)
+        # Otherwise, return the current install log path name, which is
+        # compressed if so configured or if it was when archived.
+        log_path = os.path.join(install_path, _spack_build_logfile)
+        compressed_log_path = log_path + '.gz'
+        if (os.path.exists(compressed_log_path) or
+            (not os.path.exists(log_path) and
+             spack.config.get('config:compress_build_logs', False))):
+            return compressed_log_path
+        return log_path
+
+    @property
+    def log_events_path(self):
+        """Return the path of the errors and warnings found in the build log
+        while staging."""
+        return os.path.join(self.stage.path, _spack_build_eventsfile)
+
+    @property
+    def install_log_events_path(self):
+        """Return the path of the errors and warnings found in the build log
+        on successful installation."""
+        return os.path.join(spack.store.layout.metadata_path(self.spec),
+                            _spack_build_eventsfile)
 
     def _make_fetcher(self):
         # Construct a composite fetcher that always contains at least
@@ -1614,10 +1641,7 @@ class PackageBase(with_metaclass(PackageMeta, PackageViewMixin, object)):
             dep_kwargs = kwargs.copy()
             dep_kwargs['explicit'] = False
             dep_kwargs['install_deps'] = False
-            for dep in self.spec.traverse(order='post', root=False):
-                if spack.config.get('config:install_missing_compilers', False):
-                    Package._install_bootstrap_compiler(dep.package, **kwargs)
-                dep.package.do_install(**dep_kwargs)
+            spack.installer.InstallScheduler(self.spec, dep_kwargs).install()
 
         # Then install the compiler if it is not already installed.
         if install_deps:
@@ -1696,8 +1720,10 @@ class PackageBase(with_metaclass(PackageMeta, PackageViewMixin, object)):
                         debug_enabled = tty.is_debug()
 
                         # Spawn a daemon that reads from a pipe and redirects
-                        # everything to log_path
-                        with log_output(self.log_path, echo, True) as logger:
+                        # everything to log_path, looking for errors in it
+                        parser = LogEventParser(self.log_events_path)
+                        with log_output(self.log_path, echo, True,
+                                        parser=parser) as logger:
                             for phase_name, phase_attr in zip(
                                     self.phases, self._InstallPhase_phases):
 
@@ -1883,11 +1909,18 @@ class PackageBase(with_metaclass(PackageMeta, PackageViewMixin, object)):
             tty.debug(e)
 
         # Archive the whole stdout + stderr for the package
-        install(self.log_path, self.install_log_path)
+        if self.install_log_path.endswith('.gz'):
+            _install_compressed(self.log_path, self.install_log_path)
+        else:
+            install(self.log_path, self.install_log_path)
 
         # Archive the environment used for the build
         install(self.env_path, self.install_env_path)
 
+        # Archive the errors and warnings found in the log
+        if os.path.exists(self.log_events_path):
+            install(self.log_events_path, self.install_log_events_path)
+
         # Finally, archive files that are specific to each package
         with working_dir(self.stage.path):
             errors = StringIO()
@@ -1969,6 +2002,16 @@ class PackageBase(with_metaclass(PackageMeta, PackageViewMixin, object)):
         """
         return self.install_log_path if self.installed else self.log_path
 
+    @property
+    def build_log_events_path(self):
+        """
+        Return the expected (or current) path of the errors and warnings
+        found in the build log, following ``build_log_path``.
+        """
+        if self.installed:
+            return self.install_log_events_path
+        return self.log_events_path
+
     @classmethod
     def inject_flags(cls, name, flags):
         """
@@ -2614,6 +2657,18 @@ def flatten_dependencies(spec, flat_dir):
         dep_files.merge(flat_dir + '/' + name)
 
 
+def _install_compressed(src, dest):
+    """Installs the file *src* to *dest*, compressed with gzip."""
+    with open(src, 'rb') as f:
+        compressed = gzip.GzipFile(dest, 'wb')
+        try:
+            shutil.copyfileobj(f, compressed)
+        finally:
+            compressed.close()
+    set_install_permissions(dest)
+    copy_mode(src, dest)
+
+
 def dump_packages(spec, path):
     """Dump all package information for a spec and its dependencies.
 
@@ -4,15 +4,31 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 
+import mmap
+import multiprocessing
+import multiprocessing.pool
 import os
 import re
 import platform
+import stat
+import struct
 import spack.repo
 import spack.cmd
+import spack.config
+import spack.util.elf as elf
 import llnl.util.lang
 from spack.util.executable import Executable, ProcessError
 import llnl.util.tty as tty
 
+#: Number of threads used to classify the files of a prefix
+classify_threads = 8
+
+#: Text files larger than this are memory-mapped instead of read
+mmap_threshold = 1024 * 1024
+
+#: Minimum number of text files to relocate them in parallel
+parallel_relocation_threshold = 64
+
 
 class InstallRootStringException(spack.error.SpackError):
     """
@@ -83,19 +99,15 @@ def get_patchelf():
 
 def get_existing_elf_rpaths(path_name):
     """
-    Return the RPATHS returned by patchelf --print-rpath path_name
+    Return the RPATHS that patchelf --print-rpath path_name would print
     as a list of strings.
     """
-    patchelf = Executable(get_patchelf())
     try:
-        output = patchelf('--print-rpath', '%s' %
-                          path_name, output=str, error=str)
-        return output.rstrip('\n').split(':')
-    except ProcessError as e:
-        tty.debug('patchelf --print-rpath produced an error on %s' %
-                  path_name, e)
+        elf_file = elf.parse_elf(path_name)
+    except (elf.ElfParsingError, IOError, OSError) as e:
+        tty.debug('Cannot read the RPATHs of %s' % path_name, e)
         return []
-    return
+    return ':'.join(elf_file.search_paths).split(':')
 
 
 def get_relative_rpaths(path_name, orig_dir, orig_rpaths):
@@ -355,28 +367,128 @@ def needs_text_relocation(m_type, m_subtype):
     return (m_type == "text")
 
 
+class PrefixReplacer(object):
+    """Replace several old prefixes with new ones in text files, in a
+    single pass over each file.
+
+    An old prefix is replaced only if it appears at the beginning of a
+    path: it may be preceded by characters legal in a compiler flag (e.g.
+    ``-I``), but not by other components of a path. When old prefixes
+    overlap, the longest one is replaced.
+
+    Args:
+        prefix_to_prefix (dict): mapping from old to new prefixes
+    """
+
+    def __init__(self, prefix_to_prefix):
+        self.replacements = dict(
+            (old.encode('utf-8'), new.encode('utf-8'))
+            for old, new in prefix_to_prefix.items() if old != new)
+        self.pattern = None
+        if self.replacements:
+            olds = sorted(self.replacements, key=len, reverse=True)
+            # Negative lookbehind for a character legal in a path
+            # Then a match group for any characters legal in a compiler flag
+            # Then one of the old prefixes
+            # Then characters legal in a path
+            self.pattern = re.compile(
+                b'(?<![\\w\\-_/])([\\w\\-_]*?)(' +
+                b'|'.join(re.escape(o) for o in olds) +
+                b')([\\w\\-_/]*)')
+
+    def _replace(self, match):
+        return (match.group(1) + self.replacements[match.group(2)] +
+                match.group(3))
+
+    def _contains_old_prefix(self, data):
+        return any(data.find(old) >= 0 for old in self.replacements)
+
+    def replace(self, data):
+        """Return ``data``, a byte string, with old prefixes replaced."""
+        if self.pattern is None or not self._contains_old_prefix(data):
+            return data
+        return self.pattern.sub(self._replace, data)
+
+    def apply(self, path_name):
+        """Replace old prefixes in the file ``path_name``.
+
+        Files that do not contain any old prefix are not rewritten.
+
+        Returns:
+            bool: whether the file was modified
+        """
+        if self.pattern is None:
+            return False
+
+        with open(path_name, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= mmap_threshold:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    if not self._contains_old_prefix(data):
+                        return False
+                    ndata = self.pattern.sub(self._replace, data)
+                finally:
+                    data.close()
+            else:
+                data = f.read()
+                if not self._contains_old_prefix(data):
+                    return False
+                ndata = self.pattern.sub(self._replace, data)
+
+        with open(path_name, 'rb+') as f:
+            f.write(ndata)
+            f.truncate()
+        return True
+
+    def apply_all(self, path_names):
+        """Replace old prefixes in many files, using a pool of processes
+        if there are enough of them.
+
+        Returns:
+            int: number of files modified
+        """
+        path_names = list(path_names)
+        if self.pattern is None:
+            return 0
+
+        jobs = min(spack.config.get('config:build_jobs') or 1,
+                   multiprocessing.cpu_count())
+        # Daemonic processes, like some build processes, cannot fork
+        if (jobs < 2 or len(path_names) < parallel_relocation_threshold or
+                multiprocessing.current_process().daemon):
+            return sum(self.apply(p) for p in path_names)
+
+        pool = multiprocessing.Pool(
+            jobs, initializer=_set_worker_replacer, initargs=(self,))
+        try:
+            chunksize = max(1, len(path_names) // (4 * jobs))
+            return sum(pool.map(_apply_worker_replacer, path_names,
+                                chunksize=chunksize))
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+#: PrefixReplacer used by the processes relocating text files in parallel
+_worker_replacer = None
+
+
+def _set_worker_replacer(replacer):
+    global _worker_replacer
+    _worker_replacer = replacer
+
+
+def _apply_worker_replacer(path_name):
+    return _worker_replacer.apply(path_name)
+
+
 def replace_prefix_text(path_name, old_dir, new_dir):
     """
     Replace old install prefix with new install prefix
     in text files using utf-8 encoded strings.
     """
-    with open(path_name, 'rb+') as f:
-        data = f.read()
-        f.seek(0)
-        # Replace old_dir with new_dir if it appears at the beginning of a path
-        # Negative lookbehind for a character legal in a path
-        # Then a match group for any characters legal in a compiler flag
-        # Then old_dir
-        # Then characters legal in a path
-        # Ensures we only match the old_dir if it's precedeed by a flag or by
-        # characters not legal in a path, but not if it's preceeded by other
-        # components of a path.
-        old_bytes = old_dir.encode('utf-8')
-        pat = b'(?<![\\w\\-_/])([\\w\\-_]*?)%s([\\w\\-_/]*)' % old_bytes
-        repl = b'\\1%s\\2' % new_dir.encode('utf-8')
-        ndata = re.sub(pat, repl, data)
-        f.write(ndata)
-        f.truncate()
+    PrefixReplacer({old_dir: new_dir}).apply(path_name)
 
 
 def replace_prefix_bin(path_name, old_dir, new_dir):
@@ -483,13 +595,21 @@ def relocate_elf_binaries(path_names, old_dir, new_dir, allow_root):
                              (path_name, new_dir, old_dir))
 
 
+def relative_link_target(orig_path):
+    """
+    Return the target of the absolute link ``orig_path``, relative to the
+    directory containing the link.
+    """
+    target = os.readlink(orig_path)
+    return os.path.relpath(target, os.path.dirname(orig_path))
+
+
 def make_link_relative(cur_path_names, orig_path_names):
     """
     Change absolute links to be relative.
     """
     for cur_path, orig_path in zip(cur_path_names, orig_path_names):
-        target = os.readlink(orig_path)
-        relative_target = os.path.relpath(target, os.path.dirname(orig_path))
+        relative_target = relative_link_target(orig_path)
 
         os.unlink(cur_path)
         os.symlink(relative_target, cur_path)
@@ -545,6 +665,19 @@ def check_files_relocatable(cur_path_names, allow_root):
                 cur_path, spack.store.layout.root)
 
 
+def placeholder_link_target(cur_path, cur_dir, old_dir):
+    """
+    Return the target of the absolute link ``cur_path``, in ``cur_dir``,
+    with the install root of ``old_dir`` replaced by a placeholder.
+    """
+    placeholder = set_placeholder(spack.store.layout.root)
+    placeholder_prefix = old_dir.replace(spack.store.layout.root,
+                                         placeholder)
+    cur_src = os.readlink(cur_path)
+    rel_src = os.path.relpath(cur_src, cur_dir)
+    return os.path.join(placeholder_prefix, rel_src)
+
+
 def make_link_placeholder(cur_path_names, cur_dir, old_dir):
     """
     Replace old install path with placeholder in absolute links.
@@ -552,12 +685,7 @@ def make_link_placeholder(cur_path_names, cur_dir, old_dir):
     Links in ``cur_path_names`` must link to absolute paths.
     """
     for cur_path in cur_path_names:
-        placeholder = set_placeholder(spack.store.layout.root)
-        placeholder_prefix = old_dir.replace(spack.store.layout.root,
-                                             placeholder)
-        cur_src = os.readlink(cur_path)
-        rel_src = os.path.relpath(cur_src, cur_dir)
-        new_src = os.path.join(placeholder_prefix, rel_src)
+        new_src = placeholder_link_target(cur_path, cur_dir, old_dir)
 
         os.unlink(cur_path)
         os.symlink(new_src, cur_path)
@@ -587,10 +715,10 @@ def relocate_text(path_names, oldpath, newpath, oldprefix, newprefix):
     """
     sbangre = '#!/bin/bash %s/bin/sbang' % oldprefix
     sbangnew = '#!/bin/bash %s/bin/sbang' % newprefix
-    for path_name in path_names:
-        replace_prefix_text(path_name, oldpath, newpath)
-        replace_prefix_text(path_name, sbangre, sbangnew)
-        replace_prefix_text(path_name, oldprefix, newprefix)
+    replacer = PrefixReplacer({oldpath: newpath,
+                               sbangre: sbangnew,
+                               oldprefix: newprefix})
+    replacer.apply_all(path_names)
 
 
 def substitute_rpath(orig_rpath, topdir, new_root_path):
@@ -626,15 +754,17 @@ def is_relocatable(spec):
         return False
 
     # Explore the installation prefix of the spec
+    abs_files = []
     for root, dirs, files in os.walk(spec.prefix, topdown=True):
         dirs[:] = [d for d in dirs if d not in ('.spack', 'man')]
-        abs_files = [os.path.join(root, f) for f in files]
-        if not all(file_is_relocatable(f) for f in abs_files if is_binary(f)):
-            # If any of the file is not relocatable, the entire
-            # package is not relocatable
-            return False
+        abs_files.extend(os.path.join(root, f) for f in files)
 
-    return True
+    types = mime_types(abs_files)
+    binaries = [f for f in abs_files if types[f][0] == 'application']
+
+    # If any of the file is not relocatable, the entire
+    # package is not relocatable
+    return all(file_is_relocatable(f) for f in binaries)
 
 
 def file_is_relocatable(file, paths_to_relocate=None):
@@ -664,11 +794,8 @@ def file_is_relocatable(file, paths_to_relocate=None):
     if not os.path.isabs(file):
         raise ValueError('{0} is not an absolute path'.format(file))
 
-    strings = Executable('strings')
-    patchelf = Executable(get_patchelf())
-
     # Remove the RPATHS from the strings in the executable
-    set_of_strings = set(strings(file, output=str).split())
+    set_of_strings = set(strings(file))
 
     m_type, m_subtype = mime_type(file)
     if m_type == 'application':
@@ -676,7 +803,7 @@ def file_is_relocatable(file, paths_to_relocate=None):
 
     if platform.system().lower() == 'linux':
         if m_subtype == 'x-executable' or m_subtype == 'x-sharedlib':
-            rpaths = patchelf('--print-rpath', file, output=str).strip()
+            rpaths = ':'.join(get_existing_elf_rpaths(file))
             set_of_strings.discard(rpaths.strip())
     if platform.system().lower() == 'darwin':
         if m_subtype == 'x-mach-binary':
@@ -697,6 +824,34 @@ def file_is_relocatable(file, paths_to_relocate=None):
     return True
 
 
+#: Sequences of at least 4 printable characters, like ``strings`` finds
+_strings_re = re.compile(b'[\x20-\x7e\t]{4,}')
+
+
+def strings(file):
+    """Returns the whitespace-separated words of the printable strings in a
+    file, like ``strings file | split`` would.
+
+    Args:
+        file: file to be analyzed
+
+    Returns:
+        List of words
+    """
+    if os.path.getsize(file) == 0:
+        return []
+
+    with open(file, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            words = []
+            for match in _strings_re.finditer(data):
+                words.extend(match.group().decode('ascii').split())
+            return [str(w) for w in words]
+        finally:
+            data.close()
+
+
 def is_binary(file):
     """Returns true if a file is binary, False otherwise
 
@@ -717,19 +872,125 @@ def is_binary(file):
     return False
 
 
+#: Mach-O magic numbers, in both byte orders, for 32 and 64 bit files
+_macho_magics = (b'\xfe\xed\xfa\xce', b'\xce\xfa\xed\xfe',
+                 b'\xfe\xed\xfa\xcf', b'\xcf\xfa\xed\xfe')
+
+#: Magic number of universal Mach-O binaries, shared with Java class files
+_fat_magic = b'\xca\xfe\xba\xbe'
+
+#: Control characters that may appear in text files
+_text_controls = set(bytearray(b'\t\n\r\f\b\x1b'))
+
+#: MIME subtypes of scripts, by interpreter
+_script_subtypes = {
+    'sh': 'x-shellscript', 'bash': 'x-shellscript', 'csh': 'x-shellscript',
+    'tcsh': 'x-shellscript', 'ksh': 'x-shellscript', 'zsh': 'x-shellscript',
+    'dash': 'x-shellscript', 'python': 'x-python', 'perl': 'x-perl',
+    'ruby': 'x-ruby',
+}
+
+
 @llnl.util.lang.memoized
 def mime_type(file):
     """Returns the mime type and subtype of a file.
 
+    The type is guessed from the first bytes of the file, in the same way
+    as ``file -b -h --mime-type`` does for the types relocation cares
+    about: ELF and Mach-O binaries, and text files.
+
     Args:
         file: file to be analyzed
 
     Returns:
         Tuple containing the MIME type and subtype
     """
-    file_cmd = Executable('file')
-    output = file_cmd('-b', '-h', '--mime-type', file, output=str, error=str)
-    tty.debug('[MIME_TYPE] {0} -> {1}'.format(file, output.strip()))
-    if '/' not in output:
-        output += '/'
-    return tuple(output.strip().split('/'))
+    result = _mime_type(file)
+    tty.debug('[MIME_TYPE] {0} -> {1}'.format(file, '/'.join(result)))
+    return result
+
+
+def _mime_type(file):
+    try:
+        st = os.lstat(file)
+    except OSError:
+        return ('', '')
+
+    if stat.S_ISLNK(st.st_mode):
+        return ('inode', 'symlink')
+    if stat.S_ISDIR(st.st_mode):
+        return ('inode', 'directory')
+    if stat.S_ISFIFO(st.st_mode):
+        return ('inode', 'fifo')
+    if stat.S_ISSOCK(st.st_mode):
+        return ('inode', 'socket')
+    if stat.S_ISCHR(st.st_mode):
+        return ('inode', 'chardevice')
+    if stat.S_ISBLK(st.st_mode):
+        return ('inode', 'blockdevice')
+    if st.st_size == 0:
+        return ('inode', 'x-empty')
+
+    try:
+        with open(file, 'rb') as f:
+            header = f.read(1024)
+    except (IOError, OSError):
+        return ('', '')
+
+    if elf.is_elf(header) and len(header) >= 18:
+        byte_order = '>' if bytearray(header)[5] == 2 else '<'
+        elf_type, = struct.unpack_from(byte_order + 'H', header, 16)
+        return ('application', {
+            elf.ET_REL: 'x-object',
+            elf.ET_EXEC: 'x-executable',
+            elf.ET_DYN: 'x-sharedlib',
+            elf.ET_CORE: 'x-coredump',
+        }.get(elf_type, 'octet-stream'))
+
+    magic = header[:4]
+    if magic in _macho_magics:
+        return ('application', 'x-mach-binary')
+    if magic == _fat_magic:
+        # Java class files have a version number where universal binaries
+        # have a (small) number of architectures
+        n_archs = bytearray(header)[4:8]
+        if len(n_archs) == 4 and n_archs[:3] == bytearray(3) and \
+                n_archs[3] < 20:
+            return ('application', 'x-mach-binary')
+        return ('application', 'x-java-applet')
+    if header.startswith(b'!<arch>\n'):
+        return ('application', 'x-archive')
+
+    if any(c < 0x20 and c not in _text_controls for c in bytearray(header)):
+        return ('application', 'octet-stream')
+
+    if header.startswith(b'#!'):
+        line = header[2:].split(b'\n', 1)[0].split()
+        if line:
+            interpreter = os.path.basename(line[0].decode('ascii', 'replace'))
+            if interpreter == 'env' and len(line) > 1:
+                interpreter = line[1].decode('ascii', 'replace')
+            interpreter = interpreter.rstrip('0123456789.')
+            return ('text', _script_subtypes.get(interpreter, 'plain'))
+    return ('text', 'plain')
+
+
+def mime_types(files):
+    """Returns the mime types of many files, using a pool of threads.
+
+    Args:
+        files: files to be analyzed
+
+    Returns:
+        Dictionary mapping each file to its MIME type and subtype
+    """
+    files = list(files)
+    if len(files) < 2 * classify_threads:
+        return dict((f, mime_type(f)) for f in files)
+
+    pool = multiprocessing.pool.ThreadPool(classify_threads)
+    try:
+        return dict(zip(files, pool.map(mime_type, files, chunksize=64)))
+    finally:
+        pool.terminate()
+        pool.join()
@@ -8,8 +8,10 @@ import collections
 import contextlib
 import errno
 import functools
+import hashlib
 import inspect
 import itertools
+import multiprocessing
 import os
 import re
 import shutil
@@ -17,7 +19,7 @@ import stat
 import sys
 import traceback
 
-from six import string_types, add_metaclass
+from six import string_types, add_metaclass, StringIO
 
 try:
     from collections.abc import Mapping
@@ -49,6 +51,10 @@ from spack.util.naming import mod_to_class, possible_spack_module_names
 #: Package modules are imported as spack.pkg.<namespace>.<pkg-name>.
 repo_namespace = 'spack.pkg'
 
+#: Minimum number of packages to update before indexes are rebuilt by
+#: a pool of processes
+parallel_index_threshold = 64
+
 
 def get_full_namespace(namespace):
     """Returns the full namespace of a repository, given its relative one."""
@@ -118,79 +124,116 @@ class FastPackageChecker(Mapping):
     'package.py' files associated with them.
 
     For each repository a cache is maintained at class level, and shared among
-    all instances referring to it. Update of the global cache is done lazily
-    during instance initialization.
+    all instances referring to it. Update of the global cache is done lazily:
+    the packages directory is listed the first time an instance is used, and
+    a 'package.py' file is stat'ed only when its package is looked up, or
+    when all of them are iterated over, e.g. to check whether indexes need
+    an update.
     """
     #: Global cache, reused by every instance
     _paths_cache = {}
 
+    #: Stats of the package files looked up so far, None for directories
+    #: without a package file, by packages directory
+    _stats_cache = {}
+
     def __init__(self, packages_path):
         # The path of the repository managed by this instance
         self.packages_path = packages_path
 
-        # If the cache we need is not there yet, then build it appropriately
-        if packages_path not in self._paths_cache:
-            self._paths_cache[packages_path] = self._create_new_cache()
-
-        #: Reference to the appropriate entry in the global cache
-        self._packages_to_stats = self._paths_cache[packages_path]
+    @property
+    def _package_names(self):
+        """Names of the directories in the packages directory that can be
+        packages."""
+        if self.packages_path not in self._paths_cache:
+            self._paths_cache[self.packages_path] = self._list_packages()
+        return self._paths_cache[self.packages_path]
 
-    def _create_new_cache(self):
-        """Create a new cache for packages in a repo.
+    @property
+    def _packages_to_stats(self):
+        """Stats of the package files of all the packages."""
+        stats = self._stats_cache.setdefault(self.packages_path, {})
+        packages_to_stats = {}
+        for pkg_name in self._package_names:
+            if pkg_name not in stats:
+                stats[pkg_name] = self._stat_package(pkg_name)
+            if stats[pkg_name] is not None:
+                packages_to_stats[pkg_name] = stats[pkg_name]
+        return packages_to_stats
+
+    def _list_packages(self):
+        """Names of the directories in the packages directory.
 
         The implementation here should try to minimize filesystem
-        calls.  At the moment, it is O(number of packages) and makes
-        about one stat call per package.  This is reasonably fast, and
-        avoids actually importing packages in Spack, which is slow.
+        calls, so package files are only stat'ed when they are looked up.
         """
-        # Create a dictionary that will store the mapping between a
-        # package name and its stat info
-        cache = {}
-        for pkg_name in os.listdir(self.packages_path):
+        if hasattr(os, 'scandir'):
             # Skip non-directories in the package root.
-            pkg_dir = os.path.join(self.packages_path, pkg_name)
+            pkg_names = [e.name for e in os.scandir(self.packages_path)
+                         if e.is_dir()]
+        else:
+            pkg_names = os.listdir(self.packages_path)
 
+        valid_names = set()
+        for pkg_name in pkg_names:
             # Warn about invalid names that look like packages.
             if not valid_module_name(pkg_name):
                 if not pkg_name.startswith('.'):
+                    pkg_dir = os.path.join(self.packages_path, pkg_name)
                     tty.warn('Skipping package at {0}. "{1}" is not '
                              'a valid Spack module name.'.format(
                                  pkg_dir, pkg_name))
                 continue
+            valid_names.add(pkg_name)
 
-            # Construct the file name from the directory
-            pkg_file = os.path.join(
-                self.packages_path, pkg_name, package_file_name
-            )
+        return valid_names
 
-            # Use stat here to avoid lots of calls to the filesystem.
-            try:
-                sinfo = os.stat(pkg_file)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    # No package.py file here.
-                    continue
-                elif e.errno == errno.EACCES:
-                    tty.warn("Can't read package file %s." % pkg_file)
-                    continue
-                raise e
-
-            # If it's not a file, skip it.
-            if stat.S_ISDIR(sinfo.st_mode):
-                continue
+    def _stat_package(self, pkg_name):
+        """Stats of the package file of a package, or None if there is
+        no package file."""
+        # Construct the file name from the directory
+        pkg_file = os.path.join(
+            self.packages_path, pkg_name, package_file_name
+        )
 
-            # If it is a file, then save the stats under the
-            # appropriate key
-            cache[pkg_name] = sinfo
-
-        return cache
+        # Use stat here to avoid lots of calls to the filesystem.
+        try:
+            sinfo = os.stat(pkg_file)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                # No package.py file here.
+                return None
+            elif e.errno == errno.EACCES:
+                tty.warn("Can't read package file %s." % pkg_file)
+                return None
+            raise e
+
+        # If it's not a file, skip it.
+        if stat.S_ISDIR(sinfo.st_mode):
+            return None
+
+        return sinfo
 
     def last_mtime(self):
         return max(
             sinfo.st_mtime for sinfo in self._packages_to_stats.values())
 
     def __getitem__(self, item):
-        return self._packages_to_stats[item]
+        if item not in self._package_names:
+            raise KeyError(item)
+        stats = self._stats_cache.setdefault(self.packages_path, {})
+        if item not in stats:
+            stats[item] = self._stat_package(item)
+        if stats[item] is None:
+            raise KeyError(item)
+        return stats[item]
+
+    def __contains__(self, item):
+        try:
+            self[item]
+        except KeyError:
+            return False
+        return True
 
     def __iter__(self):
         return iter(self._packages_to_stats)
@@ -238,14 +281,29 @@ class TagIndex(Mapping):
         package = path.get(pkg_name)
 
         # Remove the package from the list of packages, if present
-        for pkg_list in self._tag_dict.values():
-            if pkg_name in pkg_list:
-                pkg_list.remove(pkg_name)
+        self.remove_package(pkg_name)
 
         # Add it again under the appropriate tags
         for tag in getattr(package, 'tags', []):
             self._tag_dict[tag].append(package.name)
 
+    def remove_package(self, pkg_name):
+        """Removes a package from the tag index.
+
+        Args:
+            pkg_name (str): name of the package, with or without namespace
+        """
+        name = pkg_name.split('.')[-1]
+        for pkg_list in self._tag_dict.values():
+            if name in pkg_list:
+                pkg_list.remove(name)
+
+    def merge(self, other):
+        """Add the packages tagged in another tag index to this one."""
+        for tag, pkg_list in other.items():
+            tagged = self._tag_dict[tag]
+            tagged.extend(p for p in pkg_list if p not in tagged)
+
 
 @add_metaclass(abc.ABCMeta)
 class Indexer(object):
@@ -282,6 +340,18 @@ class Indexer(object):
     def update(self, pkg_fullname):
         """Update the index in memory with information about a package."""
 
+    @abc.abstractmethod
+    def remove(self, pkg_fullname):
+        """Remove information about a package from the index in memory."""
+
+    @abc.abstractmethod
+    def merge(self, stream):
+        """Merge an index read from a file object into this one.
+
+        This is how indexes of a few packages, written by other processes,
+        are added to this index.
+        """
+
     @abc.abstractmethod
     def write(self, stream):
         """Write the index to a file object."""
@@ -298,6 +368,12 @@ class TagIndexer(Indexer):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_package(pkg_fullname)
+
+    def merge(self, stream):
+        self.index.merge(TagIndex.from_json(stream))
+
     def write(self, stream):
         self.index.to_json(stream)
 
@@ -314,6 +390,12 @@ class ProviderIndexer(Indexer):
         self.index.remove_provider(pkg_fullname)
         self.index.update(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_provider(pkg_fullname)
+
+    def merge(self, stream):
+        self.index.merge(ProviderIndex.from_json(stream))
+
     def write(self, stream):
         self.index.to_json(stream)
 
@@ -339,6 +421,12 @@ class PatchIndexer(Indexer):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def remove(self, pkg_fullname):
+        self.index.remove_package(pkg_fullname)
+
+    def merge(self, stream):
+        self.index.update(spack.patch.PatchCache.from_json(stream))
+
 
 class RepoIndex(object):
     """Container class that manages a set of Indexers for a Repo.
@@ -354,6 +442,14 @@ class RepoIndex(object):
 
     Generated indexes are accessed by name via ``__getitem__()``.
 
+    Along with each index, the ``RepoIndex`` stores a hash of the contents
+    of each ``package.py`` file it indexed. Packages whose file is newer
+    than the index are only updated if their contents changed, so that
+    e.g. checking out another branch and back does not cause a reindex.
+    When many packages need an update, they are loaded by a pool of
+    processes, each of which returns indexes of a few packages that are
+    then merged.
+
     """
     def __init__(self, package_checker, namespace):
         self.checker = package_checker
@@ -396,44 +492,161 @@ class RepoIndex(object):
         invocations.
 
         """
+        misc_cache = spack.caches.misc_cache
+        stale, needs_update, content_hashes = {}, set(), {}
         for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
+            cache_filename = self._cache_filename(name, 'index')
+            changed = self._changed_packages(name, content_hashes)
+            if changed is None:
+                # If the index exists and doesn't need an update, read it
+                with misc_cache.read_transaction(cache_filename) as f:
+                    indexer.read(f)
+                self.indexes[name] = indexer.index
+            else:
+                stale[name] = indexer
+                needs_update.update(changed)
 
-    def _build_index(self, name, indexer):
-        """Determine which packages need an update, and update indexes."""
+        if not stale:
+            return
 
-        # Filename of the provider index cache (we assume they're all json)
-        cache_filename = '{0}/{1}-index.json'.format(name, self.namespace)
+        # Otherwise update them and rewrite the cache files. Stale indexes
+        # all get the packages any of them needs, so they're loaded once.
+        fragments = self._index_packages(stale, sorted(needs_update))
+        for name, indexer in stale.items():
+            self.indexes[name] = self._update_index(
+                name, indexer, needs_update, fragments, content_hashes)
+
+    def _cache_filename(self, name, kind):
+        # Filename of the index cache (we assume they're all json)
+        return '{0}/{1}-{2}.json'.format(name, self.namespace, kind)
+
+    def _package_hash(self, pkg_name):
+        """Hash of the contents of the ``package.py`` file of a package."""
+        filename = os.path.join(
+            self.packages_path, pkg_name, package_file_name)
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def _read_hashes(self, name):
+        """Hashes of the package files that were indexed in an index."""
+        hashes_filename = self._cache_filename(name, 'hashes')
+        misc_cache = spack.caches.misc_cache
+        if not misc_cache.init_entry(hashes_filename):
+            return {}
+        with misc_cache.read_transaction(hashes_filename) as f:
+            try:
+                return sjson.load(f)
+            except ValueError:
+                return {}
 
-        # Compute which packages needs to be updated in the cache
+    def _changed_packages(self, name, content_hashes):
+        """Packages that changed since an index was written.
+
+        Package files newer than the index are hashed, and their hashes
+        are stored in ``content_hashes``. Those with the same contents as
+        when they were indexed are not considered changed.
+
+        Returns:
+            (list or None): names of the packages that need an update, or
+                None if the index exists and no package file is newer
+        """
+        cache_filename = self._cache_filename(name, 'index')
         misc_cache = spack.caches.misc_cache
         index_mtime = misc_cache.mtime(cache_filename)
-
-        needs_update = [
-            x for x, sinfo in self.checker.items()
-            if sinfo.st_mtime > index_mtime
-        ]
+        newer = [x for x, sinfo in self.checker.items()
+                 if sinfo.st_mtime > index_mtime]
 
         index_existed = misc_cache.init_entry(cache_filename)
-        if index_existed and not needs_update:
-            # If the index exists and doesn't need an update, read it
-            with misc_cache.read_transaction(cache_filename) as f:
-                indexer.read(f)
+        if index_existed and not newer:
+            return None
 
-        else:
-            # Otherwise update it and rewrite the cache file
-            with misc_cache.write_transaction(cache_filename) as (old, new):
-                indexer.read(old) if old else indexer.create()
+        for pkg_name in newer:
+            if pkg_name not in content_hashes:
+                content_hashes[pkg_name] = self._package_hash(pkg_name)
 
-                for pkg_name in needs_update:
+        if not index_existed:
+            return newer
+        indexed = self._read_hashes(name)
+        return [x for x in newer if indexed.get(x) != content_hashes[x]]
+
+    def _index_packages(self, indexers, pkg_names):
+        """Index packages in a pool of processes, if there are enough.
+
+        Returns:
+            (list or None): for each group of packages, a dictionary with
+                their index for each indexer name, written as a string;
+                None if the packages should be indexed in this process
+        """
+        jobs = min(spack.config.get('config:build_jobs') or 1,
+                   multiprocessing.cpu_count())
+        # Daemonic processes, like some build processes, cannot fork
+        if (jobs < 2 or len(pkg_names) < parallel_index_threshold or
+                multiprocessing.current_process().daemon):
+            return None
+
+        indexer_types = [(name, type(indexer))
+                         for name, indexer in indexers.items()]
+        shards = [(self.namespace, indexer_types, pkg_names[i::4 * jobs])
+                  for i in range(4 * jobs)]
+        pool = multiprocessing.Pool(jobs)
+        try:
+            return pool.map(_index_shard, shards, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _update_index(self, name, indexer, needs_update, fragments,
+                      content_hashes):
+        """Update the packages that changed in an index and rewrite it,
+        along with the hashes of the package files it indexed."""
+        misc_cache = spack.caches.misc_cache
+        cache_filename = self._cache_filename(name, 'index')
+        hashes_filename = self._cache_filename(name, 'hashes')
+        with misc_cache.write_transaction(cache_filename) as (old, new):
+            indexer.read(old) if old else indexer.create()
+
+            if fragments is None:
+                for pkg_name in sorted(needs_update):
                     namespaced_name = '%s.%s' % (self.namespace, pkg_name)
                     indexer.update(namespaced_name)
+            else:
+                for pkg_name in needs_update:
+                    indexer.remove('%s.%s' % (self.namespace, pkg_name))
+                for fragment in fragments:
+                    indexer.merge(StringIO(fragment[name]))
 
-                indexer.write(new)
+            indexer.write(new)
+
+            hashes = self._read_hashes(name) if old else {}
+            hashes.update(content_hashes)
+            hashes = dict((x, h) for x, h in hashes.items()
+                          if x in self.checker)
+            with misc_cache.write_transaction(hashes_filename) as (_, f):
+                sjson.dump(hashes, f)
 
         return indexer.index
 
 
+def _index_shard(args):
+    """Index some packages of a repository, in a new index of each type.
+
+    Returns:
+        (dict): index of the packages for each indexer name, written as
+            a string
+    """
+    namespace, indexer_types, pkg_names = args
+    fragments = {}
+    for name, indexer_type in indexer_types:
+        indexer = indexer_type()
+        indexer.create()
+        for pkg_name in pkg_names:
+            indexer.update('%s.%s' % (namespace, pkg_name))
+        stream = StringIO()
+        indexer.write(stream)
+        fragments[name] = stream.getvalue()
+    return fragments
+
+
 class RepoPath(object):
     """A RepoPath is a list of repos that function as one.
 
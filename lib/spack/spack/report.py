@@ -7,6 +7,7 @@
 import codecs
 import collections
 import functools
+import gzip
 import time
 import traceback
 
@@ -14,6 +15,7 @@ import llnl.util.lang
 import spack.build_environment
 import spack.fetch_strategy
 import spack.package
+from spack.util.log_parse import load_log_events
 from spack.reporter import Reporter
 from spack.reporters.cdash import CDash
 from spack.reporters.junit import JUnit
@@ -35,6 +37,13 @@ __all__ = [
 
 def fetch_package_log(pkg):
     try:
+        if pkg.build_log_path.endswith('.gz'):
+            f = gzip.GzipFile(pkg.build_log_path, 'rb')
+            try:
+                return f.read().decode('utf-8')
+            finally:
+                f.close()
+
         with codecs.open(pkg.build_log_path, 'r', 'utf-8') as f:
             return ''.join(f.readlines())
     except Exception:
@@ -43,6 +52,23 @@ def fetch_package_log(pkg):
         )
 
 
+def fetch_package_log_events(pkg):
+    """Errors and warnings found in the build log of a package while it
+    was being built, as a dictionary for the report."""
+    try:
+        errors, warnings, nerrors, nwarnings = load_log_events(
+            pkg.build_log_events_path)
+    except Exception:
+        return {}
+
+    return {
+        'build_errors': errors,
+        'build_warnings': warnings,
+        'nbuild_errors': nerrors,
+        'nbuild_warnings': nwarnings,
+    }
+
+
 class InfoCollector(object):
     """Decorates PackageBase.do_install to collect information
     on the installation of certain specs.
@@ -137,6 +163,7 @@ class InfoCollector(object):
                     value = do_install(pkg, *args, **kwargs)
                     package['result'] = 'success'
                     package['stdout'] = fetch_package_log(pkg)
+                    package.update(fetch_package_log_events(pkg))
                     package['installed_from_binary_cache'] = \
                         pkg.installed_from_binary_cache
                     if installed_on_entry:
@@ -147,6 +174,7 @@ class InfoCollector(object):
                     # didn't work correctly)
                     package['result'] = 'failure'
                     package['stdout'] = fetch_package_log(pkg)
+                    package.update(fetch_package_log_events(pkg))
                     package['message'] = e.message or 'Installation failure'
                     package['exception'] = e.traceback
 
@@ -155,6 +183,7 @@ class InfoCollector(object):
                     # failed outside of the child process)
                     package['result'] = 'error'
                     package['stdout'] = fetch_package_log(pkg)
+                    package.update(fetch_package_log_events(pkg))
                     package['message'] = str(e) or 'Unknown error'
                     package['exception'] = traceback.format_exc()
 
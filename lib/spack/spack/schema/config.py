@@ -54,6 +54,7 @@ properties = {
                 },
             },
             'source_cache': {'type': 'string'},
+            'expanded_source_cache': {'type': 'string'},
             'misc_cache': {'type': 'string'},
             'verify_ssl': {'type': 'boolean'},
             'suppress_gpg_warnings': {'type': 'boolean'},
@@ -64,7 +65,9 @@ properties = {
             'dirty': {'type': 'boolean'},
             'build_language': {'type': 'string'},
             'build_jobs': {'type': 'integer', 'minimum': 1},
+            'install_jobs': {'type': 'integer', 'minimum': 1},
             'ccache': {'type': 'boolean'},
+            'compress_build_logs': {'type': 'boolean'},
             'db_lock_timeout': {'type': 'integer', 'minimum': 1},
             'package_lock_timeout': {
                 'anyOf': [
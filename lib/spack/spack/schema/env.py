@@ -102,6 +102,9 @@ schema = {
                                                 'type': 'string',
                                                 'pattern': '(roots|all)',
                                             },
+                                            'atomic': {
+                                                'type': 'boolean'
+                                            },
                                             'select': {
                                                 'type': 'array',
                                                 'items': {
@@ -1363,8 +1363,9 @@ class Spec(object):
         """
         # TODO: curently we strip build dependencies by default.  Rethink
         # this when we move to using package hashing on all specs.
-        yaml_text = syaml.dump(
-            self.to_node_dict(hash=hash), default_flow_style=True)
+        # dump_flow() writes the same YAML as ruamel's flow style (which
+        # all existing hashes are based on) without going through ruamel
+        yaml_text = syaml.dump_flow(self.to_node_dict(hash=hash))
         sha = hashlib.sha1(yaml_text.encode('utf-8'))
         b32_hash = base64.b32encode(sha.digest()).lower()
 
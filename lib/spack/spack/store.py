@@ -63,9 +63,9 @@ class Store(object):
         self.layout = spack.directory_layout.YamlDirectoryLayout(
             root, hash_len=hash_length, path_scheme=path_scheme)
 
-    def reindex(self):
+    def reindex(self, format=None):
         """Convenience function to reindex the store DB with its own layout."""
-        return self.db.reindex(self.layout)
+        return self.db.reindex(self.layout, format=format)
 
 
 def _store():
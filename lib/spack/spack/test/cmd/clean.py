@@ -6,6 +6,7 @@
 import pytest
 import spack.stage
 import spack.caches
+import spack.config
 import spack.main
 import spack.package
 
@@ -28,6 +29,7 @@ def mock_calls_for_clean(monkeypatch):
         spack.caches.fetch_cache, 'destroy', Counter(), raising=False)
     monkeypatch.setattr(
         spack.caches.misc_cache, 'destroy', Counter())
+    monkeypatch.setattr(spack.config, 'clear_config_file_cache', Counter())
 
 
 @pytest.mark.usefixtures(
@@ -52,3 +54,4 @@ def test_function_calls(command_line, counters):
     assert spack.stage.purge.call_count == counters[1]
     assert spack.caches.fetch_cache.destroy.call_count == counters[2]
     assert spack.caches.misc_cache.destroy.call_count == counters[3]
+    assert spack.config.clear_config_file_cache.call_count == counters[3]
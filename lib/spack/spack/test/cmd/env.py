@@ -10,6 +10,7 @@ import pytest
 
 import llnl.util.filesystem as fs
 
+import spack.filesystem_view
 import spack.hash_types as ht
 import spack.modules
 import spack.environment as ev
@@ -46,8 +47,10 @@ def check_mpileaks_and_deps_in_view(viewdir):
 
 def check_viewdir_removal(viewdir):
     """Check that the uninstall/removal worked."""
-    assert (not os.path.exists(str(viewdir.join('.spack'))) or
-            os.listdir(str(viewdir.join('.spack'))) == ['projections.yaml'])
+    metadata_dir = str(viewdir.join('.spack'))
+    assert (not os.path.exists(metadata_dir) or
+            set(os.listdir(metadata_dir)) <=
+            set(['projections.yaml', 'view-manifest.json']))
 
 
 @pytest.fixture()
@@ -956,6 +959,70 @@ def test_env_updates_view_force_remove(
     check_viewdir_removal(view_dir)
 
 
+def test_env_updates_view_incrementally(
+        tmpdir, mock_stage, mock_fetch, install_mockery, monkeypatch):
+    view_dir = tmpdir.mkdir('view')
+    env('create', '--with-view=%s' % view_dir, 'test')
+    with ev.read('test'):
+        install('--fake', 'mpileaks')
+
+    # With a manifest, the view is updated without walking all of it
+    def fail(*args, **kwargs):
+        raise AssertionError('the whole view was searched')
+    monkeypatch.setattr(
+        spack.filesystem_view.YamlFilesystemView, '_find_meta_folders', fail)
+    monkeypatch.setattr(
+        spack.filesystem_view.YamlFilesystemView, 'clean', fail)
+
+    with ev.read('test'):
+        install('--fake', 'a')
+    check_mpileaks_and_deps_in_view(view_dir)
+    assert os.path.exists(str(view_dir.join('.spack', 'a')))
+
+    with ev.read('test'):
+        remove('mpileaks')
+        concretize()
+    assert not os.path.exists(str(view_dir.join('.spack', 'mpileaks')))
+    assert os.path.exists(str(view_dir.join('.spack', 'a')))
+
+
+def test_env_atomic_view(tmpdir, mock_stage, mock_fetch, install_mockery):
+    view_dir = tmpdir.join('view')
+    with open(str(tmpdir.join('spack.yaml')), 'w') as f:
+        f.write("""\
+env:
+  specs:
+  - mpileaks
+  view:
+    default:
+      root: %s
+      atomic: True
+""" % view_dir)
+    with tmpdir.as_cwd():
+        env('create', 'test', './spack.yaml')
+    with ev.read('test'):
+        install('--fake')
+
+    assert os.path.islink(str(view_dir))
+    first = os.path.realpath(str(view_dir))
+    assert os.path.basename(first).startswith('.view-')
+    check_mpileaks_and_deps_in_view(view_dir)
+
+    # A new view replaces the old one when the specs change
+    with ev.read('test'):
+        install('--fake', 'a')
+    second = os.path.realpath(str(view_dir))
+    assert second != first
+    assert not os.path.exists(first)
+    check_mpileaks_and_deps_in_view(view_dir)
+    assert os.path.exists(str(view_dir.join('.spack', 'a')))
+
+    with ev.read('test'):
+        env('view', 'disable')
+    assert not os.path.lexists(str(view_dir))
+    assert not os.path.exists(second)
+
+
 def test_env_activate_view_fails(
         tmpdir, mock_stage, mock_fetch, install_mockery, env_deactivate):
     """Sanity check on env activate to make sure it requires shell support"""
@@ -21,6 +21,7 @@ import spack.cmd.install
 from spack.error import SpackError
 from spack.spec import Spec
 from spack.main import SpackCommand
+from spack.util.log_parse import load_log_events
 import spack.environment as ev
 
 from six.moves.urllib.error import HTTPError, URLError
@@ -188,6 +189,28 @@ def test_show_log_on_error(mock_packages, mock_archive, mock_fetch,
     assert len(errors) == 2
 
 
+@pytest.mark.disable_clean_stage_check
+def test_build_error_events(mock_packages, mock_archive, mock_fetch,
+                            config, install_mockery, capfd, tmpdir):
+    """Errors found while building are saved and reported."""
+    with capfd.disabled():
+        with tmpdir.as_cwd():
+            install('--log-format=junit', '--log-file=test.xml',
+                    'build-error', fail_on_error=False)
+
+    pkg = Spec('build-error').concretized().package
+    errors, _, nerrors, _ = load_log_events(pkg.build_log_events_path)
+    assert nerrors == len(errors) == 2
+    assert errors[1].text == (
+        'configure: error: cannot run C compiled programs.')
+    assert errors[1].pre_context[-1] == errors[0].text
+
+    content = tmpdir.join('test.xml').read()
+    assert re.search(
+        r'^%d: configure: error: cannot run C compiled programs\.$' %
+        errors[1].line_no, content, re.MULTILINE)
+
+
 def test_install_overwrite(
         mock_packages, mock_archive, mock_fetch, config, install_mockery
 ):
@@ -3,13 +3,16 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import multiprocessing
 import os.path
 import re
 
 import pytest
 
+import spack.config
 import spack.main
 import spack.modules
+import spack.store
 
 module = spack.main.SpackCommand('module')
 
@@ -89,6 +92,49 @@ def test_remove_and_add(database, module_type):
         assert os.path.exists(item)
 
 
+@pytest.mark.db
+def test_refresh_skips_up_to_date_module_files(database, monkeypatch):
+    module('tcl', 'refresh', '-y')
+
+    written = []
+
+    def _write_module_file(writer, overwrite):
+        written.append(writer.spec.name)
+        return writer.write(overwrite=overwrite)
+
+    monkeypatch.setattr(
+        spack.modules.common, '_write_module_file', _write_module_file)
+
+    # Nothing changed since the last refresh
+    module('tcl', 'refresh', '-y')
+    assert not written
+
+    # Module files that were removed are written again
+    module_file, = _module_files('tcl', 'mpileaks ^zmpi')
+    os.remove(module_file)
+    module('tcl', 'refresh', '-y')
+    assert written == ['mpileaks']
+    assert os.path.exists(module_file)
+
+
+@pytest.mark.db
+def test_refresh_in_parallel(database, monkeypatch):
+    monkeypatch.setattr(spack.modules.common, 'parallel_write_threshold', 0)
+    monkeypatch.setattr(multiprocessing, 'cpu_count', lambda: 2)
+
+    with spack.config.override('config:build_jobs', 2):
+        module('tcl', 'refresh', '-y', '--delete-tree')
+
+    specs = spack.store.db.query()
+    module_files = [spack.modules.tcl.TclModulefileWriter(s).layout.filename
+                    for s in specs]
+    assert all(os.path.exists(x) for x in module_files)
+
+    root = spack.modules.common.root_path('tcl')
+    digests = spack.modules.common.read_module_digests(root)
+    assert set(digests) == set(s.dag_hash() for s in specs)
+
+
 @pytest.mark.db
 @pytest.mark.parametrize('cli_args', [
     ['libelf'],
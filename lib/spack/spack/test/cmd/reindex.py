@@ -51,3 +51,24 @@ def test_reindex_with_deprecated_packages(mock_packages, mock_archive,
 
     assert spack.store.db.query(installed=any) == all_installed
     assert spack.store.db.query(installed=True) == non_deprecated
+
+
+def test_reindex_format(mock_packages, mock_archive, mock_fetch,
+                        install_mockery):
+    install('libelf@0.8.13')
+    install('libelf@0.8.12')
+
+    all_installed = spack.store.db.query()
+
+    reindex('--format', 'compact')
+    assert os.path.exists(spack.store.db._compact_index_path)
+    assert not os.path.exists(spack.store.db._index_path)
+    assert spack.store.db.query() == all_installed
+
+    reindex()
+    assert os.path.exists(spack.store.db._compact_index_path)
+
+    reindex('--format', 'json')
+    assert os.path.exists(spack.store.db._index_path)
+    assert not os.path.exists(spack.store.db._compact_index_path)
+    assert spack.store.db.query() == all_installed
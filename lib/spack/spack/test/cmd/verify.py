@@ -87,3 +87,24 @@ def test_single_spec_verify_cmd(tmpdir, mock_packages, mock_archive,
     res = sjson.load(results)
     assert len(res) == 1
     assert res[new_file] == ['added']
+
+
+def test_verify_cmd_report(tmpdir, mock_packages, mock_archive,
+                           mock_fetch, config, install_mockery):
+    # Test the progress report of the verification of all specs
+    install('libelf')
+    install('libdwarf')
+    report = str(tmpdir.join('report.json'))
+
+    verify('-a', '--fast', '-t', '2', '--report', report)
+
+    with open(report) as f:
+        entries = [sjson.load(line) for line in f]
+    summary = entries.pop()['summary']
+    assert [x['done'] for x in entries] == list(range(1, len(entries) + 1))
+    assert all(x['total'] == len(entries) for x in entries)
+    assert all(x['errors'] == 0 for x in entries)
+    assert summary['specs'] == len(entries)
+    assert summary['files'] == sum(x['files'] for x in entries)
+    assert summary['hashed_bytes'] == sum(x['hashed_bytes'] for x in entries)
+    assert summary['bytes_per_second'] >= 0
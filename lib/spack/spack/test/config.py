@@ -546,6 +546,62 @@ def get_config_error(filename, schema, yaml_string):
         pytest.fail('ConfigFormatError was not raised!')
 
 
+def test_config_file_cache(tmpdir, monkeypatch):
+    cache_path = str(tmpdir.join('cache'))
+    monkeypatch.setattr(spack.config, 'config_file_cache_path', cache_path)
+    schema = spack.schema.config.schema
+    filename = str(tmpdir.join('config.yaml'))
+    with open(filename, 'w') as f:
+        f.write("""\
+config::
+  install_tree: /first/tree
+  build_stage:
+  - /first/stage
+""")
+    data = spack.config._read_config_file(filename, schema)
+    assert len(os.listdir(cache_path)) == 1
+
+    # Cached data is read without parsing and validating the file again,
+    # and keeps the marks and override keys of the parsed data
+    def fail(*args, **kwargs):
+        raise AssertionError('config file should not be parsed')
+    load_config, validate = syaml.load_config, spack.config.validate
+    monkeypatch.setattr(syaml, 'load_config', fail)
+    monkeypatch.setattr(spack.config, 'validate', fail)
+    cached = spack.config._read_config_file(filename, schema)
+    monkeypatch.setattr(syaml, 'load_config', load_config)
+    monkeypatch.setattr(spack.config, 'validate', validate)
+    assert cached == data
+    key = next(iter(cached))
+    assert spack.config._override(key)
+    assert cached[key]['build_stage']._start_mark.line == 3
+    assert cached[key]['build_stage']._start_mark.name == filename
+
+    # Changed files are parsed again, and errors still point to their line
+    with open(filename, 'w') as f:
+        f.write("""\
+config:
+  install_tree: /second/tree
+  build_jobs: many
+""")
+    with pytest.raises(spack.config.ConfigFormatError) as e:
+        spack.config._read_config_file(filename, schema)
+    assert '%s:3' % filename in str(e.value)
+
+    # Corrupt entries are ignored and replaced
+    for entry in os.listdir(cache_path):
+        with open(os.path.join(cache_path, entry), 'w') as f:
+            f.write('garbage')
+    with open(filename, 'w') as f:
+        f.write("config:\n  install_tree: /third/tree\n")
+    data = spack.config._read_config_file(filename, schema)
+    assert data['config']['install_tree'] == '/third/tree'
+    assert spack.config._read_config_file(filename, schema) == data
+
+    spack.config.clear_config_file_cache()
+    assert not os.path.exists(cache_path)
+
+
 def test_config_parse_dict_in_list(tmpdir):
     with tmpdir.as_cwd():
         e = get_config_error(
@@ -650,6 +706,46 @@ def test_nested_override():
         _check_scopes(1, [True])
 
 
+def test_merged_sections_are_cached(mock_config, monkeypatch):
+    cfg = spack.config.config
+    merges = []
+    merge_section = cfg._merge_section
+
+    def counting_merge(section, scope=None):
+        merges.append(section)
+        return merge_section(section, scope)
+
+    monkeypatch.setattr(cfg, '_merge_section', counting_merge)
+
+    spack.config.set('config:build_jobs', 3, scope='low')
+    spack.config.set('repos', ['/some/path'], scope='low')
+    del merges[:]
+    assert spack.config.get('config:build_jobs') == 3
+    assert spack.config.get('config:dirty', False) is False
+    assert spack.config.get('config')['build_jobs'] == 3
+    assert merges == ['config']
+
+    # Values returned to callers can be modified without side effects
+    spack.config.get('config')['build_jobs'] = 1
+    spack.config.get('repos').append('/some/other/path')
+    assert spack.config.get('config:build_jobs') == 3
+    assert spack.config.get('repos') == ['/some/path']
+
+    # Writing data, or adding and removing scopes, invalidates the cache
+    spack.config.set('config:build_jobs', 4, scope='high')
+    assert spack.config.get('config:build_jobs') == 4
+    with spack.config.override('config:build_jobs', 5):
+        assert spack.config.get('config:build_jobs') == 5
+    assert spack.config.get('config:build_jobs') == 4
+
+    # Single scopes are cached separately
+    del merges[:]
+    assert spack.config.get('config:build_jobs', scope='low') == 3
+    assert spack.config.get('config:build_jobs', scope='low') == 3
+    assert spack.config.get('config:build_jobs') == 4
+    assert merges == ['config']
+
+
 def test_alternate_override(monkeypatch):
     """Ensure proper scope naming of override when conflict present."""
     base_name = spack.config.overrides_base_name
@@ -81,9 +81,20 @@ def pytest_addoption(parser):
     group.addoption(
         '--fast', action='store_true', default=False,
         help='runs only "fast" unit tests, instead of the whole suite')
+    group.addoption(
+        '--benchmark', action='store_true', default=False,
+        help='runs benchmarks too, whose times are reported by --durations')
 
 
 def pytest_collection_modifyitems(config, items):
+    if not config.getoption('--benchmark'):
+        skip_benchmark = pytest.mark.skip(
+            reason='benchmark [--benchmark command line option not given]'
+        )
+        for item in items:
+            if 'benchmark' in item.keywords:
+                item.add_marker(skip_benchmark)
+
     if not config.getoption('--fast'):
         # --fast not given, run all the tests
         return
@@ -131,6 +142,13 @@ def reset_compiler_cache():
     spack.compilers._compiler_cache = {}
 
 
+@pytest.fixture(scope='function', autouse=True)
+def no_config_file_cache(monkeypatch):
+    """Ensure that tests neither read nor write the user's cache of parsed
+    configuration files."""
+    monkeypatch.setattr(spack.config, 'config_file_cache_path', None)
+
+
 @pytest.fixture(scope='function', autouse=True)
 def mock_stage(tmpdir_factory, monkeypatch, request):
     """Establish the temporary build_stage for the mock archive."""
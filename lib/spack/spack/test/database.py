@@ -477,6 +477,22 @@ def test_026_reindex_after_deprecate(mutable_database):
     _check_db_sanity(mutable_database)
 
 
+def test_027_reindex_with_corrupt_record(mutable_database):
+    """Make sure reindex recovers a database with an invalid record."""
+    with open(mutable_database._index_path) as f:
+        db_obj = json.load(f)
+
+    s = mutable_database.query_one('mpileaks ^mpich')
+    node = db_obj['database']['installs'][s.dag_hash()]['spec']
+    node['mpileaks']['parameters'] = 'garbage'
+    with open(mutable_database._index_path, 'w') as f:
+        json.dump(db_obj, f)
+
+    spack.store.store.reindex()
+    _check_db_sanity(mutable_database)
+    assert mutable_database.get_record(s).spec == s
+
+
 def test_030_db_sanity_from_another_process(mutable_database):
     def read_and_modify():
         # check that other process can read DB
@@ -706,3 +722,215 @@ def test_uninstall_by_spec(mutable_database):
             else:
                 mutable_database.remove(spec)
     assert len(mutable_database.query()) == 0
+
+
+@pytest.mark.parametrize('query', [
+    'mpileaks', 'mpi', 'mpileaks@2.3', 'mpileaks@:2.0', 'callpath ^mpich',
+    '%gcc', '%gcc@4.5.0', '%clang', 'libelf arch=test-debian6-x86_64',
+    'arch=test-debian6-core2', 'mpileaks@10', 'not-a-package', '@2.3',
+])
+def test_indexed_query_matches_full_scan(database, query):
+    query_spec = spack.spec.Spec(query)
+    with database.read_transaction():
+        expected = sorted(
+            rec.spec for rec in database._data.values()
+            if rec.installed and rec.spec.satisfies(query_spec))
+    assert database.query(query) == expected
+
+
+def test_index_is_updated_on_add_and_remove(mutable_database):
+    rec = mutable_database.get_record('mpileaks ^mpich')
+    key = rec.spec.dag_hash()
+    assert key in mutable_database._index.by_name['mpileaks'][1]
+
+    mutable_database.remove('mpileaks ^mpich')
+    assert key not in mutable_database._index.by_name['mpileaks'][1]
+    assert mutable_database.query('mpileaks ^mpich', installed=any) == []
+
+    mutable_database.add(rec.spec, spack.store.layout)
+    assert key in mutable_database._index.by_name['mpileaks'][1]
+    assert len(mutable_database.query('mpileaks ^mpich')) == 1
+
+
+def test_index_not_read_again_if_unchanged(mutable_database, monkeypatch):
+    read_from_file = spack.database.Database._read_from_file
+    reads = []
+
+    def _read_from_file(db, *args, **kwargs):
+        reads.append(args)
+        return read_from_file(db, *args, **kwargs)
+
+    monkeypatch.setattr(
+        spack.database.Database, '_read_from_file', _read_from_file)
+
+    # Make sure the database is in sync with the file
+    with mutable_database.write_transaction():
+        pass
+    del reads[:]
+
+    for _ in range(3):
+        with mutable_database.read_transaction():
+            pass
+    assert not reads
+
+    # Another process writing the database forces a new read
+    other = spack.database.Database(mutable_database.root)
+    other.remove('mpileaks ^mpich')
+    assert reads
+
+    del reads[:]
+    assert not mutable_database.query('mpileaks ^mpich')
+    assert len(reads) == 1
+
+
+def test_index_read_again_after_failed_write(mutable_database):
+    with mutable_database.read_transaction():
+        pass
+
+    with pytest.raises(ValueError):
+        with mutable_database.write_transaction():
+            mutable_database._data.clear()
+            raise ValueError('write failed')
+
+    assert len(mutable_database.query('mpileaks')) == 3
+
+
+def _journal_lines(database):
+    if not os.path.exists(database._journal_path):
+        return []
+    with open(database._journal_path) as f:
+        return f.readlines()
+
+
+def test_changes_are_appended_to_journal(mutable_database):
+    with open(mutable_database._index_path) as f:
+        index_before = f.read()
+
+    mutable_database.remove('mpileaks ^mpich')
+    lines = _journal_lines(mutable_database)
+    assert len(lines) == 1
+
+    entry = json.loads(lines[0])
+    assert len(entry['removed']) == 1
+    # ref counts of the dependencies changed
+    assert entry['installs']
+
+    # The index itself was not rewritten
+    with open(mutable_database._index_path) as f:
+        assert f.read() == index_before
+
+    # Another process sees the change
+    other = spack.database.Database(mutable_database.root)
+    assert not other.query('mpileaks ^mpich')
+    assert len(other.query('mpileaks')) == 2
+    assert other.get_record('callpath ^mpich').ref_count == 0
+
+    # Transactions that change nothing write nothing
+    with mutable_database.write_transaction():
+        pass
+    assert len(_journal_lines(mutable_database)) == 1
+
+
+def test_journal_is_compacted(mutable_database, monkeypatch):
+    monkeypatch.setattr(spack.database, '_max_journal_entries', 2)
+    rec = mutable_database.get_record('mpileaks ^mpich')
+
+    mutable_database.remove('mpileaks ^mpich')
+    mutable_database.add(rec.spec, spack.store.layout)
+    assert len(_journal_lines(mutable_database)) == 2
+
+    mutable_database.remove('mpileaks ^mpich')
+    assert not os.path.exists(mutable_database._journal_path)
+
+    other = spack.database.Database(mutable_database.root)
+    assert not other.query('mpileaks ^mpich')
+    assert len(other.query('mpileaks')) == 2
+
+
+def test_stale_journal_entries_are_ignored(mutable_database):
+    rec = mutable_database.get_record('mpileaks ^mpich')
+    mutable_database.remove('mpileaks ^mpich')
+    lines = _journal_lines(mutable_database)
+
+    # Add the spec back and fold the journal into a new index
+    with mutable_database.write_transaction():
+        mutable_database._add(rec.spec, spack.store.layout)
+        mutable_database._saved_records = None
+    assert not os.path.exists(mutable_database._journal_path)
+
+    # Simulate a process that died after writing the new index but before
+    # removing the journal
+    with open(mutable_database._journal_path, 'w') as f:
+        f.writelines(lines)
+
+    other = spack.database.Database(mutable_database.root)
+    assert len(other.query('mpileaks ^mpich')) == 1
+
+
+def test_truncated_journal_entry(mutable_database):
+    mutable_database.remove('mpileaks ^mpich')
+    with open(mutable_database._journal_path, 'a') as f:
+        f.write('{"generation": "')
+
+    other = spack.database.Database(mutable_database.root)
+    assert not other.query('mpileaks ^mpich')
+
+    # The next write folds the journal into the index
+    other.remove('mpileaks ^zmpi')
+    assert not os.path.exists(other._journal_path)
+    assert len(mutable_database.query('mpileaks')) == 1
+
+
+def test_compact_index_round_trip(mutable_database):
+    expected = mutable_database.query(installed=any)
+    mutable_database.reindex(spack.store.layout, format='compact')
+    assert os.path.exists(mutable_database._compact_index_path)
+    assert not os.path.exists(mutable_database._index_path)
+
+    other = spack.database.Database(mutable_database.root)
+    with other.read_transaction():
+        assert other._index_format == 'compact'
+        assert not any(rec.materialized for rec in other._data.values())
+
+    # Only the records a query returns need their spec
+    mpileaks = other.query('mpileaks')
+    assert len(mpileaks) == 3
+    with other.read_transaction():
+        materialized = set(
+            key for key, rec in other._data.items() if rec.materialized)
+    assert set(s.dag_hash() for s in mpileaks) <= materialized
+    assert len(materialized) < len(expected)
+
+    assert other.query(installed=any) == expected
+    for old, new in zip(expected, other.query(installed=any)):
+        assert old.dag_hash() == new.dag_hash()
+        assert old.tree() == new.tree()
+
+    # Converting back removes the compact index
+    other.reindex(spack.store.layout, format='json')
+    assert os.path.exists(other._index_path)
+    assert not os.path.exists(other._compact_index_path)
+    assert mutable_database.query(installed=any) == expected
+
+
+def test_compact_index_journal(mutable_database):
+    mutable_database.reindex(spack.store.layout, format='compact')
+    with open(mutable_database._compact_index_path, 'rb') as f:
+        index_before = f.read()
+
+    mutable_database.remove('mpileaks ^mpich')
+    assert len(_journal_lines(mutable_database)) == 1
+    with open(mutable_database._compact_index_path, 'rb') as f:
+        assert f.read() == index_before
+
+    other = spack.database.Database(mutable_database.root)
+    assert not other.query('mpileaks ^mpich')
+    assert other.get_record('callpath ^mpich').ref_count == 0
+
+
+def test_dependents_of_lazy_records(mutable_database):
+    expected = mutable_database.installed_relatives('mpich', 'parents')
+    assert expected
+
+    other = spack.database.Database(mutable_database.root)
+    assert other.installed_relatives('mpich', 'parents') == expected
@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import gzip
 import os
 import pytest
 import shutil
@@ -10,6 +11,7 @@ import shutil
 from llnl.util.filesystem import mkdirp, touch, working_dir
 
 from spack.package import InstallError, PackageBase, PackageStillNeededError
+import spack.config
 import spack.patch
 import spack.repo
 import spack.store
@@ -453,6 +455,35 @@ def test_pkg_install_log(install_mockery):
     shutil.rmtree(log_dir)
 
 
+def test_pkg_install_compressed_log(install_mockery):
+    spec = Spec('trivial-install-test-package').concretized()
+    log_path = os.path.join(
+        spec.prefix, '.spack', _spack_build_logfile + '.gz')
+
+    with spack.config.override('config:compress_build_logs', True):
+        assert spec.package.install_log_path == log_path
+
+        mkdirp(os.path.dirname(spec.package.log_path))
+        with open(spec.package.log_path, 'w') as f:
+            f.write('build output\n')
+        touch(spec.package.env_path)
+        mkdirp(os.path.dirname(log_path))
+
+        spec.package.log()
+
+    f = gzip.GzipFile(log_path, 'rb')
+    try:
+        assert f.read() == b'build output\n'
+    finally:
+        f.close()
+
+    # The archived log stays compressed when the setting is turned off
+    assert spec.package.install_log_path == log_path
+
+    shutil.rmtree(os.path.dirname(log_path))
+    shutil.rmtree(os.path.dirname(spec.package.log_path))
+
+
 def test_unconcretized_install(install_mockery, mock_fetch, mock_packages):
     """Test attempts to perform install phases with unconcretized spec."""
     spec = Spec('trivial-install-test-package')
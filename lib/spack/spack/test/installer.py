@@ -0,0 +1,228 @@
+# Copyright 2013-2019 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import os
+import threading
+
+import pytest
+
+import spack.binary_distribution as bindist
+import spack.config
+import spack.installer
+import spack.store
+from spack.package import PackageBase
+from spack.spec import Spec
+
+
+@pytest.fixture()
+def record_installs(monkeypatch):
+    installed = []
+
+    def _do_install(pkg, **kwargs):
+        installed.append(pkg.name)
+
+    monkeypatch.setattr(PackageBase, 'do_install', _do_install)
+    return installed
+
+
+def test_serial_install_preserves_post_order(
+        install_mockery, record_installs):
+    spec = Spec('mpileaks').concretized()
+    scheduler = spack.installer.InstallScheduler(spec, {}, jobs=1)
+    scheduler.install()
+
+    expected = [s.name for s in spec.traverse(order='post', root=False)]
+    assert record_installs == expected
+
+
+def test_dependencies_are_installed_first(install_mockery, record_installs):
+    spec = Spec('dttop').concretized()
+    spack.installer.InstallScheduler(spec, {}, jobs=1).install()
+
+    for dep in spec.traverse(root=False):
+        for child in dep.dependencies():
+            assert (record_installs.index(child.name) <
+                    record_installs.index(dep.name))
+
+
+def test_serial_install_stops_at_first_error(install_mockery, monkeypatch):
+    spec = Spec('mpileaks').concretized()
+    attempted = []
+
+    def _do_install(pkg, **kwargs):
+        attempted.append(pkg.name)
+        raise spack.installer.InstallSchedulerError('failed')
+
+    monkeypatch.setattr(PackageBase, 'do_install', _do_install)
+    with pytest.raises(spack.installer.InstallSchedulerError):
+        spack.installer.InstallScheduler(spec, {}, jobs=1).install()
+
+    assert len(attempted) == 1
+
+
+def test_concurrent_install(install_mockery, mock_fetch):
+    spec = Spec('mpileaks').concretized()
+    spack.installer.InstallScheduler(
+        spec, {'fake': True, 'install_deps': False}, jobs=3).install()
+
+    for dep in spec.traverse(root=False):
+        assert dep.package.installed
+    assert not spec.package.installed
+
+
+def test_concurrent_install_reports_failure(install_mockery, monkeypatch):
+    spec = Spec('mpileaks').concretized()
+
+    def _do_install(pkg, **kwargs):
+        if pkg.name == 'libelf':
+            raise spack.installer.InstallSchedulerError('libelf failed')
+
+    monkeypatch.setattr(PackageBase, 'do_install', _do_install)
+    scheduler = spack.installer.InstallScheduler(spec, {}, jobs=2)
+    with pytest.raises(spack.installer.InstallSchedulerError,
+                       match='libelf failed'):
+        scheduler.install()
+
+    # Nothing depending on the failed node was attempted
+    assert scheduler.tasks[spec['libdwarf'].dag_hash()].start_time is None
+    assert scheduler.tasks[spec['mpich'].dag_hash()].end_time is not None
+
+
+def test_build_jobs_are_shared(install_mockery):
+    spec = Spec('mpileaks').concretized()
+
+    with spack.config.override('config:build_jobs', 16):
+        scheduler = spack.installer.InstallScheduler(spec, {}, jobs=4)
+        assert scheduler.build_jobs == 4
+
+        scheduler = spack.installer.InstallScheduler(spec, {}, jobs=32)
+        assert scheduler.build_jobs == 16 // len(scheduler.tasks)
+
+
+def test_critical_path(install_mockery):
+    spec = Spec('mpileaks').concretized()
+    scheduler = spack.installer.InstallScheduler(spec, {}, jobs=2)
+
+    times = {'callpath': 3.0, 'dyninst': 5.0, 'libdwarf': 1.0,
+             'libelf': 1.0, 'mpich': 10.0}
+    for task in scheduler.tasks.values():
+        task.start_time = 0.0
+        task.end_time = times[task.spec.name]
+
+    total, path = scheduler.critical_path()
+    assert total == 13.0
+    assert [t.spec.name for t in path] == ['mpich', 'callpath']
+
+
+@pytest.fixture()
+def mock_binary_cache(install_mockery, monkeypatch, tmpdir):
+    """Pretend every dependency of mpileaks is in a build cache."""
+    spec = Spec('mpileaks').concretized()
+    deps = list(spec.traverse(order='post', root=False))
+    monkeypatch.setattr(bindist, 'get_specs', lambda *args, **kwargs: deps)
+
+    with spack.config.override('mirrors', {'test': str(tmpdir)}):
+        yield spec
+
+
+def test_binary_packages_are_prefetched(mock_binary_cache, monkeypatch,
+                                        tmpdir):
+    prefetched = []
+
+    def _prefetch(spec, unsigned):
+        prefetched.append(spec.name)
+        return bindist.VerifiedTarball(
+            spec.name + '.spack', str(tmpdir.mkdir(spec.name)), None, None)
+
+    downloaded = []
+
+    def _do_install(pkg, **kwargs):
+        downloaded.append(bindist.download_tarball(pkg.spec))
+
+    monkeypatch.setattr(bindist, '_prefetch', _prefetch)
+    monkeypatch.setattr(PackageBase, 'do_install', _do_install)
+    spec = mock_binary_cache
+    spack.installer.InstallScheduler(spec, {}, jobs=1).install()
+
+    expected = [s.name for s in spec.traverse(order='post', root=False)]
+    assert sorted(prefetched) == sorted(expected)
+    assert downloaded == [name + '.spack' for name in expected]
+
+    # Packages that were not extracted are removed
+    assert bindist._active_prefetcher is None
+    assert not any(tmpdir.join(name).exists() for name in expected)
+
+
+def test_failed_prefetch_downloads_again(mock_binary_cache, monkeypatch):
+    def _prefetch(spec, unsigned):
+        return bindist.NoChecksumException('corrupted download')
+
+    downloaded = []
+
+    def _do_install(pkg, **kwargs):
+        downloaded.append(bindist.download_tarball(pkg.spec))
+
+    monkeypatch.setattr(bindist, '_prefetch', _prefetch)
+    monkeypatch.setattr(bindist, '_download_tarball', lambda spec: 'retry')
+    monkeypatch.setattr(PackageBase, 'do_install', _do_install)
+    spack.installer.InstallScheduler(mock_binary_cache, {}, jobs=1).install()
+
+    assert downloaded and all(f == 'retry' for f in downloaded)
+
+
+def test_no_prefetch_without_cache(mock_binary_cache, monkeypatch,
+                                   record_installs):
+    prefetched = []
+    monkeypatch.setattr(bindist, '_prefetch',
+                        lambda spec, unsigned: prefetched.append(spec))
+    spack.installer.InstallScheduler(
+        mock_binary_cache, {'use_cache': False}, jobs=1).install()
+    assert record_installs
+    assert not prefetched
+
+
+def test_close_waits_for_prefetching_packages(mock_binary_cache, monkeypatch,
+                                              tmpdir):
+    started, release = threading.Event(), threading.Event()
+    prefetched = []
+
+    def _prefetch(spec, unsigned):
+        prefetched.append(spec.name)
+        started.set()
+        release.wait()
+        return bindist.VerifiedTarball(
+            spec.name + '.spack', str(tmpdir.mkdir(spec.name)), None, None)
+
+    monkeypatch.setattr(bindist, '_prefetch', _prefetch)
+    monkeypatch.setattr(bindist, 'prefetch_threads', 1)
+    deps = list(mock_binary_cache.traverse(order='post', root=False))
+    prefetcher = bindist.BinaryCachePrefetcher(deps)
+    started.wait()
+
+    closing = threading.Thread(target=prefetcher.close)
+    closing.start()
+    prefetcher._closed.wait()
+    release.set()
+    closing.join()
+
+    # Queued packages are not downloaded, and the package downloaded while
+    # closing is removed
+    assert prefetched == [deps[0].name]
+    assert not tmpdir.join(deps[0].name).exists()
+
+
+@pytest.mark.disable_clean_stage_check
+def test_fetch_tarball_keeps_working_directory(mock_binary_cache, tmpdir):
+    spec = mock_binary_cache['libelf']
+    tarball = tmpdir.join(bindist._build_cache_relative_path,
+                          bindist.tarball_path_name(spec, '.spack'))
+    tarball.write('binary package', ensure=True)
+
+    with tmpdir.as_cwd():
+        filename = bindist._fetch_tarball(spec)
+        assert os.getcwd() == str(tmpdir)
+
+    with open(filename) as f:
+        assert f.read() == 'binary package'
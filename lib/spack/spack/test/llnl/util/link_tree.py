@@ -7,7 +7,8 @@ import os
 
 import pytest
 from llnl.util.filesystem import working_dir, mkdirp, touchp
-from llnl.util.link_tree import LinkTree
+from llnl.util.link_tree import (
+    LinkTree, merge_directory_list, unmerge_directory_list)
 from spack.stage import Stage
 
 
@@ -166,3 +167,33 @@ def test_ignore(stage, link_tree):
 
         assert os.path.isfile('source/.spec')
         assert os.path.isfile('dest/.spec')
+
+
+def test_scan(stage, link_tree):
+    with working_dir(stage.path):
+        mkdirp('dest/a/b')
+        touchp('dest/c')
+        os.symlink(os.path.abspath('source/a'), 'source/link')
+
+        conflicts, directories, file_map = link_tree.scan('dest')
+
+        assert conflicts == link_tree.find_dir_conflicts('dest', None)
+        assert file_map == link_tree.get_file_map('dest', None)
+        assert conflicts == ['File blocks directory: dest/c']
+
+        # directories are listed parents first, and symlinks to
+        # directories get a directory in the destination
+        dests = [dest for _, dest in directories]
+        assert dests.index('dest/c') < dests.index('dest/c/d/e')
+        assert 'dest/link' in dests
+        assert 'source/link' not in file_map
+
+
+def test_merge_directory_list(stage, link_tree):
+    with working_dir(stage.path):
+        _, directories, _ = link_tree.scan('dest')
+        merge_directory_list(directories)
+        assert os.path.isdir('dest/c/d/e')
+
+        unmerge_directory_list(reversed(directories))
+        assert not os.path.exists('dest')
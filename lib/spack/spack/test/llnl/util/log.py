@@ -4,8 +4,14 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 from __future__ import print_function
+import io
+import os
+import sys
+import time
+
 import pytest
 
+import llnl.util.tty.log
 from llnl.util.tty.log import log_output
 from spack.util.executable import which
 
@@ -79,3 +85,94 @@ def test_log_subproc_and_echo_output(capfd, tmpdir):
 
         with open('foo.txt') as f:
             assert f.read() == 'logged\n'
+
+
+def test_log_output_read_in_small_chunks(capfd, tmpdir, monkeypatch):
+    # Lines, escape sequences and echo controls split across reads are
+    # handled as if they had been read whole
+    monkeypatch.setattr(llnl.util.tty.log, 'read_chunk_size', 3)
+
+    with tmpdir.as_cwd():
+        with log_output('foo.txt') as logger:
+            for i in range(10):
+                print('\x1b[1mline %d\x1b[0m' % i)
+            with logger.force_echo():
+                print('echo')
+            sys.stdout.write('no newline')
+
+        assert capfd.readouterr() == ('echo\n', '')
+
+        with open('foo.txt') as f:
+            expected = ''.join('line %d\n' % i for i in range(10))
+            assert f.read() == expected + 'echo\nno newline'
+
+
+def test_log_output_strips_escapes_line_by_line(tmpdir):
+    # Escape sequences that are not color codes are left alone, and do
+    # not swallow the lines after them
+    with tmpdir.as_cwd():
+        with log_output('foo.txt'):
+            sys.stdout.write('foo.o\x1b[K\n'
+                             '/src/foo.c:3: error: bad thing\n'
+                             '[ 20%] Building \x1b[1mmain.o\x1b[0m\n')
+
+        with open('foo.txt') as f:
+            assert f.read() == ('foo.o\x1b[K\n'
+                                '/src/foo.c:3: error: bad thing\n'
+                                '[ 20%] Building main.o\n')
+
+
+def test_log_output_non_ascii(tmpdir):
+    # UTF-8 output, like the quotes of GCC's messages, is logged as is,
+    # also when escape sequences are stripped from the same read
+    output = (b'foo.c:3: error: \xe2\x80\x98x\xe2\x80\x99 undeclared\n'
+              b'[ 20%] Building \x1b[1mmain.o\x1b[0m\n')
+
+    with tmpdir.as_cwd():
+        with log_output('foo.txt'):
+            sys.stdout.flush()
+            os.write(sys.stdout.fileno(), output)
+
+        with io.open('foo.txt', 'rb') as f:
+            assert f.read() == (
+                b'foo.c:3: error: \xe2\x80\x98x\xe2\x80\x99 undeclared\n'
+                b'[ 20%] Building main.o\n')
+
+
+class SlowParser(object):
+    """Parser of a log that waits before parsing the first lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lines = []
+        self.skipped = 0
+
+    def parse(self, lines, skipped=0):
+        if not self.lines:
+            time.sleep(0.5)
+        self.lines.extend(lines)
+        self.skipped += skipped
+
+    def close(self):
+        with open(self.path, 'w') as f:
+            f.write('%d %d' % (len(self.lines), self.skipped))
+
+
+def test_log_output_slow_parser(tmpdir, monkeypatch):
+    # Lines are not parsed when the parser falls behind, and the log is
+    # still complete
+    monkeypatch.setattr(llnl.util.tty.log, 'parser_queue_size', 1)
+    monkeypatch.setattr(llnl.util.tty.log, 'read_chunk_size', 8)
+
+    with tmpdir.as_cwd():
+        with log_output('foo.txt', parser=SlowParser('parsed.txt')):
+            for i in range(100):
+                print('line %d' % i)
+
+        with open('foo.txt') as f:
+            assert f.read() == ''.join('line %d\n' % i for i in range(100))
+
+        with open('parsed.txt') as f:
+            parsed, skipped = [int(n) for n in f.read().split()]
+        assert skipped > 0
+        assert parsed + skipped == 100
@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import filecmp
+import multiprocessing.pool
 import os
 import pytest
 
@@ -14,6 +15,7 @@ from spack.spec import Spec
 from spack.stage import Stage
 from spack.util.executable import which
 
+from llnl.util.filesystem import mkdirp
 from llnl.util.filesystem import resolve_link_target_relative_to_the_link
 
 pytestmark = pytest.mark.usefixtures('config', 'mutable_mock_packages')
@@ -224,3 +226,91 @@ def test_mirror_cache_symlinks(tmpdir):
     assert os.path.exists(link_target)
     assert (os.path.normpath(link_target) ==
             os.path.join(cache.root, reference.storage_path))
+
+
+@pytest.mark.disable_clean_stage_check
+def test_mirror_create_in_parallel(
+        mock_packages, config, monkeypatch, tmpdir):
+    spec = Spec('patch-several-dependencies')
+    spec.concretize()
+    specs = list(spec.traverse())
+
+    def successful_fetch(_class):
+        mkdirp(_class.stage.path)
+        with open(_class.stage.save_filename, 'w') as f:
+            f.write(_class.url)
+
+    def successful_expand(_class):
+        expanded_path = os.path.join(_class.stage.path,
+                                     spack.stage._source_path_subdir)
+        os.mkdir(expanded_path)
+        with open(os.path.join(expanded_path, 'test.patch'), 'w'):
+            pass
+
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy, 'fetch',
+                        successful_fetch)
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy,
+                        'expand', successful_expand)
+    monkeypatch.setattr(spack.patch, 'apply_patch', lambda *a, **kw: None)
+
+    def mirror(path, jobs):
+        stats = spack.mirror.MirrorStats()
+        with spack.config.override('config:checksum', False):
+            present, new, errors = spack.mirror.create(
+                str(path), specs, jobs=jobs, jobs_per_host=1,
+                mirror_stats=stats)
+        assert not present and not errors
+        files = set(os.path.relpath(os.path.join(root, f), str(path))
+                    for root, _, fs in os.walk(str(path)) for f in fs)
+        return set(new), stats.bytes_added, files
+
+    serial_new, serial_bytes, serial_files = mirror(tmpdir.join('serial'), 1)
+    new, bytes_added, files = mirror(tmpdir.join('parallel'), 2)
+
+    assert serial_new and new == serial_new
+    assert serial_bytes and bytes_added == serial_bytes
+    assert files == serial_files
+
+    # Archives already in the mirror are not fetched again
+    stats = spack.mirror.MirrorStats()
+    with spack.config.override('config:checksum', False):
+        present, new, errors = spack.mirror.create(
+            str(tmpdir.join('parallel')), specs, jobs=2, mirror_stats=stats)
+    assert set(present) == serial_new and not new and not errors
+    assert stats.bytes_added == 0
+
+
+def test_mirror_create_in_parallel_worker_dies(
+        mock_packages, config, monkeypatch, tmpdir):
+    specs = [Spec(name).concretized() for name in ('a', 'b', 'c')]
+
+    def add_single_spec(spec, mirror_root, mirror_stats):
+        if spec.name == 'b':
+            os._exit(1)
+    monkeypatch.setattr(spack.mirror, 'add_single_spec', add_single_spec)
+
+    present, new, errors = spack.mirror.create(str(tmpdir), specs, jobs=2)
+    assert errors == [specs[1]]
+
+
+def test_mirror_stats_from_threads():
+    stats = spack.mirror.MirrorStats()
+    specs = [Spec('a@%d' % i) for i in range(8)]
+
+    def add(spec):
+        stats.next_spec(spec)
+        stats.added('/mirror/%s/new' % spec)
+        stats.already_existed('/mirror/%s/old' % spec)
+        stats.next_spec(None)
+
+    pool = multiprocessing.pool.ThreadPool(4)
+    try:
+        pool.map(add, specs)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    present, new, errors = stats.stats()
+    assert set(present) == set(new) == set(specs)
+    assert not errors
+    assert stats.bytes_added == 0
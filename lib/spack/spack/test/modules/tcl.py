@@ -5,6 +5,7 @@
 
 import pytest
 
+import spack.config
 import spack.modules.common
 import spack.modules.tcl
 import spack.spec
@@ -273,6 +274,22 @@ class TestTcl(object):
         short_description = 'module-whatis "This package updates the context for TCL modulefiles."'  # NOQA: ignore=E501
         assert short_description in content
 
+    def test_digest_of_extended_template(
+            self, factory, module_configuration, tmpdir
+    ):
+        """Tests that the digest changes with the templates a template
+        extends."""
+        module_configuration('autoload_direct')
+        writer, _ = factory('override-context-templates')
+        digest = writer.digest
+        assert digest
+
+        # Shadow the template extended by the one of the package
+        tmpdir.ensure('modules', 'modulefile.tcl').write('puts stderr "a"')
+        dirs = [str(tmpdir)] + spack.config.get('config:template_dirs')
+        with spack.config.override('config:template_dirs', dirs):
+            assert writer.digest not in (None, digest)
+
     @pytest.mark.regression('4400')
     @pytest.mark.db
     def test_blacklist_implicits(
@@ -10,14 +10,22 @@ import os
 import stat
 import sys
 import shutil
+import tarfile
 import pytest
 import argparse
+from contextlib import closing
 
 from llnl.util.filesystem import mkdirp
 
+import spack.caches
+import spack.config
 import spack.repo
 import spack.store
 import spack.binary_distribution as bindist
+import spack.util.file_cache
+import spack.util.spack_yaml as syaml
+import spack.util.url as url_util
+import spack.util.web as web_util
 import spack.cmd.buildcache as buildcache
 from spack.spec import Spec
 from spack.paths import mock_gpg_keys_path
@@ -233,6 +241,109 @@ echo $PATH"""
     bindist._cached_specs = None
 
 
+def make_spackfile(spec, tmpdir, members, links=()):
+    """Create a .spack file whose prefix tarball contains ``members``, a
+    mapping of member names to file contents, after the symbolic ``links``,
+    a sequence of member names and link targets."""
+    content = tmpdir.mkdir('content')
+    tarfile_path = str(tmpdir.join(bindist.tarball_name(spec, '.tar.gz')))
+    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
+        for name, target in links:
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.type = tarfile.SYMTYPE
+            tarinfo.linkname = target
+            tar.addfile(tarinfo)
+        for name, text in members.items():
+            path = content.join(name.replace(os.sep, '_'))
+            path.write(text)
+            tar.add(str(path), arcname=name)
+
+    spackfile_path = str(tmpdir.join(bindist.tarball_name(spec, '.spack')))
+    with closing(tarfile.open(spackfile_path, 'w')) as tar:
+        tar.add(tarfile_path, arcname=os.path.basename(tarfile_path))
+    return bindist.VerifiedTarball(
+        spackfile_path, str(tmpdir.mkdir('verify')), spackfile_path,
+        bindist.checksum_tarball(tarfile_path))
+
+
+def test_extract_prefix_tarball(install_mockery, tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    base = os.path.basename(spec.prefix)
+    verified = make_spackfile(spec, tmpdir, {
+        os.path.join(base, 'bin', 'tool'): 'tool',
+        os.path.join(base, 'share', 'data.txt'): spec.prefix})
+
+    bindist.extract_prefix_tarball(spec, verified)
+    with open(os.path.join(spec.prefix, 'share', 'data.txt')) as f:
+        assert f.read() == spec.prefix
+    assert os.path.isfile(os.path.join(spec.prefix, 'bin', 'tool'))
+
+
+def test_extract_prefix_tarball_wrong_checksum(install_mockery, tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    base = os.path.basename(spec.prefix)
+    verified = make_spackfile(spec, tmpdir, {
+        os.path.join(base, 'bin', 'tool'): 'tool'})
+    verified.checksum = 'abcdef'
+
+    with pytest.raises(bindist.NoChecksumException):
+        bindist.extract_prefix_tarball(spec, verified)
+    assert not os.path.exists(spec.prefix)
+
+
+def test_extract_prefix_tarball_outside_prefix(install_mockery, tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    base = os.path.basename(spec.prefix)
+    verified = make_spackfile(spec, tmpdir, {
+        os.path.join(base, '..', 'evil'): 'evil'})
+
+    with pytest.raises(bindist.InvalidTarballException):
+        bindist.extract_prefix_tarball(spec, verified)
+    assert not os.path.exists(
+        os.path.join(os.path.dirname(spec.prefix), 'evil'))
+
+
+def test_extract_prefix_tarball_links(install_mockery, tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    base = os.path.basename(spec.prefix)
+    verified = make_spackfile(spec, tmpdir, {
+        os.path.join(base, 'bin', 'tool'): 'tool'}, links=[
+            (os.path.join(base, 'tool'), os.path.join('bin', 'tool')),
+            (os.path.join(base, 'dep'), os.path.join('..', 'dep-1.0'))])
+
+    bindist.extract_prefix_tarball(spec, verified)
+    assert os.readlink(os.path.join(spec.prefix, 'tool')) == \
+        os.path.join('bin', 'tool')
+    assert os.readlink(os.path.join(spec.prefix, 'dep')) == \
+        os.path.join('..', 'dep-1.0')
+
+
+@pytest.mark.parametrize('link,target,member', [
+    # link outside of the install tree
+    ('lib', '{outside}', None),
+    # members written through links
+    ('bin', '{outside}', os.path.join('bin', 'evil')),
+    ('share', 'bin', os.path.join('share', 'evil')),
+    ('evil', os.path.join('bin', 'tool'), 'evil'),
+])
+def test_extract_prefix_tarball_bad_links(
+        install_mockery, tmpdir, link, target, member
+):
+    spec = Spec('trivial-install-test-package').concretized()
+    base = os.path.basename(spec.prefix)
+    outside = tmpdir.mkdir('outside')
+    members = {os.path.join(base, 'bin', 'tool'): 'tool'}
+    if member:
+        members[os.path.join(base, member)] = 'evil'
+    verified = make_spackfile(spec, tmpdir, members, links=[
+        (os.path.join(base, link), target.format(outside=outside))])
+
+    with pytest.raises(bindist.InvalidTarballException):
+        bindist.extract_prefix_tarball(spec, verified)
+    assert not os.path.exists(spec.prefix)
+    assert not outside.listdir()
+
+
 def test_relocate_text(tmpdir):
     with tmpdir.as_cwd():
         # Validate the text path replacement
@@ -399,3 +510,99 @@ def test_relocate_macho(tmpdir):
             'libncurses.5.4.dylib',
             rpaths, deps, idpath,
             nrpaths, ndeps, nid)
+
+
+@pytest.fixture()
+def spec_files_mirror(tmpdir, mock_packages, config, monkeypatch):
+    """Mirror with the spec files of a few specs in its build cache."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir.join('c'))))
+    monkeypatch.setattr(bindist, '_cached_specs', None)
+    monkeypatch.setattr(bindist, '_cached_spec_indexes', {})
+
+    build_cache = tmpdir.join('mirror', 'build_cache')
+    build_cache.ensure(dir=True)
+
+    specs = [Spec(s).concretized() for s in ('libelf', 'libdwarf')]
+    for spec in specs:
+        spec_dict = spec.to_dict()
+        spec_dict['full_hash'] = spec.full_hash()
+        spec_file = build_cache.join(bindist.tarball_name(spec, '.spec.yaml'))
+        spec_file.write(syaml.dump(spec_dict))
+
+    mirror_url = 'file://' + str(tmpdir.join('mirror'))
+    with spack.config.override('mirrors', {'test': mirror_url}):
+        yield url_util.join(mirror_url, 'build_cache'), specs
+
+
+def test_spec_index(spec_files_mirror):
+    cache_prefix, specs = spec_files_mirror
+    assert bindist.fetch_spec_index(cache_prefix) is None
+
+    bindist.generate_package_index(cache_prefix)
+    index = bindist.fetch_spec_index(cache_prefix, force=True)
+    assert sorted(index) == sorted(
+        bindist.tarball_name(s, '.spec.yaml') for s in specs)
+    for spec in specs:
+        entry = index[bindist.tarball_name(spec, '.spec.yaml')]
+        assert entry['full_hash'] == spec.full_hash()
+
+    found = bindist.get_specs(force=True)
+    assert (sorted(s.dag_hash() for s in found) ==
+            sorted(s.dag_hash() for s in specs))
+    assert all(s.concrete for s in found)
+
+
+def test_spec_index_is_cached(spec_files_mirror, monkeypatch):
+    cache_prefix, specs = spec_files_mirror
+    bindist.generate_package_index(cache_prefix)
+    bindist.fetch_spec_index(cache_prefix)
+
+    read_from_url = web_util.read_from_url
+    urls = []
+
+    def _read_from_url(url, *args, **kwargs):
+        urls.append(url)
+        return read_from_url(url, *args, **kwargs)
+
+    monkeypatch.setattr(web_util, 'read_from_url', _read_from_url)
+    monkeypatch.setattr(bindist, '_cached_spec_indexes', {})
+
+    # Only the checksum is downloaded when the index did not change
+    assert len(bindist.fetch_spec_index(cache_prefix)) == 2
+    assert [os.path.basename(u) for u in urls] == ['index.json.hash']
+
+    # Nothing is downloaded again in the same process
+    bindist.fetch_spec_index(cache_prefix)
+    assert len(urls) == 1
+
+
+@pytest.mark.disable_clean_stage_check
+def test_spec_index_with_wrong_checksum(spec_files_mirror):
+    cache_prefix, specs = spec_files_mirror
+    bindist.generate_package_index(cache_prefix)
+
+    hash_file = os.path.join(
+        url_util.local_file_path(cache_prefix), 'index.json.hash')
+    with open(hash_file, 'w') as f:
+        f.write('0' * 64)
+
+    assert bindist.fetch_spec_index(cache_prefix, force=True) is None
+
+    # Spec files are still found by listing the mirror
+    assert len(bindist.get_specs(force=True)) == 2
+
+
+def test_needs_rebuild_uses_spec_index(spec_files_mirror):
+    cache_prefix, specs = spec_files_mirror
+    bindist.generate_package_index(cache_prefix)
+
+    # Spec files are not read when the index shows they are up to date
+    build_cache = url_util.local_file_path(cache_prefix)
+    for spec in specs:
+        os.remove(os.path.join(
+            build_cache, bindist.tarball_name(spec, '.spec.yaml')))
+
+    mirror_url = os.path.dirname(build_cache)
+    for spec in specs:
+        assert not bindist.needs_rebuild(spec, mirror_url)
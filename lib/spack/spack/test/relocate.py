@@ -10,10 +10,12 @@ import shutil
 import pytest
 
 import llnl.util.filesystem
+import spack.config
 import spack.paths
 import spack.relocate
 import spack.store
 import spack.tengine
+import spack.util.elf
 import spack.util.executable
 
 
@@ -45,9 +47,7 @@ def source_file(tmpdir, is_relocatable):
     return src
 
 
-@pytest.mark.requires_executables(
-    '/usr/bin/gcc', 'patchelf', 'strings', 'file'
-)
+@pytest.mark.requires_executables('/usr/bin/gcc')
 def test_file_is_relocatable(source_file, is_relocatable):
     compiler = spack.util.executable.Executable('/usr/bin/gcc')
     executable = str(source_file).replace('.c', '.x')
@@ -78,3 +78,88 @@ def test_file_is_relocatable_errors(tmpdir):
         with pytest.raises(ValueError) as exc_info:
             spack.relocate.file_is_relocatable('delete.me')
         assert 'is not an absolute path' in str(exc_info.value)
+
+
+@pytest.mark.parametrize('content,expected', [
+    (b'', ('inode', 'x-empty')),
+    (b'hello world\n', ('text', 'plain')),
+    (b'#!/bin/bash\necho hello\n', ('text', 'x-shellscript')),
+    (b'#!/usr/bin/env python3\nprint()\n', ('text', 'x-python')),
+    (b'\xcf\xfa\xed\xfe\x07\x00\x00\x01', ('application', 'x-mach-binary')),
+    (b'!<arch>\nfoo.o/', ('application', 'x-archive')),
+    (b'\x00\x01\x02\x03', ('application', 'octet-stream')),
+])
+def test_mime_type(tmpdir, content, expected):
+    path = tmpdir.join('file')
+    path.write_binary(content)
+    assert spack.relocate.mime_type(str(path)) == expected
+
+
+def test_mime_type_of_links_and_directories(tmpdir):
+    path = tmpdir.ensure('file')
+    link = tmpdir.join('link')
+    link.mksymlinkto(path)
+
+    types = spack.relocate.mime_types([str(link), str(tmpdir)])
+    assert types[str(link)] == ('inode', 'symlink')
+    assert types[str(tmpdir)] == ('inode', 'directory')
+
+
+@pytest.mark.requires_executables('/usr/bin/gcc')
+def test_elf_dynamic_section(tmpdir):
+    source = tmpdir.join('main.c')
+    source.write('int main() { return 0; }')
+    executable = str(tmpdir.join('main.x'))
+    spack.util.executable.Executable('/usr/bin/gcc')(
+        str(source), '-o', executable, '-Wl,-rpath,/foo/lib:/bar/lib')
+
+    assert spack.relocate.mime_type(executable)[1] in (
+        'x-executable', 'x-sharedlib')
+    elf_file = spack.util.elf.parse_elf(executable)
+    assert elf_file.search_paths == ['/foo/lib', '/bar/lib']
+    assert any(lib.startswith('libc.') for lib in elf_file.needed)
+    assert spack.relocate.get_existing_elf_rpaths(executable) == [
+        '/foo/lib', '/bar/lib']
+
+
+def test_parse_elf_errors(tmpdir):
+    path = tmpdir.join('not_elf')
+    path.write('hello')
+    with pytest.raises(spack.util.elf.ElfParsingError):
+        spack.util.elf.parse_elf(str(path))
+
+    path.write_binary(b'\x7fELF\x02\x01\x01')
+    with pytest.raises(spack.util.elf.ElfParsingError):
+        spack.util.elf.parse_elf(str(path))
+
+
+def test_prefix_replacer_single_pass():
+    replacer = spack.relocate.PrefixReplacer({
+        '/old/spack/opt': '/new/opt',
+        '/old/spack': '/new/spack',
+    })
+    data = b'-I/old/spack/opt/include:/old/spack/bin /usr/old/spack/opt'
+    assert replacer.replace(data) == (
+        b'-I/new/opt/include:/new/spack/bin /usr/old/spack/opt')
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_prefix_replacer_files(tmpdir, monkeypatch, parallel):
+    if parallel:
+        monkeypatch.setattr(spack.relocate, 'parallel_relocation_threshold', 2)
+        monkeypatch.setattr(spack.relocate, 'mmap_threshold', 16)
+        monkeypatch.setattr(
+            spack.relocate.multiprocessing, 'cpu_count', lambda: 2)
+
+    paths = []
+    for i in range(4):
+        path = tmpdir.join('file%d.txt' % i)
+        path.write('prefix=/old/prefix/lib\n' if i % 2 else 'no prefix\n')
+        paths.append(str(path))
+
+    replacer = spack.relocate.PrefixReplacer({'/old/prefix': '/new/prefix'})
+    with spack.config.override('config:build_jobs', 2):
+        assert replacer.apply_all(paths) == 2
+
+    assert tmpdir.join('file1.txt').read() == 'prefix=/new/prefix/lib\n'
+    assert tmpdir.join('file0.txt').read() == 'no prefix\n'
@@ -3,11 +3,17 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import multiprocessing
 import os
+
 import pytest
 
+import spack.caches
+import spack.config
 import spack.repo
 import spack.paths
+import spack.util.file_cache
+import spack.util.spack_json
 
 
 # Unlike the repo_path fixture defined in conftest, this has a test-level
@@ -70,3 +76,104 @@ def test_repo_invisibles(repo_for_test, extra_repo):
     with open(os.path.join(extra_repo.root, 'packages', '.invisible'), 'w'):
         pass
     extra_repo.all_package_names()
+
+
+@pytest.fixture()
+def repo_index(mock_packages, tmpdir, monkeypatch):
+    """Returns a function making a new RepoIndex for the mock repository,
+    with its cache in a temporary directory."""
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    repo = spack.repo.path.repos[0]
+
+    def _index(**indexers):
+        index = spack.repo.RepoIndex(repo._pkg_checker, repo.namespace)
+        for name, indexer in indexers.items():
+            index.add_indexer(name, indexer)
+        return index
+
+    return _index
+
+
+class CountingTagIndexer(spack.repo.TagIndexer):
+    updated = []
+
+    def update(self, pkg_fullname):
+        self.updated.append(pkg_fullname)
+        super(CountingTagIndexer, self).update(pkg_fullname)
+
+
+def test_repo_index_ignores_unchanged_packages(repo_index):
+    CountingTagIndexer.updated = []
+    tags = repo_index(tags=CountingTagIndexer())['tags']
+    assert CountingTagIndexer.updated
+    assert 'mpich' in tags['tag1']
+
+    # Make all packages look newer than the index
+    cache = spack.caches.misc_cache
+    os.utime(cache.cache_path('tags/builtin.mock-index.json'), (1, 1))
+
+    CountingTagIndexer.updated = []
+    assert repo_index(tags=CountingTagIndexer())['tags'] == tags
+    assert not CountingTagIndexer.updated
+
+    # Only packages whose contents changed are updated
+    os.utime(cache.cache_path('tags/builtin.mock-index.json'), (1, 1))
+    hashes_key = 'tags/builtin.mock-hashes.json'
+    with cache.write_transaction(hashes_key) as (old, new):
+        hashes = spack.util.spack_json.load(old)
+        hashes['mpich'] = 'outdated'
+        spack.util.spack_json.dump(hashes, new)
+
+    CountingTagIndexer.updated = []
+    repo_index(tags=CountingTagIndexer())['tags']
+    assert CountingTagIndexer.updated == ['builtin.mock.mpich']
+
+
+def test_repo_index_in_parallel(repo_index, monkeypatch):
+    def indexers():
+        return dict(tags=spack.repo.TagIndexer(),
+                    providers=spack.repo.ProviderIndexer(),
+                    patches=spack.repo.PatchIndexer())
+
+    index = repo_index(**indexers())
+    expected = dict((name, index[name]) for name in indexers())
+    spack.caches.misc_cache.destroy()
+
+    monkeypatch.setattr(spack.repo, 'parallel_index_threshold', 1)
+    monkeypatch.setattr(multiprocessing, 'cpu_count', lambda: 2)
+    with spack.config.override('config:build_jobs', 2):
+        index = repo_index(**indexers())
+        assert index['providers'] == expected['providers']
+        assert index['patches'].index == expected['patches'].index
+        assert (dict((t, sorted(p)) for t, p in index['tags'].items()) ==
+                dict((t, sorted(p)) for t, p in expected['tags'].items()))
+
+
+def test_package_checker_stats_lazily(tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.repo.FastPackageChecker, '_paths_cache', {})
+    monkeypatch.setattr(spack.repo.FastPackageChecker, '_stats_cache', {})
+    packages = tmpdir.join('packages')
+    for name in ('a', 'b'):
+        packages.ensure(name, spack.repo.package_file_name)
+    packages.ensure('no-package', dir=True)
+
+    stated = []
+    stat_package = spack.repo.FastPackageChecker._stat_package
+
+    def _stat_package(self, pkg_name):
+        stated.append(pkg_name)
+        return stat_package(self, pkg_name)
+    monkeypatch.setattr(
+        spack.repo.FastPackageChecker, '_stat_package', _stat_package)
+
+    # Looking up a package only stats its own package file
+    checker = spack.repo.FastPackageChecker(str(packages))
+    assert 'a' in checker
+    assert 'c' not in checker
+    assert stated == ['a']
+
+    # Directories without a package file are not packages
+    assert 'no-package' not in checker
+    assert sorted(checker) == ['a', 'b']
+    assert sorted(stated) == ['a', 'b', 'no-package']
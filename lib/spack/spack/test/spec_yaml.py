@@ -17,7 +17,9 @@ from collections import Iterable, Mapping
 import pytest
 
 import spack.architecture
+import spack.error
 import spack.hash_types as ht
+import spack.paths
 import spack.spec
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
@@ -322,3 +324,82 @@ def test_save_dependency_spec_yamls_subset(tmpdir, config):
 
         assert check_specs_equal(b_spec, os.path.join(output_path, 'b.yaml'))
         assert check_specs_equal(c_spec, os.path.join(output_path, 'c.yaml'))
+
+
+def test_dump_flow_matches_yaml(config, mock_packages):
+    """dump_flow() must write exactly the YAML the spec hashes are computed
+    from, or the hashes of installed specs would change."""
+    hash_types = [ht.dag_hash, ht.build_hash, ht.full_hash]
+    checked = 0
+    for name in repo.path.all_package_names():
+        try:
+            spec = Spec(name).concretized()
+        except Exception:
+            continue
+        for node in spec.traverse():
+            for hash_type in hash_types:
+                try:
+                    node_dict = node.to_node_dict(hash=hash_type)
+                except spack.error.SpackError:
+                    # e.g. package hashes of broken mock packages
+                    continue
+                assert (syaml.dump_flow(node_dict) ==
+                        syaml.dump(node_dict, default_flow_style=True))
+                checked += 1
+    assert checked
+
+
+@pytest.mark.parametrize('data', [
+    syaml_dict([('version', '1.0'), ('patches', ['a b', "it's", ''])]),
+    syaml_dict([('external', syaml_dict([('path', None), ('module', '')]))]),
+    syaml_dict([('null', 'true'), ('x', ['@1', '%a', 'a:b', '- a', 3])]),
+    # scalars ruamel writes in double quotes, or over several lines
+    syaml_dict([('description', 'first\nsecond')]),
+    syaml_dict([('unicode', u'\xfc')]),
+    syaml_dict([('', 'empty key'), ('x' * 130, 'long key')]),
+])
+def test_dump_flow_scalars(data):
+    assert (syaml.dump_flow(data) ==
+            syaml.dump(data, default_flow_style=True))
+
+
+@pytest.fixture(scope='module')
+def builtin_node_dicts():
+    """Node dicts for every package in the builtin repository."""
+    builtin = repo.RepoPath(spack.paths.packages_path)
+    node_dicts = []
+    with repo.swap(builtin):
+        for name in builtin.all_package_names():
+            pkg_cls = builtin.get_pkg_class(name)
+            spec = Spec(name)
+            spec.namespace = 'builtin'
+            if pkg_cls.versions:
+                spec.versions = spack.version.VersionList(
+                    [max(pkg_cls.versions)])
+            spec.architecture = spack.spec.ArchSpec('linux-rhel7-x86_64')
+            spec.compiler = spack.spec.CompilerSpec('gcc@9.2.0')
+            for vname, variant in sorted(pkg_cls.variants.items()):
+                spec.variants[vname] = variant.make_default()
+            node_dicts.append(spec.to_node_dict())
+    return node_dicts
+
+
+@pytest.mark.maybeslow
+def test_dump_flow_builtin(builtin_node_dicts):
+    """Write node dicts for every package in the builtin repository with
+    ruamel and with dump_flow(), and check the output is the same."""
+    expected = [syaml.dump(d, default_flow_style=True)
+                for d in builtin_node_dicts]
+    assert [syaml.dump_flow(d) for d in builtin_node_dicts] == expected
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('dump', [
+    lambda d: syaml.dump(d, default_flow_style=True),
+    syaml.dump_flow,
+], ids=['ruamel', 'dump_flow'])
+def test_dump_builtin_benchmark(builtin_node_dicts, dump):
+    """Write node dicts for every package in the builtin repository. The
+    time taken by each writer is reported with --durations."""
+    for d in builtin_node_dicts:
+        dump(d)
@@ -14,8 +14,11 @@ import getpass
 
 import pytest
 
-from llnl.util.filesystem import mkdirp, partition_path, touch, working_dir
+from llnl.util.filesystem import filter_file, mkdirp, partition_path, touch
+from llnl.util.filesystem import working_dir
 
+import spack.config
+import spack.fetch_strategy
 import spack.paths
 import spack.stage
 import spack.util.executable
@@ -564,6 +567,73 @@ class TestStage(object):
             check_expand_archive(stage, self.stage_name, expected_file_list)
         check_destroy(stage, self.stage_name)
 
+    @pytest.mark.parametrize('expected_file_list', [
+        [_include_readme],
+        [_include_extra, _include_readme]])
+    def test_expand_archive_from_cache(
+            self, expected_file_list, mock_stage_archive, tmpdir, monkeypatch
+    ):
+        archive = mock_stage_archive(expected_file_list)
+        cache_root = str(tmpdir.join('expanded-sources'))
+
+        stored = []
+        store = spack.fetch_strategy.ExpandedSourceCache._store
+
+        def _store(self, entry, *args):
+            stored.append(entry)
+            return store(self, entry, *args)
+
+        monkeypatch.setattr(
+            spack.fetch_strategy.ExpandedSourceCache, '_store', _store)
+
+        def expand():
+            with Stage(archive.url, name=self.stage_name) as stage:
+                stage.fetch()
+                stage.expand_archive()
+                check_expand_archive(stage, self.stage_name,
+                                     expected_file_list)
+            check_destroy(stage, self.stage_name)
+
+        with spack.config.override(
+                'config:expanded_source_cache', cache_root):
+            # The second stage reuses the expansion of the first one
+            expand()
+            expand()
+            assert len(stored) == 1
+            entry = stored[0]
+            assert os.path.dirname(entry) == cache_root
+
+            # Modified entries are expanded again
+            readme = os.path.join(entry, 'source', _archive_base, _readme_fn)
+            with open(readme, 'a') as f:
+                f.write('modified\n')
+            expand()
+            assert stored == [entry, entry]
+
+    def test_expand_archive_from_cache_is_a_copy(
+            self, mock_stage_archive, tmpdir, monkeypatch):
+        """Builds modifying staged files in place leave the cache intact."""
+        archive = mock_stage_archive([_include_readme])
+        cache_root = str(tmpdir.join('expanded-sources'))
+
+        # Filesystems without copy-on-write clones
+        monkeypatch.setattr(spack.fetch_strategy.ExpandedSourceCache,
+                            '_reflink', {cache_root: False})
+
+        with spack.config.override(
+                'config:expanded_source_cache', cache_root):
+            with Stage(archive.url, name=self.stage_name) as stage:
+                stage.fetch()
+                stage.expand_archive()
+                readme = os.path.join(stage.source_path, _readme_fn)
+                filter_file(_readme_contents, 'modified', readme)
+
+        entry, = os.listdir(cache_root)
+        cached = os.path.join(
+            cache_root, entry, 'source', _archive_base, _readme_fn)
+        with open(cached) as f:
+            assert f.read() == _readme_contents
+
     def test_expand_archive_extra_expand(self, mock_stage_archive):
         """Test expand with an extra expand after expand (i.e., no-op)."""
         archive = mock_stage_archive()
@@ -3,8 +3,17 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+from __future__ import print_function
+
+import os
+import sys
+
 from ctest_log_parser import CTestLogParser
 
+from llnl.util.tty.log import log_output
+
+from spack.util.log_parse import LogEventParser, load_log_events
+
 
 def test_log_parser(tmpdir):
     log_file = tmpdir.join('log.txt')
@@ -32,3 +41,77 @@ configure: error: cannot run C compiled programs.                           E
 
     assert len(warnings) == 1
     assert all(w.text.endswith('W') for w in warnings)
+
+
+def test_log_event_parser(tmpdir):
+    lines = ['line %d' % i for i in range(20)]
+    lines[3] = 'foo.c:12: error: something weird happened'
+    lines[5] = 'foo.c:15: warning: some weird warning'
+    lines[17] = 'ld: fatal: linker thing happened'
+    lines[18] = 'configure: error: cannot run C compiled programs.'
+
+    events_path = str(tmpdir.join('events.json'))
+    parser = LogEventParser(events_path, context=2, max_events=2)
+
+    # Events are saved once their context is complete
+    parser.parse(lines[:5])
+    assert not os.path.exists(events_path)
+    parser.parse(lines[5:6])
+    errors, warnings, nerrors, nwarnings = load_log_events(events_path)
+    assert [e.text for e in errors] == [lines[3]]
+    assert errors[0].source_file == 'foo.c'
+    assert errors[0].source_line_no == '12'
+    assert errors[0].pre_context == lines[1:3]
+    assert errors[0].post_context == lines[4:6]
+
+    # Events found meanwhile are saved with the context they have so far
+    assert [w.text for w in warnings] == [lines[5]]
+    assert warnings[0].post_context == []
+
+    # Only the first errors are kept, but all are counted
+    parser.parse(lines[6:])
+    parser.close()
+    errors, warnings, nerrors, nwarnings = load_log_events(events_path)
+    assert [e.text for e in errors] == [lines[3], lines[17]]
+    assert [e.line_no for e in errors] == [4, 18]
+    assert errors[1].post_context == lines[18:20]
+    assert [w.text for w in warnings] == [lines[5]]
+    assert (nerrors, nwarnings) == (3, 1)
+
+
+def test_log_event_parser_skipped_lines(tmpdir):
+    events_path = str(tmpdir.join('events.json'))
+    parser = LogEventParser(events_path, context=2)
+
+    parser.parse(['line 1', 'foo.c:12: error: something weird happened'])
+    parser.parse(['ld: fatal: linker thing happened', 'line 11'],
+                 skipped=7)
+    parser.close()
+
+    # Line numbers account for the lines skipped, and the context of events
+    # does not extend over them
+    errors, _, nerrors, _ = load_log_events(events_path)
+    assert nerrors == 2
+    assert [e.line_no for e in errors] == [2, 10]
+    assert errors[0].post_context == []
+    assert errors[1].pre_context == []
+    assert errors[1].post_context == ['line 11']
+
+
+def test_log_event_parser_with_log_output(tmpdir):
+    events_path = str(tmpdir.join('events.json'))
+    with tmpdir.as_cwd():
+        with log_output('log.txt', parser=LogEventParser(events_path)):
+            print('checking whether the C compiler works... yes')
+            print('\x1b[1mconfigure: error: cannot run C programs.\x1b[0m')
+            sys.stdout.write('make: *** [all] Error 1')
+
+    errors, _, nerrors, _ = load_log_events(events_path)
+    assert nerrors == 2
+    assert [e.text for e in errors] == [
+        'configure: error: cannot run C programs.',
+        'make: *** [all] Error 1']
+    assert errors[1].line_no == 3
+    assert errors[1].pre_context == [
+        'checking whether the C compiler works... yes',
+        'configure: error: cannot run C programs.']
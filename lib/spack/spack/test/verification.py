@@ -9,6 +9,7 @@ import shutil
 
 import llnl.util.filesystem as fs
 
+import spack.hooks
 import spack.util.spack_json as sjson
 import spack.verify
 import spack.spec
@@ -114,6 +115,32 @@ def test_file_manifest_entry(tmpdir):
     assert sorted(results.errors[file]) == sorted(expected)
 
 
+def test_fast_file_manifest_entry(tmpdir):
+    # Test that the fast mode hashes only files that look modified
+    # Whole seconds survive os.utime() on all Python versions
+    mtime = 1500000000
+    file = str(tmpdir.join('file'))
+    with open(file, 'w') as f:
+        f.write('This is a file')
+    os.utime(file, (mtime, mtime))
+
+    data = spack.verify.create_manifest_entry(file)
+    assert data['inode'] == os.stat(file).st_ino
+
+    # Same size and mtime, different contents
+    with open(file, 'w') as f:
+        f.write('This is a fake')
+    os.utime(file, (mtime, mtime))
+
+    assert spack.verify.check_entry(file, data).errors[file] == ['hash']
+    assert not spack.verify.check_entry(file, data, fast=True).has_errors()
+
+    # A new inode means the file was replaced
+    data['inode'] += 1
+    results = spack.verify.check_entry(file, data, fast=True)
+    assert results.errors[file] == ['hash']
+
+
 def test_check_chmod_manifest_entry(tmpdir):
     # Check that the verification properly identifies errors for files whose
     # permissions have been modified.
@@ -187,6 +214,40 @@ def test_check_prefix_manifest(tmpdir):
     assert results.errors[spec.prefix] == ['manifest corrupted']
 
 
+def test_check_spec_manifests(tmpdir, monkeypatch):
+    # Test the verification of many prefixes with a pool of threads
+    monkeypatch.setattr(spack.verify, 'hash_block_size', 4)
+
+    specs = []
+    for name in ('libelf', 'libdwarf', 'mpich'):
+        prefix_path = tmpdir.join(name)
+        for i in range(8):
+            f = prefix_path.ensure('lib', 'file%d' % i)
+            f.write('%s %d' % (name, i))
+            f.setmtime(1500000000)
+        prefix_path.ensure('.spack', dir=True)
+
+        spec = spack.spec.Spec(name)
+        spec._mark_concrete()
+        spec.prefix = str(prefix_path)
+        spack.verify.write_manifest(spec)
+        specs.append(spec)
+
+    modified = tmpdir.join('libdwarf', 'lib', 'file3')
+    modified.write('libdwarf X')
+    modified.setmtime(1500000000)
+
+    checks = list(spack.verify.check_spec_manifests(specs, threads=2))
+    assert [spec for spec, _, _ in checks] == specs
+
+    errors = [results.errors for _, results, _ in checks]
+    assert errors == [{}, {str(modified): ['hash']}, {}]
+
+    for spec, _, stats in checks:
+        assert stats['files'] == stats['hashed_files'] == 8
+        assert stats['hashed_bytes'] == 8 * len(spec.name + ' 0')
+
+
 def test_single_file_verification(tmpdir):
     # Test the API to verify a single file, including finding the package
     # to which it belongs
@@ -230,3 +291,75 @@ def test_single_file_verification(tmpdir):
     results = spack.verify.check_file_manifest(filepath)
     assert results.has_errors()
     assert results.errors[filepath] == ['not owned by any package']
+
+
+def test_manifest_hashed_in_batches(tmpdir, monkeypatch):
+    # Test that hashing files in batches, with threads, while the prefix is
+    # scanned gives the same manifest as hashing each file in turn
+    monkeypatch.setattr(spack.verify, 'hash_batch_size', 3)
+
+    prefix_path = tmpdir.join('prefix')
+    for i in range(10):
+        prefix_path.ensure('dir%d' % (i % 3), 'file%d' % i).write(str(i))
+    prefix_path.ensure('.spack', dir=True)
+    os.symlink('dir0', str(prefix_path.join('link')))
+
+    spec = spack.spec.Spec('libelf')
+    spec._mark_concrete()
+    spec.prefix = str(prefix_path)
+    spack.verify.write_manifest(spec)
+
+    with open(spack.verify.manifest_file_path(spec)) as f:
+        manifest = sjson.load(f)
+
+    paths = [spec.prefix]
+    for root, dirs, files in os.walk(spec.prefix):
+        paths.extend(os.path.join(root, x) for x in dirs + files)
+    paths.remove(spack.verify.manifest_file_path(spec))
+    assert sorted(manifest) == sorted(paths)
+    for path in paths:
+        assert manifest[path] == spack.verify.create_manifest_entry(path)
+
+
+def test_scan_prefix_visits_each_entry_once(tmpdir):
+    prefix_path = tmpdir.join('prefix')
+    prefix_path.ensure('bin', 'tool')
+    prefix_path.ensure('lib', 'sub', 'libfoo.so')
+    os.symlink('lib', str(prefix_path.join('lib64')))
+
+    class Recorder(spack.hooks.PrefixScanner):
+        def __init__(self):
+            self.visited = []
+            self.finished = self.closed = False
+
+        def visit(self, entry):
+            self.visited.append(
+                (os.path.relpath(entry.path, str(prefix_path)),
+                 entry.is_dir, entry.is_link))
+
+        def finish(self):
+            self.finished = True
+
+        def close(self):
+            self.closed = True
+
+    first, second = Recorder(), Recorder()
+    spack.hooks.scan_prefix(str(prefix_path), [first, second])
+
+    assert first.visited == second.visited
+    assert first.finished and first.closed
+    assert sorted(first.visited) == sorted([
+        ('.', True, False),
+        ('bin', True, False),
+        (os.path.join('bin', 'tool'), False, False),
+        ('lib', True, False),
+        ('lib64', False, True),
+        (os.path.join('lib', 'sub'), True, False),
+        (os.path.join('lib', 'sub', 'libfoo.so'), False, False),
+    ])
+
+    # Directories are visited before their contents
+    order = [path for path, _, _ in first.visited]
+    assert order.index('lib') < order.index(os.path.join('lib', 'sub'))
+    assert order.index(os.path.join('lib', 'sub')) < order.index(
+        os.path.join('lib', 'sub', 'libfoo.so'))
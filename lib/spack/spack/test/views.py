@@ -5,6 +5,7 @@
 
 import os
 
+import spack.store
 from spack.spec import Spec
 from spack.directory_layout import YamlDirectoryLayout
 from spack.filesystem_view import YamlFilesystemView
@@ -41,3 +42,42 @@ def test_remove_extensions_ordered(install_mockery, mock_fetch, tmpdir):
 
     e1 = e2['extension1']
     view.remove_specs(e1, e2)
+
+
+def test_view_manifest(install_mockery, mock_fetch, tmpdir):
+    view_dir = str(tmpdir.join('view'))
+    view = YamlFilesystemView(view_dir, spack.store.layout)
+    spec = Spec('libdwarf').concretized()
+    spec.package.do_install(fake=True)
+    view.add_specs(spec)
+
+    # the manifest records the specs and the files they linked
+    hashes = set(s.dag_hash() for s in spec.traverse())
+    assert view.get_all_hashes() == hashes
+
+    view = YamlFilesystemView(view_dir, spack.store.layout)
+    assert view.get_all_hashes() == hashes
+    assert set(view.get_all_specs()) == set(spec.traverse())
+    entry = view.manifest[spec.dag_hash()]
+    assert 'lib/libdwarf.a' in entry['files']
+    assert os.path.islink(os.path.join(view_dir, 'lib', 'libdwarf.a'))
+
+    view.remove_specs(spec)
+    assert view.get_all_hashes() == hashes - set([spec.dag_hash()])
+    assert not os.path.exists(os.path.join(view_dir, 'lib', 'libdwarf.a'))
+
+
+def test_view_remove_hashes_of_uninstalled_specs(
+        install_mockery, mock_fetch, tmpdir):
+    view_dir = str(tmpdir.join('view'))
+    view = YamlFilesystemView(view_dir, spack.store.layout)
+    spec = Spec('libelf').concretized()
+    spec.package.do_install(fake=True)
+    view.add_specs(spec)
+
+    spec.package.do_uninstall()
+    assert view.get_spec_by_hash(spec.dag_hash()) is None
+
+    view.remove_hashes(spec.dag_hash())
+    assert view.get_all_hashes() == set()
+    assert os.listdir(view_dir) == ['.spack']
@@ -5,9 +5,14 @@
 
 """Tests for web.py."""
 import os
+import threading
+
+import pytest
+
+from six.moves import BaseHTTPServer, SimpleHTTPServer, socketserver
 
 import spack.paths
-from spack.util.web import spider, find_versions_of_archive
+from spack.util.web import spider, iter_spider, find_versions_of_archive
 from spack.version import ver
 
 
@@ -141,3 +146,65 @@ def test_find_exotic_versions_of_archive_3():
     assert ver('2.0.0b2') in versions
     assert ver('3.0a1') in versions
     assert ver('4.5-rc5') in versions
+
+
+def test_iter_spider_yields_pages_as_fetched():
+    fetched = []
+    for url, page, links in iter_spider(root, depth=3, concurrency=1):
+        # Links of a page are available before the crawl is over
+        fetched.append(url)
+        if url == root:
+            assert page_1 in links
+            assert len(fetched) == 1
+
+    assert sorted(fetched) == sorted([root, page_1, page_2, page_3, page_4])
+
+
+class _WebDataHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """Serves test/data/web over HTTP/1.1, counting connections."""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        _WebDataHandler.connections += 1
+        SimpleHTTPServer.SimpleHTTPRequestHandler.setup(self)
+
+    def translate_path(self, path):
+        return os.path.join(web_data_path, os.path.basename(path))
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture()
+def http_root():
+    _WebDataHandler.connections = 0
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _WebDataHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:%d/' % server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_spider_reuses_http_connections(http_root, monkeypatch):
+    for var in ('http_proxy', 'HTTP_PROXY', 'all_proxy', 'ALL_PROXY'):
+        monkeypatch.delenv(var, raising=False)
+
+    pages, links = spider(http_root + 'index.html', depth=3)
+    assert sorted(pages) == sorted(
+        http_root + p for p in
+        ('index.html', '1.html', '2.html', '3.html', '4.html'))
+    assert "This is page 4." in pages[http_root + '4.html']
+
+    # Each page is requested twice (HEAD and GET), on connections that
+    # stay open for the next pages
+    assert _WebDataHandler.connections < 2 * len(pages)
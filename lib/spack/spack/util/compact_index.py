@@ -0,0 +1,268 @@
+# Copyright 2013-2019 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Compact binary encoding of the install database index.
+
+The file is meant to be memory-mapped and read lazily. It is made of:
+
+  1. a fixed-size header;
+  2. a table of interned strings (hashes, names, paths, ...), stored as
+     (offset, length) pairs followed by the UTF-8 data;
+  3. a table of fixed-size install records, referring to strings by index;
+  4. an array of dependency edges, referring to strings by index;
+  5. the JSON-encoded spec node of each record.
+
+Everything the database needs to index and filter records is in the
+fixed-size tables, so the JSON node of a record is only decoded when its
+spec is actually needed.
+"""
+import json
+import mmap
+import struct
+
+import spack.error
+import spack.util.spack_json as sjson
+
+__all__ = ['dump', 'load', 'CompactIndex', 'CompactIndexError']
+
+#: First bytes of a compact index file
+magic = b'SPACKDBC'
+
+#: Version of the binary layout, independent of the database version
+format_version = 1
+
+_header = struct.Struct('<8sIIIIIIQQQQ')
+_string = struct.Struct('<QI')
+_record = struct.Struct('<IIIIIBidIIQI')
+_edge = struct.Struct('<III')
+
+#: String index meaning "no value"
+_none = 0xffffffff
+
+_installed, _explicit = 1, 2
+
+#: Node fields used by queries, stored as one interned JSON string
+_summary_fields = ('version', 'versions', 'compiler', 'arch', 'namespace')
+
+
+def _compact_json(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+def dump(installs, version, generation, stream):
+    """Write install records to a binary stream.
+
+    Args:
+        installs (dict): DAG hash -> record dictionary, as in the
+            ``installs`` section of ``index.json``
+        version (str): version of the database
+        generation (str or None): generation of the database
+        stream: binary stream to write to
+    """
+    strings, string_ids = [], {}
+
+    def intern(value):
+        if value is None:
+            return _none
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    version_id, generation_id = intern(version), intern(generation)
+
+    records, edges, blobs = [], [], []
+    blob_offset = 0
+    for hash_key in sorted(installs):
+        rec = installs[hash_key]
+        node = rec['spec']
+        name = next(iter(node))
+        fields = node[name]
+
+        summary = dict((k, fields[k]) for k in _summary_fields if k in fields)
+        first_edge = len(edges)
+        dependencies = fields.get('dependencies', {})
+        for dep_name in sorted(dependencies):
+            dep = dependencies[dep_name]
+            if isinstance(dep, dict):
+                dep_hash, deptypes = dep['hash'], dep['type']
+            else:
+                dep_hash, deptypes = dep, ['build', 'link']
+            edges.append((intern(dep_name), intern(dep_hash),
+                          intern(','.join(deptypes))))
+
+        blob = json.dumps(node, separators=(',', ':')).encode('utf-8')
+        blobs.append(blob)
+
+        flags = ((_installed if rec['installed'] else 0) |
+                 (_explicit if rec.get('explicit') else 0))
+        records.append((
+            intern(hash_key), intern(name), intern(_compact_json(summary)),
+            intern(rec.get('path')), intern(rec.get('deprecated_for')),
+            flags, rec.get('ref_count', 0),
+            float(rec.get('installation_time', 0)),
+            first_edge, len(edges) - first_edge, blob_offset, len(blob)))
+        blob_offset += len(blob)
+
+    encoded = [s.encode('utf-8') for s in strings]
+
+    strings_offset = _header.size
+    string_data_offset = strings_offset + _string.size * len(encoded)
+    records_offset = string_data_offset + sum(len(s) for s in encoded)
+    edges_offset = records_offset + _record.size * len(records)
+    blobs_offset = edges_offset + _edge.size * len(edges)
+
+    stream.write(_header.pack(
+        magic, format_version, len(encoded), len(records), len(edges),
+        version_id, generation_id, strings_offset, records_offset,
+        edges_offset, blobs_offset))
+
+    offset = string_data_offset
+    for s in encoded:
+        stream.write(_string.pack(offset, len(s)))
+        offset += len(s)
+    for s in encoded:
+        stream.write(s)
+    for record in records:
+        stream.write(_record.pack(*record))
+    for edge in edges:
+        stream.write(_edge.pack(*edge))
+    for blob in blobs:
+        stream.write(blob)
+
+
+def load(path):
+    """Open the compact index at ``path``."""
+    return CompactIndex(path)
+
+
+class CompactIndex(object):
+    """Read-only view of a memory-mapped compact index file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._data = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error) as e:
+                raise CompactIndexError(
+                    'cannot map compact index: %s' % path, str(e))
+
+        if len(self._data) < _header.size:
+            raise CompactIndexError('truncated compact index: %s' % path)
+
+        (file_magic, version, self._n_strings, self._n_records,
+         self._n_edges, version_id, generation_id, self._strings_offset,
+         self._records_offset, self._edges_offset,
+         self._blobs_offset) = _header.unpack_from(self._data, 0)
+
+        if file_magic != magic:
+            raise CompactIndexError('not a compact index: %s' % path)
+        if version != format_version:
+            raise CompactIndexError(
+                'unsupported compact index version %d: %s' % (version, path))
+
+        self._strings = [None] * self._n_strings
+        self._summaries = {}
+        self.version = self.string(version_id)
+        self.generation = self.string(generation_id)
+
+    def __len__(self):
+        return self._n_records
+
+    def string(self, sid):
+        """Return the interned string with index ``sid``."""
+        if sid == _none:
+            return None
+        s = self._strings[sid]
+        if s is None:
+            offset, length = _string.unpack_from(
+                self._data, self._strings_offset + sid * _string.size)
+            s = str(self._data[offset:offset + length].decode('utf-8'))
+            self._strings[sid] = s
+        return s
+
+    def _summary(self, sid):
+        """Decode each distinct summary only once."""
+        if sid not in self._summaries:
+            self._summaries[sid] = sjson.load(self.string(sid))
+        return self._summaries[sid]
+
+    def records(self):
+        """Iterate over the records in the index.
+
+        Yields:
+            tuple: DAG hash of the record, dictionary with the record fields
+            (``spec`` is a :class:`LazyNode`)
+        """
+        for i in range(self._n_records):
+            (hash_id, name_id, summary_id, path_id, deprecated_id, flags,
+             ref_count, installation_time, first_edge, n_edges,
+             blob_offset, blob_length) = _record.unpack_from(
+                self._data, self._records_offset + i * _record.size)
+
+            rec = {
+                'path': self.string(path_id),
+                'installed': bool(flags & _installed),
+                'explicit': bool(flags & _explicit),
+                'ref_count': ref_count,
+                'installation_time': installation_time,
+                'spec': LazyNode(self, self.string(name_id),
+                                 self._summary(summary_id),
+                                 first_edge, n_edges,
+                                 blob_offset, blob_length),
+            }
+            deprecated_for = self.string(deprecated_id)
+            if deprecated_for:
+                rec['deprecated_for'] = deprecated_for
+
+            yield self.string(hash_id), rec
+
+    def dependencies(self, first_edge, n_edges):
+        """Return (name, hash, deptypes) for a range of edges."""
+        result = []
+        for i in range(first_edge, first_edge + n_edges):
+            name_id, hash_id, types_id = _edge.unpack_from(
+                self._data, self._edges_offset + i * _edge.size)
+            result.append((self.string(name_id), self.string(hash_id),
+                           self.string(types_id).split(',')))
+        return result
+
+    def node(self, blob_offset, blob_length):
+        """Decode the spec node stored at a given offset."""
+        start = self._blobs_offset + blob_offset
+        return sjson.load(
+            self._data[start:start + blob_length].decode('utf-8'))
+
+
+class LazyNode(object):
+    """Spec node of a record in a compact index, decoded on demand.
+
+    The name of the package, the fields used to index queries and the
+    dependencies are available without decoding the node; calling the
+    object returns the full node dictionary.
+    """
+
+    __slots__ = ('_index', 'name', 'summary', '_edges', '_blob')
+
+    def __init__(self, index, name, summary, first_edge, n_edges,
+                 blob_offset, blob_length):
+        self._index = index
+        self.name = name
+        self.summary = summary
+        self._edges = (first_edge, n_edges)
+        self._blob = (blob_offset, blob_length)
+
+    @property
+    def dependencies(self):
+        return self._index.dependencies(*self._edges)
+
+    def __call__(self):
+        return self._index.node(*self._blob)
+
+
+class CompactIndexError(spack.error.SpackError):
+    """Raised when a compact index cannot be read."""
@@ -0,0 +1,186 @@
+# Copyright 2013-2019 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Minimal reader for the dynamic section of ELF files.
+
+This only reads what relocation needs (the type of the file and its
+``DT_NEEDED``, ``DT_SONAME``, ``DT_RPATH`` and ``DT_RUNPATH`` entries), so
+that binaries can be inspected without running ``file`` or ``patchelf``.
+"""
+import struct
+
+import spack.error
+
+__all__ = ['ElfFile', 'ElfParsingError', 'is_elf', 'parse_elf']
+
+#: First bytes of every ELF file
+magic = b'\x7fELF'
+
+# Values of e_type
+ET_REL, ET_EXEC, ET_DYN, ET_CORE = 1, 2, 3, 4
+
+# Values of p_type
+PT_LOAD, PT_DYNAMIC = 1, 2
+
+# Values of d_tag
+DT_NULL, DT_NEEDED, DT_STRTAB = 0, 1, 5
+DT_SONAME, DT_RPATH, DT_RUNPATH = 14, 15, 29
+
+#: Struct formats of the header (after e_ident), of program headers and of
+#: dynamic entries, by ELF class. ``phdr_fields`` are the positions of
+#: p_type, p_offset, p_vaddr and p_filesz in a program header.
+_layouts = {
+    1: {'header': 'HHIIIIIHHH', 'phdr': 'IIIIIIII',
+        'phdr_fields': (0, 1, 2, 4), 'dyn': 'iI'},
+    2: {'header': 'HHIQQQIHHH', 'phdr': 'IIQQQQQQ',
+        'phdr_fields': (0, 2, 3, 5), 'dyn': 'qQ'},
+}
+
+
+class ElfFile(object):
+    """Type and dynamic section entries of an ELF file."""
+
+    def __init__(self, elf_class, byte_order, elf_type):
+        #: 32 or 64
+        self.elf_class = elf_class
+        #: '<' for little endian, '>' for big endian
+        self.byte_order = byte_order
+        #: one of ET_REL, ET_EXEC, ET_DYN, ET_CORE
+        self.elf_type = elf_type
+
+        self.needed = []
+        self.soname = None
+        self.rpath = []
+        self.runpath = []
+
+    @property
+    def search_paths(self):
+        """Paths printed by ``patchelf --print-rpath``: RUNPATH if it is
+        set, RPATH otherwise."""
+        return self.runpath or self.rpath
+
+
+def is_elf(header):
+    """Whether ``header``, the first bytes of a file, is an ELF header."""
+    return header[:4] == magic
+
+
+def parse_elf(path):
+    """Read the type and the dynamic section of the ELF file at ``path``.
+
+    Raises:
+        ElfParsingError: if the file is not a valid ELF file
+    """
+    with open(path, 'rb') as f:
+        try:
+            return _parse(f)
+        except struct.error as e:
+            raise ElfParsingError('truncated ELF file: %s' % path, str(e))
+        except ElfParsingError as e:
+            raise ElfParsingError('%s: %s' % (path, e.message))
+
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ElfParsingError('unexpected end of file')
+    return data
+
+
+def _parse(f):
+    ident = f.read(16)
+    if not is_elf(ident):
+        raise ElfParsingError('not an ELF file')
+
+    elf_class = bytearray(ident)[4]
+    data = bytearray(ident)[5]
+    if elf_class not in _layouts or data not in (1, 2):
+        raise ElfParsingError('unsupported ELF class or data encoding')
+
+    order = '<' if data == 1 else '>'
+    layout = _layouts[elf_class]
+    header = struct.Struct(order + layout['header'])
+
+    # e_machine, e_version and e_entry are not needed; e_phoff follows
+    (e_type, _, _, _, e_phoff, _, _, _,
+     e_phentsize, e_phnum) = header.unpack(_read(f, 16, header.size))
+
+    result = ElfFile(32 if elf_class == 1 else 64, order, e_type)
+    if not e_phoff or not e_phnum:
+        return result
+
+    phdr = struct.Struct(order + layout['phdr'])
+    i_type, i_offset, i_vaddr, i_filesz = layout['phdr_fields']
+    loads, dynamic = [], None
+    for i in range(e_phnum):
+        fields = phdr.unpack(_read(
+            f, e_phoff + i * e_phentsize, phdr.size))
+        segment = (fields[i_offset], fields[i_vaddr], fields[i_filesz])
+        if fields[i_type] == PT_LOAD:
+            loads.append(segment)
+        elif fields[i_type] == PT_DYNAMIC:
+            dynamic = segment
+    if dynamic is None:
+        return result
+
+    dyn = struct.Struct(order + layout['dyn'])
+    entries, strtab = [], None
+    offset, _, size = dynamic
+    for i in range(size // dyn.size):
+        tag, value = dyn.unpack(_read(f, offset + i * dyn.size, dyn.size))
+        if tag == DT_NULL:
+            break
+        if tag == DT_STRTAB:
+            strtab = value
+        else:
+            entries.append((tag, value))
+
+    if strtab is None:
+        raise ElfParsingError('dynamic section without a string table')
+
+    # DT_STRTAB is a virtual address, map it back to an offset in the file
+    for load_offset, load_vaddr, load_size in loads:
+        if load_vaddr <= strtab < load_vaddr + load_size:
+            strtab_offset = strtab - load_vaddr + load_offset
+            break
+    else:
+        raise ElfParsingError('string table is not in a loaded segment')
+
+    for tag, value in entries:
+        if tag == DT_NEEDED:
+            result.needed.append(_string(f, strtab_offset + value))
+        elif tag == DT_SONAME:
+            result.soname = _string(f, strtab_offset + value)
+        elif tag == DT_RPATH:
+            result.rpath = _string(f, strtab_offset + value).split(':')
+        elif tag == DT_RUNPATH:
+            result.runpath = _string(f, strtab_offset + value).split(':')
+
+    return result
+
+
+def _string(f, offset):
+    """Read a NUL-terminated string."""
+    f.seek(offset)
+    chunks = []
+    while True:
+        chunk = f.read(256)
+        if not chunk:
+            raise ElfParsingError('unterminated string')
+        end = chunk.find(b'\0')
+        if end >= 0:
+            chunks.append(chunk[:end])
+            break
+        chunks.append(chunk)
+    data = b''.join(chunks)
+    # Python 2 reads str, which is what callers expect
+    if isinstance(data, str):
+        return data
+    return data.decode('utf-8', 'replace')
+
+
+class ElfParsingError(spack.error.SpackError):
+    """Raised when an ELF file cannot be parsed."""
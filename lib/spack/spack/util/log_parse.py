@@ -5,15 +5,28 @@
 
 from __future__ import print_function
 
+import collections
+import os
+import re
 import sys
-from six import StringIO
+from six import StringIO, text_type
 
 from ctest_log_parser import CTestLogParser, BuildError, BuildWarning
+from ctest_log_parser import prefilter, _match
+from ctest_log_parser import _error_matches, _error_exceptions
+from ctest_log_parser import _warning_matches, _warning_exceptions
+from ctest_log_parser import _file_line_matches
 
 import llnl.util.tty as tty
 from llnl.util.tty.color import cescape, colorize
 
-__all__ = ['parse_log_events', 'make_log_context']
+import spack.util.spack_json as sjson
+
+__all__ = ['parse_log_events', 'make_log_context', 'parse_line',
+           'LogEventParser', 'load_log_events']
+
+#: Number of errors, and of warnings, that a LogEventParser keeps
+max_log_events = 20
 
 
 def parse_log_events(stream, context=6, jobs=None, profile=False):
@@ -46,6 +59,229 @@ def parse_log_events(stream, context=6, jobs=None, profile=False):
 parse_log_events.ctest_parser = None
 
 
+def _compile(regex_array):
+    return [regex if isinstance(regex, prefilter) else re.compile(regex)
+            for regex in regex_array]
+
+
+def parse_line(line, line_no):
+    """Search a single line of a log for an error or a warning, with the
+    regular expressions of ``ctest_log_parser``.
+
+    Args:
+        line (str): line of the log
+        line_no (int): number of the line in the log, from 1
+
+    Returns:
+        (LogEvent): a ``BuildError`` or ``BuildWarning`` for the line,
+            without context, or None if it is neither
+    """
+    if parse_line.regexes is None:
+        parse_line.regexes = [_compile(r) for r in (
+            _error_matches, _error_exceptions,
+            _warning_matches, _warning_exceptions,
+            _file_line_matches)]
+    (error_matches, error_exceptions, warning_matches,
+     warning_exceptions, file_line_matches) = parse_line.regexes
+
+    if _match(error_matches, error_exceptions, line):
+        event = BuildError(line.strip(), line_no)
+    elif _match(warning_matches, warning_exceptions, line):
+        event = BuildWarning(line.strip(), line_no)
+    else:
+        return None
+
+    # get file/line number for the event, if possible
+    for flm in file_line_matches:
+        match = flm.search(line)
+        if match:
+            event.source_file, event.source_line_no = match.groups()
+
+    return event
+
+
+#: lazily compiled regular expressions of parse_line()
+parse_line.regexes = None
+
+
+class LogEventParser(object):
+    """Incremental parser for build logs, fed lines as they are written.
+
+    This is meant to be passed to ``llnl.util.tty.log.log_output``, whose
+    writer daemon hands it the lines of the build log as the build goes on,
+    so that errors are known right away instead of after the build fails.
+
+    Each line is classified when it arrives. The first ``max_events``
+    errors and warnings are kept, with ``context`` lines of context on
+    each side. Whenever the context of an event is complete, all the
+    events found so far are saved to ``events_path``, to be read with
+    ``load_log_events()``. Lines that look like errors are common in
+    builds that succeed, so errors are only reported at debug level.
+    """
+
+    def __init__(self, events_path=None, context=6, max_events=None):
+        """Create a parser for a new log.
+
+        Args:
+            events_path (str): JSON file where events are saved, or None
+            context (int): lines of context to extract around each event
+            max_events (int): number of errors, and of warnings, to keep;
+                default ``max_log_events``
+        """
+        self.events_path = events_path
+        self.context = context
+        self.max_events = max_events or max_log_events
+
+        #: number of lines of the log so far
+        self.line_no = 0
+
+        #: number of lines that were not parsed
+        self.skipped = 0
+
+        #: first errors and warnings found
+        self.errors = []
+        self.warnings = []
+
+        #: total numbers of errors and warnings found
+        self.nerrors = 0
+        self.nwarnings = 0
+
+        self._pre_context = collections.deque(maxlen=context)
+        self._incomplete = []  # events still missing lines of post context
+
+    def parse(self, lines, skipped=0):
+        """Parse lines following those parsed before.
+
+        Args:
+            lines (list of str): lines of the log, without newlines
+            skipped (int): number of lines of the log before ``lines`` that
+                are not parsed
+        """
+        completed = False
+        if skipped:
+            # the context of events can't extend over the lines skipped
+            self.line_no += skipped
+            self.skipped += skipped
+            self._pre_context.clear()
+            completed = bool(self._incomplete)
+            self._incomplete = []
+
+        for line in lines:
+            if not isinstance(line, text_type):
+                line = line.decode('utf-8', 'replace')
+            self.line_no += 1
+
+            stripped = line.rstrip()
+            for event in self._incomplete:
+                event.post_context.append(stripped)
+
+            # Events are opened in order, so they are completed in order
+            while (self._incomplete and
+                   len(self._incomplete[0].post_context) >= self.context):
+                self._incomplete.pop(0)
+                completed = True
+
+            event = parse_line(line, self.line_no)
+            if event is not None and self._add(event):
+                if self.context:
+                    self._incomplete.append(event)
+                else:
+                    completed = True
+
+            self._pre_context.append(stripped)
+
+        if completed:
+            self._save()
+
+    def _add(self, event):
+        """Count an event, and keep it if it is among the first found."""
+        if isinstance(event, BuildError):
+            self.nerrors += 1
+            events = self.errors
+        else:
+            self.nwarnings += 1
+            events = self.warnings
+
+        if len(events) >= self.max_events:
+            return False
+
+        event.pre_context = list(self._pre_context)
+        events.append(event)
+
+        if events is self.errors:
+            tty.debug('Error found in build log, line %d: %s' %
+                      (event.line_no, event.text))
+        return True
+
+    def close(self):
+        """Save the events found, once the log is complete."""
+        self._incomplete = []
+        self._save()
+
+    def _save(self):
+        if not self.events_path:
+            return
+
+        data = {
+            'lines': self.line_no,
+            'skipped': self.skipped,
+            'nerrors': self.nerrors,
+            'nwarnings': self.nwarnings,
+            'errors': [_event_to_dict(e) for e in self.errors],
+            'warnings': [_event_to_dict(e) for e in self.warnings],
+        }
+
+        # Replace the file at once, in case it is read meanwhile
+        tmp_path = self.events_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            sjson.dump(data, f)
+        os.rename(tmp_path, self.events_path)
+
+
+def _event_to_dict(event):
+    # LogEvent wraps the source location in a tuple until it is found
+    source_file, source_line_no = event.source_file, event.source_line_no
+    if isinstance(source_file, tuple):
+        source_file, source_line_no = None, None
+
+    return {
+        'text': event.text,
+        'line_no': event.line_no,
+        'source_file': source_file,
+        'source_line_no': source_line_no,
+        'pre_context': event.pre_context,
+        'post_context': event.post_context,
+    }
+
+
+def _event_from_dict(cls, data):
+    event = cls(data['text'], data['line_no'],
+                pre_context=data['pre_context'],
+                post_context=data['post_context'])
+    if data['source_file'] is not None:
+        event.source_file = data['source_file']
+        event.source_line_no = data['source_line_no']
+    return event
+
+
+def load_log_events(events_path):
+    """Read the events of a log saved by a ``LogEventParser``.
+
+    Args:
+        events_path (str): JSON file where the events were saved
+
+    Returns:
+        (tuple): lists of the ``BuildError`` and ``BuildWarning`` objects
+            that were kept, and total numbers of errors and warnings
+    """
+    with open(events_path) as f:
+        data = sjson.load(f)
+
+    errors = [_event_from_dict(BuildError, e) for e in data['errors']]
+    warnings = [_event_from_dict(BuildWarning, e) for e in data['warnings']]
+    return errors, warnings, data['nerrors'], data['nwarnings']
+
+
 def _wrap(text, width):
     """Break text into lines of specific width."""
     lines = []
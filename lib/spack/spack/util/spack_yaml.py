@@ -16,6 +16,7 @@ import ctypes
 
 
 from ordereddict_backport import OrderedDict
+import six
 from six import string_types, StringIO
 
 import ruamel.yaml as yaml
@@ -207,6 +208,129 @@ def dump(obj, default_flow_style=False, stream=None):
                      Dumper=SafeDumper, stream=stream)
 
 
+#: Dumper used by ``dump_flow()`` to analyze scalars like ``dump()`` does
+_flow_analyzer = SafeDumper(StringIO())
+
+#: Cache of scalars written by ``dump_flow()``, by type and value
+_flow_scalars = {}
+
+#: Size of ``_flow_scalars`` above which it is emptied
+_flow_scalars_limit = 65536
+
+#: YAML tags of the scalar types ``dump_flow()`` writes itself
+_flow_tags = dict(
+    [(t, 'str') for t in (str, syaml_str, six.text_type)] +
+    [(bool, 'bool'), (int, 'int'), (syaml_int, 'int'), (type(None), 'null')])
+
+
+_flow_mappings = (dict, syaml_dict)
+_flow_sequences = (list, syaml_list, tuple)
+_flow_collections = _flow_mappings + _flow_sequences
+
+
+class _NotFlowDumpable(Exception):
+    """Raised for data that ``dump_flow()`` leaves to ruamel."""
+
+
+def dump_flow(obj):
+    """Same as ``dump(obj, default_flow_style=True)``, but faster.
+
+    Dictionaries, lists, tuples and simple scalars are written directly,
+    with the same analysis of scalars that ruamel does, instead of going
+    through its representer, serializer and emitter. Anything else, like
+    strings spanning several lines or needing double quotes, is left to
+    ``dump()``, so the output is always the same.
+    """
+    out = []
+    try:
+        # top-level scalars are followed by a document end marker
+        if type(obj) not in _flow_collections:
+            raise _NotFlowDumpable()
+        _flow_node(obj, out)
+    except _NotFlowDumpable:
+        return dump(obj, default_flow_style=True)
+    out.append('\n')
+    return ''.join(out)
+
+
+def _flow_node(obj, out):
+    obj_type = type(obj)
+    if obj_type in _flow_mappings:
+        out.append('{')
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                out.append(', ')
+            # empty and long keys are not written as simple keys
+            if (_flow_tags.get(type(key)) != 'str' or
+                    not key or len(key) >= 128):
+                raise _NotFlowDumpable()
+            out.append(_flow_scalar(key))
+            out.append(': ')
+            _flow_node(value, out)
+        out.append('}')
+    elif obj_type in _flow_sequences:
+        out.append('[')
+        for i, value in enumerate(obj):
+            if i:
+                out.append(', ')
+            _flow_node(value, out)
+        out.append(']')
+    else:
+        out.append(_flow_scalar(obj))
+
+
+def _flow_scalar(obj):
+    if type(obj) not in _flow_tags:
+        raise _NotFlowDumpable()
+    key = (type(obj), obj)
+    text = _flow_scalars.get(key)
+    if text is None:
+        if len(_flow_scalars) > _flow_scalars_limit:
+            _flow_scalars.clear()
+        text = _flow_scalars[key] = _write_flow_scalar(obj)
+    return text
+
+
+def _write_flow_scalar(obj):
+    tag = _flow_tags[type(obj)]
+    if tag == 'bool':
+        value = 'true' if obj else 'false'
+    elif tag == 'null':
+        value = ''
+    else:
+        try:
+            value = str(obj)
+            value.encode('ascii')
+        except (UnicodeDecodeError, UnicodeEncodeError):
+            raise _NotFlowDumpable()
+
+    # Whether the value is read back with the same type when written
+    # without (plain) and with quotes
+    resolvers = _flow_analyzer.resolver
+    plain_tag = _flow_analyzer.DEFAULT_SCALAR_TAG
+    for resolved_tag, regexp in (resolvers.get(value[:1], []) +
+                                 resolvers.get(None, [])):
+        if regexp.match(value):
+            plain_tag = resolved_tag
+            break
+    full_tag = 'tag:yaml.org,2002:' + tag
+    implicit_plain = plain_tag == full_tag
+    implicit_quoted = _flow_analyzer.DEFAULT_SCALAR_TAG == full_tag
+
+    analysis = _flow_analyzer.analyze_scalar(value)
+    if analysis.multiline:
+        raise _NotFlowDumpable()
+    if implicit_plain and analysis.allow_flow_plain:
+        return value
+    if not analysis.allow_single_quoted:
+        raise _NotFlowDumpable()
+
+    quoted = "'%s'" % value.replace("'", "''")
+    if implicit_quoted:
+        return quoted
+    return '!!%s %s' % (tag, quoted)
+
+
 def file_line(mark):
     """Format a mark as <file>:<line> information."""
     result = mark.name
@@ -11,15 +11,21 @@ import re
 import os
 import os.path
 import shutil
+import socket
 import ssl
 import sys
+import threading
 import traceback
 
 from itertools import product
 
 import six
+from six.moves import http_client
+from six.moves.queue import Queue
 from six.moves.urllib.request import urlopen, Request
-from six.moves.urllib.error import URLError
+from six.moves.urllib.request import getproxies, proxy_bypass
+from six.moves.urllib.error import URLError, HTTPError
+import six.moves.urllib.parse as urllib_parse
 import multiprocessing.pool
 
 try:
@@ -50,6 +56,12 @@ from spack.util.compression import ALLOWED_ARCHIVE_TYPES
 # Timeout in seconds for web requests
 _timeout = 10
 
+#: Maximum number of pages the spider fetches at the same time
+spider_concurrency = 16
+
+#: Maximum number of redirects followed on persistent connections
+_max_redirects = 10
+
 # See docstring for standardize_header_names()
 _separators = ('', ' ', '_', '-')
 HTTP_HEADER_NAME_ALIASES = {
@@ -90,34 +102,6 @@ class LinkParser(HTMLParser):
                     self.links.append(val)
 
 
-class NonDaemonProcess(multiprocessing.Process):
-    """Process that allows sub-processes, so pools can have sub-pools."""
-    @property
-    def daemon(self):
-        return False
-
-    @daemon.setter
-    def daemon(self, value):
-        pass
-
-
-if sys.version_info[0] < 3:
-    class NonDaemonPool(multiprocessing.pool.Pool):
-        """Pool that uses non-daemon processes"""
-        Process = NonDaemonProcess
-else:
-
-    class NonDaemonContext(type(multiprocessing.get_context())):
-        Process = NonDaemonProcess
-
-    class NonDaemonPool(multiprocessing.pool.Pool):
-        """Pool that uses non-daemon processes"""
-
-        def __init__(self, *args, **kwargs):
-            kwargs['context'] = NonDaemonContext()
-            super(NonDaemonPool, self).__init__(*args, **kwargs)
-
-
 def uses_ssl(parsed_url):
     if parsed_url.scheme == 'https':
         return True
@@ -140,26 +124,30 @@ __UNABLE_TO_VERIFY_SSL = (
     ))(sys.version_info)
 
 
-def read_from_url(url, accept_content_type=None):
-    url = url_util.parse(url)
-    context = None
-
-    verify_ssl = spack.config.get('config:verify_ssl')
-
+def _ssl_context(url):
+    """SSL context to open a parsed URL with, or None if it does not use
+    SSL or certificates cannot be verified."""
     # Don't even bother with a context unless the URL scheme is one that uses
     # SSL certs.
-    if uses_ssl(url):
-        if verify_ssl:
-            if __UNABLE_TO_VERIFY_SSL:
-                # User wants SSL verification, but it cannot be provided.
-                warn_no_ssl_cert_checking()
-            else:
-                # User wants SSL verification, and it *can* be provided.
-                context = ssl.create_default_context()
-        else:
-            # User has explicitly indicated that they do not want SSL
-            # verification.
-            context = ssl._create_unverified_context()
+    if not uses_ssl(url):
+        return None
+
+    if spack.config.get('config:verify_ssl'):
+        if __UNABLE_TO_VERIFY_SSL:
+            # User wants SSL verification, but it cannot be provided.
+            warn_no_ssl_cert_checking()
+            return None
+        # User wants SSL verification, and it *can* be provided.
+        return ssl.create_default_context()
+
+    # User has explicitly indicated that they do not want SSL
+    # verification.
+    return ssl._create_unverified_context()
+
+
+def read_from_url(url, accept_content_type=None):
+    url = url_util.parse(url)
+    context = _ssl_context(url)
 
     req = Request(url_util.format(url))
     content_type = None
@@ -348,87 +336,158 @@ def list_url(url):
             for key in _iter_s3_prefix(s3, url)))
 
 
-def _spider(url, visited, root, depth, max_depth, raise_on_error):
-    """Fetches URL and any pages it links to up to max_depth.
+def _can_keep_alive(parsed_url):
+    """Whether a parsed URL can be read on a persistent connection, i.e.
+    whether it is an http(s) URL that is not accessed through a proxy."""
+    if parsed_url.scheme == 'https' and __UNABLE_TO_VERIFY_SSL:
+        return False
+    if parsed_url.scheme not in ('http', 'https'):
+        return False
+    proxy = getproxies().get(parsed_url.scheme)
+    return not proxy or bool(proxy_bypass(parsed_url.hostname))
 
-       depth should initially be zero, and max_depth is the max depth of
-       links to follow from the root.
 
-       Prints out a warning only if the root can't be fetched; it ignores
-       errors with pages that the root links to.
+class _PersistentConnections(object):
+    """Reads http and https pages on keep-alive connections, which each
+    thread keeps open for every host it visits.
 
-       Returns a tuple of:
-       - pages: dict of pages visited (URL) mapped to their full text.
-       - links: set of links encountered while visiting the pages.
+    URLs that go through a proxy, and other schemes, are read with
+    ``read_from_url``.
     """
-    pages = {}     # dict from page URL -> text content.
-    links = set()  # set of all links seen on visited pages.
 
-    try:
-        response_url, _, response = read_from_url(url, 'text/html')
-        if not response_url or not response:
-            return pages, links
-
-        page = codecs.getreader('utf-8')(response).read()
-        pages[response_url] = page
-
-        # Parse out the links in the page
-        link_parser = LinkParser()
-        subcalls = []
-        link_parser.feed(page)
-
-        while link_parser.links:
-            raw_link = link_parser.links.pop()
-            abs_link = url_util.join(
-                response_url,
-                raw_link.strip(),
-                resolve_href=True)
-            links.add(abs_link)
-
-            # Skip stuff that looks like an archive
-            if any(raw_link.endswith(suf) for suf in ALLOWED_ARCHIVE_TYPES):
-                continue
-
-            # Skip things outside the root directory
-            if not abs_link.startswith(root):
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def read_page(self, url, accept_content_type='text/html'):
+        """Read a page, following redirects.
+
+        Returns:
+            (tuple): the URL of the page after redirects, and its text;
+                None for both if its content type is not accepted
+        """
+        parsed = url_util.parse(url)
+        url = url_util.format(parsed)
+        if not _can_keep_alive(parsed):
+            response_url, _, response = read_from_url(
+                url, accept_content_type)
+            if not response_url or not response:
+                return None, None
+            return response_url, codecs.getreader('utf-8')(response).read()
+
+        # Make a HEAD request first to check the content type, as in
+        # read_from_url, which is cheap on a persistent connection
+        url, headers, _ = self._request('HEAD', url)
+        content_type = headers.get('Content-type')
+        if content_type is None or \
+                not content_type.startswith(accept_content_type):
+            tty.debug("ignoring page {0}{1}{2}".format(
+                url,
+                " with content type " if content_type is not None else "",
+                content_type or ""))
+            return None, None
+
+        url, _, body = self._request('GET', url)
+        return url, body.decode('utf-8')
+
+    def _request(self, method, url):
+        for _ in range(_max_redirects + 1):
+            parsed = url_util.parse(url)
+            response, body = self._send(method, parsed)
+            location = response.getheader('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urllib_parse.urljoin(url, location)
                 continue
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason,
+                                response.msg, None)
+            return url, response.msg, body
+        raise URLError('Too many redirects for %s' % url)
+
+    def _send(self, method, parsed):
+        key = (parsed.scheme, parsed.netloc)
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        headers = {'User-Agent': 'Python-urllib/%d.%d' % sys.version_info[:2]}
+
+        # A reused connection may have been closed by the server meanwhile
+        reused = key in connections
+        while True:
+            if key not in connections:
+                connections[key] = self._connect(parsed)
+            connection = connections[key]
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http_client.HTTPException, socket.error) as e:
+                connection.close()
+                del connections[key]
+                if reused and not isinstance(e, socket.timeout):
+                    reused = False
+                    continue
+                raise URLError(e)
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+                del connections[key]
+            return response, body
+
+    def _connect(self, parsed):
+        if parsed.scheme == 'https':
+            connection = http_client.HTTPSConnection(
+                parsed.hostname, parsed.port, timeout=_timeout,
+                context=_ssl_context(parsed))
+        else:
+            connection = http_client.HTTPConnection(
+                parsed.hostname, parsed.port, timeout=_timeout)
+        with self._lock:
+            self._all.append(connection)
+        return connection
 
-            # Skip already-visited links
-            if abs_link in visited:
-                continue
+    def close(self):
+        with self._lock:
+            for connection in self._all:
+                connection.close()
+            self._all = []
 
-            # If we're not at max depth, follow links.
-            if depth < max_depth:
-                subcalls.append((abs_link, visited, root,
-                                 depth + 1, max_depth, raise_on_error))
-                visited.add(abs_link)
 
-        if subcalls:
-            pool = NonDaemonPool(processes=len(subcalls))
-            try:
-                results = pool.map(_spider_wrapper, subcalls)
+def _fetch_page(connections, url):
+    """Read the page at url for the spider.
 
-                for sub_pages, sub_links in results:
-                    pages.update(sub_pages)
-                    links.update(sub_links)
+    Returns:
+        (tuple): the URL of the page after redirects, its text and the
+            exception raised while reading it, if any
+    """
+    try:
+        response_url, page = connections.read_page(url)
+        return response_url, page, None
+    except Exception as e:
+        # Keep the traceback of the worker thread for debug output
+        e.spider_traceback = traceback.format_exc()
+        return None, None, e
 
-            finally:
-                pool.terminate()
-                pool.join()
 
-    except URLError as e:
-        tty.debug(e)
+def _report_spider_error(url, error, raise_on_error):
+    if isinstance(error, URLError):
+        tty.debug(error)
 
-        if hasattr(e, 'reason') and isinstance(e.reason, ssl.SSLError):
+        if hasattr(error, 'reason') and \
+                isinstance(error.reason, ssl.SSLError):
             tty.warn("Spack was unable to fetch url list due to a certificate "
                      "verification problem. You can try running spack -k, "
                      "which will not check SSL certificates. Use this at your "
                      "own risk.")
 
         if raise_on_error:
-            raise NoNetworkConnectionError(str(e), url)
+            raise NoNetworkConnectionError(str(error), url)
 
-    except HTMLParseError as e:
+    elif isinstance(error, HTMLParseError):
         # This error indicates that Python's HTML parser sucks.
         msg = "Got an error parsing HTML."
 
@@ -436,19 +495,105 @@ def _spider(url, visited, root, depth, max_depth, raise_on_error):
         if sys.version_info[:3] < (2, 7, 3):
             msg += " Use Python 2.7.3 or newer for better HTML parsing."
 
-        tty.warn(msg, url, "HTMLParseError: " + str(e))
+        tty.warn(msg, url, "HTMLParseError: " + str(error))
 
-    except Exception as e:
+    else:
         # Other types of errors are completely ignored, except in debug mode.
-        tty.debug("Error in _spider: %s:%s" % (type(e), e),
-                  traceback.format_exc())
+        tty.debug("Error in _spider: %s:%s" % (type(error), error),
+                  getattr(error, 'spider_traceback', ''))
 
-    return pages, links
 
+def iter_spider(roots, depth=0, raise_on_error=False, concurrency=None):
+    """Fetches root URLs and the pages they link to, up to ``depth`` levels
+    of links from the roots.
+
+    Pages are fetched by a pool of threads, which keep their connections
+    to each host open. Each page is yielded as soon as it is fetched, so
+    that callers can process it while the crawl goes on.
+
+    Args:
+        roots (str or list): root URL(s)
+        depth (int): maximum depth of links to follow from the roots
+        raise_on_error (bool): raise ``NoNetworkConnectionError`` if a page
+            cannot be fetched, instead of ignoring it
+        concurrency (int): maximum number of pages fetched at the same time
+            (default ``spider_concurrency``)
+
+    Yields:
+        (tuple): URL of each page, its text and the set of links on it
+    """
+    if isinstance(roots, six.string_types):
+        roots = [roots]
+    roots = [url_util.parse(r) for r in roots]
+
+    connections = _PersistentConnections()
+    pool = multiprocessing.pool.ThreadPool(
+        concurrency or spider_concurrency)
+    done = Queue()
+    visited = set()
+    in_flight = [0]
+
+    def fetch(url, root, level):
+        in_flight[0] += 1
+        pool.apply_async(
+            _fetch_page, (connections, url),
+            callback=lambda result: done.put((url, root, level, result)))
+
+    try:
+        for root in roots:
+            visited.add(url_util.format(root))
+            fetch(root, root, 0)
+
+        while in_flight[0]:
+            url, root, level, result = done.get()
+            in_flight[0] -= 1
+
+            response_url, page, error = result
+            if error is None and page is not None:
+                try:
+                    # Parse out the links in the page
+                    link_parser = LinkParser()
+                    link_parser.feed(page)
+                except HTMLParseError as e:
+                    error = e
+            if error is not None:
+                _report_spider_error(url, error, raise_on_error)
+                continue
+            if page is None:
+                continue
+
+            links = set()
+            for raw_link in link_parser.links:
+                abs_link = url_util.join(
+                    response_url,
+                    raw_link.strip(),
+                    resolve_href=True)
+                links.add(abs_link)
+
+                # Skip stuff that looks like an archive
+                if any(raw_link.endswith(suf)
+                       for suf in ALLOWED_ARCHIVE_TYPES):
+                    continue
+
+                # Skip things outside the root directory
+                if not abs_link.startswith(root):
+                    continue
+
+                # Skip already-visited links
+                if abs_link in visited:
+                    continue
+
+                # If we're not at max depth, follow links.
+                if level < depth:
+                    visited.add(abs_link)
+                    fetch(abs_link, root, level + 1)
 
-def _spider_wrapper(args):
-    """Wrapper for using spider with multiprocessing."""
-    return _spider(*args)
+            yield response_url, page, links
+
+    finally:
+        pool.terminate()
+        pool.join()
+        connections.close()
 
 
 def _urlopen(req, *args, **kwargs):
@@ -478,12 +623,17 @@ def spider(root, depth=0):
        If depth is specified (e.g., depth=2), then this will also follow
        up to <depth> levels of links from the root.
 
-       This will spawn processes to fetch the children, for much improved
-       performance over a sequential fetch.
+       Pages are fetched by a pool of threads, see ``iter_spider``.
 
+       Returns a tuple of:
+       - pages: dict of pages visited (URL) mapped to their full text.
+       - links: set of links encountered while visiting the pages.
     """
-    root = url_util.parse(root)
-    pages, links = _spider(root, set(), root, 0, depth, False)
+    pages = {}
+    links = set()
+    for url, page, page_links in iter_spider(root, depth=depth):
+        pages[url] = page
+        links.update(page_links)
     return pages, links
 
 
@@ -522,15 +672,7 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
             additional_list_urls.add(lurl + '/')
     list_urls |= additional_list_urls
 
-    # Grab some web pages to scrape.
-    pages = {}
-    links = set()
-    for lurl in list_urls:
-        pg, lnk = spider(lurl, depth=list_depth)
-        pages.update(pg)
-        links.update(lnk)
-
-    # Scrape them for archive URLs
+    # Scrape web pages for archive URLs
     regexes = []
     for aurl in archive_urls:
         # This creates a regex from the URL with a capture group for
@@ -562,17 +704,35 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
 
         regexes.append(url_regex)
 
-    # Build a dict version -> URL from any links that match the wildcards.
-    # Walk through archive_url links first.
-    # Any conflicting versions will be overwritten by the list_url links.
-    versions = {}
-    for url in archive_urls + sorted(links):
+    def archive_version(url):
         if any(re.search(r, url) for r in regexes):
             try:
-                ver = spack.url.parse_version(url)
-                versions[ver] = url
+                return spack.url.parse_version(url)
             except spack.url.UndetectableVersionError:
-                continue
+                pass
+        return None
+
+    # Build a dict version -> URL from any links that match the wildcards,
+    # while the list_url pages are being fetched.
+    found = {}
+    seen = set()
+    for _, _, links in iter_spider(sorted(list_urls), depth=list_depth):
+        for url in links - seen:
+            ver = archive_version(url)
+            if ver is not None:
+                # When several links match a version, keep the same one
+                # regardless of the order in which pages were fetched.
+                found[ver] = max(found.get(ver, url), url)
+        seen |= links
+
+    # Walk through archive_url links first.
+    # Any conflicting versions will be overwritten by the list_url links.
+    versions = {}
+    for url in archive_urls:
+        ver = archive_version(url)
+        if ver is not None:
+            versions[ver] = url
+    versions.update(found)
 
     return versions
 
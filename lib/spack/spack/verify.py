@@ -2,31 +2,54 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import collections
 import os
 import hashlib
 import base64
+import multiprocessing.pool
 import sys
+import time
 
 import llnl.util.tty as tty
 
 import spack.util.spack_json as sjson
 import spack.util.file_permissions as fp
+import spack.hooks
 import spack.store
 import spack.filesystem_view
 
+#: Number of threads hashing files
+hash_threads = 8
+
+#: Files are hashed in blocks of this size
+hash_block_size = 1024 * 1024
+
+#: Number of files hashed by each task of the threads writing a manifest
+hash_batch_size = 64
+
 
 def compute_hash(path):
+    sha1 = hashlib.sha1()
     with open(path, 'rb') as f:
-        sha1 = hashlib.sha1(f.read()).digest()
-        b32 = base64.b32encode(sha1)
+        for block in iter(lambda: f.read(hash_block_size), b''):
+            sha1.update(block)
+    b32 = base64.b32encode(sha1.digest())
 
-        if sys.version_info[0] >= 3:
-            b32 = b32.decode()
+    if sys.version_info[0] >= 3:
+        b32 = b32.decode()
 
-        return b32
+    return b32
 
 
 def create_manifest_entry(path):
+    data = _manifest_entry_metadata(path)
+    if data.get('type') == 'file':
+        data['hash'] = compute_hash(path)
+    return data
+
+
+def _manifest_entry_metadata(path):
+    """Manifest entry of a path, without the hash of its contents."""
     data = {}
 
     if os.path.exists(path):
@@ -45,40 +68,104 @@ def create_manifest_entry(path):
 
         else:
             data['type'] = 'file'
-            data['hash'] = compute_hash(path)
             data['time'] = stat.st_mtime
             data['size'] = stat.st_size
+            data['inode'] = stat.st_ino
 
     return data
 
 
-def write_manifest(spec):
-    manifest_file = os.path.join(spec.prefix,
-                                 spack.store.layout.metadata_dir,
-                                 spack.store.layout.manifest_file_name)
+def _hash_files(paths):
+    return [compute_hash(path) for path in paths]
 
-    if not os.path.exists(manifest_file):
-        tty.debug("Writing manifest file: No manifest from binary")
 
-        manifest = {}
-        for root, dirs, files in os.walk(spec.prefix):
-            for entry in list(dirs + files):
-                path = os.path.join(root, entry)
-                manifest[path] = create_manifest_entry(path)
-        manifest[spec.prefix] = create_manifest_entry(spec.prefix)
+def manifest_file_path(spec):
+    """Path of the manifest of an installed spec."""
+    return os.path.join(spec.prefix,
+                        spack.store.layout.metadata_dir,
+                        spack.store.layout.manifest_file_name)
+
+
+class ManifestWriter(spack.hooks.PrefixScanner):
+    """Writes the manifest of a prefix from the entries of a prefix scan.
+
+    Files are hashed in batches by a pool of threads while the scan goes
+    on. Small prefixes, with less than one batch of files, are hashed
+    without starting threads.
+    """
 
+    def __init__(self, spec, threads=None):
+        self.spec = spec
+        self.threads = threads or hash_threads
+        self.manifest = {}
+
+        self._pool = None
+        self._batch = []
+        self._hashing = []
+
+    def visit(self, entry):
+        data = _manifest_entry_metadata(entry.path)
+        self.manifest[entry.path] = data
+        if data.get('type') == 'file':
+            self._batch.append(entry.path)
+            if len(self._batch) >= hash_batch_size:
+                self._hash_batch()
+
+    def _hash_batch(self):
+        if self._pool is None:
+            self._pool = multiprocessing.pool.ThreadPool(self.threads)
+        paths, self._batch = self._batch, []
+        self._hashing.append(
+            (paths, self._pool.apply_async(_hash_files, (paths,))))
+
+    def finish(self):
+        for paths, result in self._hashing:
+            for path, digest in zip(paths, result.get()):
+                self.manifest[path]['hash'] = digest
+        for path, digest in zip(self._batch, _hash_files(self._batch)):
+            self.manifest[path]['hash'] = digest
+
+        manifest_file = manifest_file_path(self.spec)
         with open(manifest_file, 'w') as f:
-            sjson.dump(manifest, f)
+            sjson.dump(self.manifest, f)
+
+        fp.set_permissions_by_spec(manifest_file, self.spec)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+def manifest_writer(spec):
+    """Scanner writing the manifest of a spec, or None if the spec already
+    has a manifest, as specs installed from binaries do."""
+    if os.path.exists(manifest_file_path(spec)):
+        return None
+
+    tty.debug("Writing manifest file: No manifest from binary")
+    return ManifestWriter(spec)
+
+
+def write_manifest(spec):
+    writer = manifest_writer(spec)
+    if writer is not None:
+        spack.hooks.scan_prefix(spec.prefix, [writer])
 
-        fp.set_permissions_by_spec(manifest_file, spec)
 
+def _check_entry_metadata(path, data, fast=False):
+    """Check everything but the contents of a manifest entry.
 
-def check_entry(path, data):
+    Returns:
+        (VerificationResults, bool): errors found, and whether the contents
+            of the file must be hashed
+    """
     res = VerificationResults()
 
     if not data:
         res.add_error(path, 'added')
-        return res
+        return res, False
 
     stat = os.stat(path)
 
@@ -111,13 +198,26 @@ def check_entry(path, data):
             res.add_error(path, 'mtime')
         if data['type'] != 'file':
             res.add_error(path, 'type')
-        if compute_hash(path) != data.get('hash', ''):
-            res.add_error(path, 'hash')
+
+        # In fast mode, files that look untouched are not hashed. Older
+        # manifests do not record inodes.
+        unchanged = (stat.st_size == data['size'] and
+                     stat.st_mtime == data['time'] and
+                     stat.st_ino == data.get('inode', stat.st_ino))
+        return res, not (fast and unchanged)
+
+    return res, False
+
+
+def check_entry(path, data, fast=False):
+    res, needs_hash = _check_entry_metadata(path, data, fast)
+    if needs_hash and compute_hash(path) != data.get('hash', ''):
+        res.add_error(path, 'hash')
 
     return res
 
 
-def check_file_manifest(file):
+def check_file_manifest(file, fast=False):
     dirname = os.path.dirname(file)
 
     results = VerificationResults()
@@ -143,30 +243,109 @@ def check_file_manifest(file):
         return results
 
     if file in manifest:
-        results += check_entry(file, manifest[file])
+        results += check_entry(file, manifest[file], fast=fast)
     else:
         results.add_error(file, 'not owned by any package')
     return results
 
 
-def check_spec_manifest(spec):
+def check_spec_manifest(spec, fast=False):
+    """Check the prefix of a spec against its manifest.
+
+    Args:
+        spec (Spec): installed spec
+        fast (bool): do not hash the files whose size, mtime and inode
+            match the manifest
+
+    Returns:
+        VerificationResults: errors found
+    """
+    for _, results, _ in check_spec_manifests([spec], fast=fast):
+        return results
+
+
+def check_spec_manifests(specs, fast=False, threads=None):
+    """Check the prefixes of many specs against their manifests.
+
+    The files of all the prefixes are hashed by a pool of threads, while
+    the next prefixes are walked.
+
+    Args:
+        specs (list): installed specs
+        fast (bool): do not hash the files whose size, mtime and inode
+            match the manifest
+        threads (int): number of threads hashing files (default
+            ``hash_threads``)
+
+    Yields:
+        (Spec, VerificationResults, dict): each spec, in order, with the
+            errors found and statistics about its verification
+    """
+    threads = threads or hash_threads
+    pool = multiprocessing.pool.ThreadPool(threads)
+    pending = collections.deque()
+    try:
+        for spec in specs:
+            start = time.time()
+            results, to_hash, stats = _check_spec_metadata(spec, fast)
+            hashes = pool.map_async(
+                _hash_or_none, [path for path, _, _ in to_hash])
+            pending.append((spec, start, results, to_hash, stats, hashes))
+
+            # Keep only a few specs in flight
+            while pending and (pending[0][-1].ready() or
+                               len(pending) > threads):
+                yield _finish_spec_check(*pending.popleft())
+
+        while pending:
+            yield _finish_spec_check(*pending.popleft())
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _hash_or_none(path):
+    try:
+        return compute_hash(path)
+    except (IOError, OSError):
+        return None
+
+
+def _finish_spec_check(spec, start, results, to_hash, stats, hashes):
+    for (path, expected, _), actual in zip(to_hash, hashes.get()):
+        if actual != expected:
+            results.add_error(path, 'hash')
+    stats['seconds'] = time.time() - start
+    return spec, results, stats
+
+
+def _check_spec_metadata(spec, fast):
+    """Check everything but the contents of the files of a prefix.
+
+    Returns:
+        (VerificationResults, list, dict): errors found, path, expected hash
+            and size of each file to be hashed, and statistics about the
+            files of the prefix
+    """
     prefix = spec.prefix
 
     results = VerificationResults()
+    to_hash = []
+    stats = {'files': 0, 'hashed_files': 0, 'hashed_bytes': 0}
     manifest_file = os.path.join(prefix,
                                  spack.store.layout.metadata_dir,
                                  spack.store.layout.manifest_file_name)
 
     if not os.path.exists(manifest_file):
         results.add_error(prefix, "manifest missing")
-        return results
+        return results, to_hash, stats
 
     try:
         with open(manifest_file, 'r') as f:
             manifest = sjson.load(f)
     except Exception:
         results.add_error(prefix, "manifest corrupted")
-        return results
+        return results, to_hash, stats
 
     # Get extensions active in spec
     view = spack.filesystem_view.YamlFilesystemView(prefix,
@@ -189,6 +368,17 @@ def check_spec_manifest(spec):
                 return True
         return False
 
+    def check(path, data):
+        res, needs_hash = _check_entry_metadata(path, data, fast)
+        if data.get('type') == 'file':
+            stats['files'] += 1
+        if needs_hash:
+            size = data.get('size', 0)
+            to_hash.append((path, data.get('hash', ''), size))
+            stats['hashed_files'] += 1
+            stats['hashed_bytes'] += size
+        return res
+
     for root, dirs, files in os.walk(prefix):
         for entry in list(dirs + files):
             path = os.path.join(root, entry)
@@ -206,14 +396,14 @@ def check_spec_manifest(spec):
                 continue
 
             data = manifest.pop(path, {})
-            results += check_entry(path, data)
+            results += check(path, data)
 
-    results += check_entry(prefix, manifest.pop(prefix, {}))
+    results += check(prefix, manifest.pop(prefix, {}))
 
     for path in manifest:
         results.add_error(path, 'deleted')
 
-    return results
+    return results, to_hash, stats
 
 
 class VerificationResults(object):
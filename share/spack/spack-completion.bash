@@ -718,8 +718,9 @@ function _spack_info {
 function _spack_install {
     if $list_options
     then
-        compgen -W "-h --help --only -u --until -j --jobs --overwrite
-                    --keep-prefix --keep-stage --dont-restage --use-cache
+        compgen -W "-h --help --only -u --until -j --jobs
+                    -p --install-jobs --overwrite --keep-prefix
+                    --keep-stage --dont-restage --use-cache
                     --no-cache --cache-only --show-log-on-error --source
                     -n --no-checksum -v --verbose --fake --only-concrete
                     -f --file --clean --dirty --test --run-tests
@@ -809,7 +810,8 @@ function _spack_mirror_create {
     if $list_options
     then
         compgen -W "-h --help -d --directory -a --all -f --file
-                    -D --dependencies -n --versions-per-spec" -- "$cur"
+                    -D --dependencies -n --versions-per-spec -j --jobs
+                    --jobs-per-host" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
@@ -1053,7 +1055,7 @@ function _spack_python {
 }
 
 function _spack_reindex {
-    compgen -W "-h --help" -- "$cur"
+    compgen -W "-h --help --format" -- "$cur"
 }
 
 function _spack_release_jobs {
@@ -1252,8 +1254,8 @@ function _spack_url_stats {
 function _spack_verify {
     if $list_options
     then
-        compgen -W "-h --help -l --local -j --json -a --all -s --specs
-                    -f --files" -- "$cur"
+        compgen -W "-h --help -l --local -j --json -a --all --fast
+                    -t --threads --report -s --specs -f --files" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi